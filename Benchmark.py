@@ -0,0 +1,494 @@
+"""
+LangTrans Benchmark
+-------------------
+Measures the speed of LangTrans with synthetic sources that use every part of
+example/source.yaml.
+
+Usage:
+	python Benchmark.py run [--sizes 1KB,64KB] [--files 200] [--depth 100]
+		[--repeat 3] [--history benchmarks.json] [-i] [-s]
+	python Benchmark.py compare [--history benchmarks.json] [--threshold 10]
+
+`run` times loading the ruleset from YAML and from .ltz, translating one large
+source of every size, translating many small files and translating a deeply
+nested `call`. Results are added to the history file. `compare` compares the last
+run with the previous run of the same options and exits with 1 if throughput of any
+benchmark dropped by more than the threshold (in percent).
+
+License
+-------
+MIT License
+Copyright (c) 2021 Bijin Regi Panicker
+See LICENSE file for orginal text.
+"""
+import json
+import os
+from contextlib import redirect_stdout
+from io import StringIO
+from os.path import dirname, join
+from sys import argv, exit as sys_exit
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import LangTransEngine as LangTrans
+
+# Types ------------------------------
+_Result = Dict[str, float]  # seconds, size and throughput of a benchmark
+_Results = Dict[str, _Result]
+_Comparison = Tuple[str, float, float, float, bool]  # name, old, new, change, regressed
+# ------------------------------------
+
+SOURCE_YAML = join(dirname(os.path.abspath(__file__)), "example", "source")
+TARGET_YAML = join(dirname(os.path.abspath(__file__)), "example", "target")
+
+# One snippet for every part of example/source.yaml ({i} makes names unique)
+SNIPPETS = (
+	'#scope{i}#\nprint("Scope{i}")\nprint("Done")\n',  # scope
+	'print((x{i}||True)?"Done":"Failed")\n',  # notdefined, ternary
+	"print('x{i} is not defined') if !x{i}\n",  # condition, chk_defined
+	"print<-inc<-twice<-{i}\n",  # pipe
+	'p"Hello {i}"\n',  # print
+	"add{i} = (x,y) => {{\n\treturn x+y+{i}\n}}\n",  # arrow_multline
+	"print((inc+twice)({i}))\n",  # fun_operation
+	"squares{i} = twice => [1, 2, {i}]\n",  # arrow2list
+	"twice{i}(x) = 2*x\n",  # arrow_fun
+	"inc{i} = (x) => x+{i}\n",  # arrow
+	"fun hello\n",  # fun
+	'try inc("{i}") Exception print("Error:",err)\n',  # single_try
+	"=name{i}.strip()\n",  # itself
+	"print(!2,1..{i})\n",  # jrange, range
+	"print(list(![1..{i}]))\n",  # listrange
+	"{i} -> inc\n|> twice -> print\n",  # multiline_flow, flow
+	"{i} -> inc -> print\n",  # endflow
+	'make dict test{i}:\n    this = "this"\n    if this == "this":\n      pass\n',  # make_dict
+	"make type name{i}(object):\n    x = 1\n    if x==1:\n      pass\n",  # make
+	"make type name{i}():\n    x = {i}\n",  # __make
+)
+
+
+def parse_size(size: str) -> int:
+	"""
+	Converts a size like 64KB or 1MB into bytes.
+
+	:param size: Size with an optional KB, MB or GB unit.
+	:type size: str
+
+	:return: Size in bytes.
+	:rtype: int
+	"""
+	size = size.strip().upper()
+	for unit, multiplier in (("GB", 1024**3), ("MB", 1024**2), ("KB", 1024), ("B", 1)):
+		if size.endswith(unit):
+			return int(float(size[: -len(unit)]) * multiplier)
+	return int(size)
+
+
+def format_size(size: int) -> str:
+	"""
+	Converts bytes into a size like 64KB or 1MB.
+
+	:param size: Size in bytes.
+	:type size: int
+
+	:return: Size with unit.
+	:rtype: str
+	"""
+	for unit, multiplier in (("GB", 1024**3), ("MB", 1024**2), ("KB", 1024)):
+		if size >= multiplier and size % multiplier == 0:
+			return f"{size // multiplier}{unit}"
+	return f"{size}B"
+
+
+def generate_source(size: int, start: int = 0) -> str:
+	"""
+	Generates a source of at least the given size from SNIPPETS.
+
+	:param size: Minimum size in characters.
+	:type size: int
+
+	:param start: First number used in names.
+	:type start: int
+
+	:return: Source in the syntax of example/source.yaml.
+	:rtype: str
+	"""
+	blocks = []
+	length = 0
+	number = start
+	while length < size:
+		for snippet in SNIPPETS:
+			block = snippet.format(i=number) + "\n"
+			blocks.append(block)
+			length += len(block)
+			if length >= size:
+				break
+		number += 1
+	return "".join(blocks)
+
+
+def nested_source(depth: int) -> str:
+	"""
+	Generates a pipe that calls the pipe part recursively at every level.
+
+	:param depth: Number of nested functions.
+	:type depth: int
+
+	:return: Source in the syntax of example/source.yaml.
+	:rtype: str
+	"""
+	return "print" + "<-inc" * depth + "<-1\n"
+
+
+def best_time(function: Callable[[], Any], repeat: int) -> float:
+	"""
+	Runs a function several times without printing anything.
+
+	:param function: Function to time.
+	:type function: Callable[[], Any]
+
+	:param repeat: Number of runs.
+	:type repeat: int
+
+	:return: Seconds of the fastest run.
+	:rtype: float
+	"""
+	times = []
+	for _ in range(max(1, repeat)):
+		with redirect_stdout(StringIO()):
+			started = perf_counter()
+			function()
+			times.append(perf_counter() - started)
+	return min(times)
+
+
+def benchmark_result(seconds: float, size: Optional[int] = None) -> _Result:
+	"""
+	Creates the result of a benchmark.
+
+	:param seconds: Seconds of the fastest run.
+	:type seconds: float
+
+	:param size: Bytes translated in a run (None for loading the ruleset).
+	:type size: Optional[int]
+
+	:return: Seconds, size and throughput (bytes or runs per second).
+	:rtype: _Result
+	"""
+	result = {"seconds": seconds, "throughput": (size or 1) / seconds}
+	if size is not None:
+		result["size"] = size
+	return result
+
+
+def run_benchmarks(
+	sizes: List[int],
+	files: int,
+	depth: int,
+	repeat: int,
+	incremental: bool = False,
+	splice: bool = False,
+) -> _Results:
+	"""
+	Runs all benchmarks and prints their results.
+
+	:param sizes: Sizes of the large source.
+	:type sizes: List[int]
+
+	:param files: Number of 1KB files for the small files benchmark.
+	:type files: int
+
+	:param depth: Nesting depth of the recursion benchmark.
+	:type depth: int
+
+	:param repeat: Number of runs of every benchmark.
+	:type repeat: int
+
+	:param incremental: Only rescan the lines changed by the previous iteration.
+	:type incremental: bool
+
+	:param splice: Rewrite each match at its own position.
+	:type splice: bool
+
+	:return: Results by benchmark name.
+	:rtype: _Results
+	"""
+	from tempfile import TemporaryDirectory
+
+	results: _Results = {}
+
+	def record(name: str, seconds: float, size: Optional[int] = None) -> None:
+		results[name] = benchmark_result(seconds, size)
+		speed = (
+			f"{results[name]['throughput'] / 1024**2:.3f} MB/s"
+			if size is not None
+			else f"{results[name]['throughput']:.1f} loads/s"
+		)
+		print(f"{name:<24}{seconds * 1000:>12.2f} ms{speed:>20}")
+
+	def translate(source: str) -> None:
+		LangTrans.current_state().once_complete.clear()
+		LangTrans.convert_syntax(
+			yaml_details, source, incremental=incremental, splice=splice
+		)
+
+	with TemporaryDirectory() as directory:
+		# Loading ruleset
+		record(
+			"load_yaml",
+			best_time(
+				lambda: LangTrans.extract_yaml_details(SOURCE_YAML, TARGET_YAML), repeat
+			),
+		)
+		with redirect_stdout(StringIO()):
+			loaded_details = LangTrans.extract_yaml_details(SOURCE_YAML, TARGET_YAML)
+		compiled_path = join(directory, "example")
+		with open(compiled_path + ".ltz", "w", encoding="utf-8") as ltz_file:
+			ltz_file.write(LangTrans.encode_ruleset(loaded_details))
+		record(
+			"load_ltz",
+			best_time(lambda: LangTrans.load_compiled_yaml_details(compiled_path), repeat),
+		)
+
+		yaml_details = loaded_details[1]
+		LangTrans.init_converter(yaml_details, incremental, splice)
+		# One large file
+		for size in sizes:
+			source = generate_source(size)
+			record(
+				f"large_file_{format_size(size)}",
+				best_time(lambda: translate(source), repeat),
+				len(source.encode("utf-8")),
+			)
+		# Many small files
+		if files:
+			sources = []
+			source_directory = join(directory, "sources")
+			os.makedirs(source_directory)
+			total_size = 0
+			for number in range(files):
+				source = generate_source(1024, number * 1000)
+				total_size += len(source.encode("utf-8"))
+				source_path = join(source_directory, f"source{number}.py")
+				with open(source_path, "w", encoding="utf-8") as source_file:
+					source_file.write(source)
+				sources.append((source_path, f"source{number}.py"))
+			record(
+				f"small_files_{files}",
+				best_time(
+					lambda: LangTrans.translate_batch(
+						sources,
+						join(directory, "outputs"),
+						yaml_details,
+						1,
+						incremental,
+						splice,
+					),
+					repeat,
+				),
+				total_size,
+			)
+			LangTrans.init_converter(yaml_details, incremental, splice)
+		# Worst case nesting
+		if depth:
+			source = nested_source(depth)
+			record(
+				f"nesting_{depth}",
+				best_time(lambda: translate(source), repeat),
+				len(source.encode("utf-8")),
+			)
+	return results
+
+
+def git_commit() -> Optional[str]:
+	"""
+	Gets the current git commit of LangTrans.
+
+	:return: Commit hash or None if it is not a git repository.
+	:rtype: Optional[str]
+	"""
+	from subprocess import run, DEVNULL
+
+	try:
+		process = run(
+			["git", "rev-parse", "HEAD"],
+			cwd=dirname(os.path.abspath(__file__)),
+			capture_output=True,
+			text=True,
+			stdin=DEVNULL,
+		)
+	except OSError:
+		return None
+	return process.stdout.strip() if process.returncode == 0 else None
+
+
+def load_history(history_path: str) -> List[Dict[str, Any]]:
+	"""
+	Loads the runs in the history file.
+
+	:param history_path: Path of the JSON history file.
+	:type history_path: str
+
+	:return: Runs from the oldest to the newest (empty if there is no file).
+	:rtype: List[Dict[str, Any]]
+	"""
+	try:
+		with open(history_path, encoding="utf-8") as history_file:
+			return json.load(history_file)
+	except FileNotFoundError:
+		return []
+
+
+def save_run(
+	history_path: str, results: _Results, options: Dict[str, Any]
+) -> Dict[str, Any]:
+	"""
+	Adds a run to the history file.
+
+	:param history_path: Path of the JSON history file.
+	:type history_path: str
+
+	:param results: Results of run_benchmarks.
+	:type results: _Results
+
+	:param options: Options of the run.
+	:type options: Dict[str, Any]
+
+	:return: The saved run.
+	:rtype: Dict[str, Any]
+	"""
+	from datetime import datetime, timezone
+	from platform import python_version
+
+	history = load_history(history_path)
+	run = {
+		"date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+		"version": LangTrans.__version__,
+		"commit": git_commit(),
+		"python": python_version(),
+		"options": options,
+		"results": results,
+	}
+	history.append(run)
+	with open(history_path, "w", encoding="utf-8") as history_file:
+		json.dump(history, history_file, indent=2)
+	return run
+
+
+def compare_runs(
+	previous: Dict[str, Any], latest: Dict[str, Any], threshold: float
+) -> List[_Comparison]:
+	"""
+	Compares the throughput of benchmarks in two runs.
+
+	:param previous: Older run.
+	:type previous: Dict[str, Any]
+
+	:param latest: Newer run.
+	:type latest: Dict[str, Any]
+
+	:param threshold: Maximum drop of throughput in percent.
+	:type threshold: float
+
+	:return: Name, old and new throughput, change in percent and whether it dropped
+		more than the threshold for benchmarks in both runs.
+	:rtype: List[_Comparison]
+	"""
+	comparisons = []
+	for name, result in latest["results"].items():
+		if name not in previous["results"]:
+			continue
+		old = previous["results"][name]["throughput"]
+		new = result["throughput"]
+		change = (new - old) * 100 / old
+		comparisons.append((name, old, new, change, change < -threshold))
+	return comparisons
+
+
+def option_value(arguments: List[str], option: str, default: str) -> str:
+	"""
+	Gets the value after an option and removes both from the arguments.
+
+	:param arguments: Command line arguments.
+	:type arguments: List[str]
+
+	:param option: Name of the option.
+	:type option: str
+
+	:param default: Value if the option is not used.
+	:type default: str
+
+	:return: Value of the option.
+	:rtype: str
+	"""
+	if option not in arguments:
+		return default
+	index = arguments.index(option)
+	value = arguments[index + 1]
+	del arguments[index : index + 2]
+	return value
+
+
+def main(arguments: List[str]) -> int:
+	"""
+	Runs a benchmark command.
+
+	:param arguments: Command line arguments (argv).
+	:type arguments: List[str]
+
+	:return: Exit code (1 if a benchmark is slower than the threshold).
+	:rtype: int
+	"""
+	arguments = list(arguments[1:])
+	command = arguments.pop(0) if arguments else "run"
+	history_path = option_value(arguments, "--history", "benchmarks.json")
+	if command == "run":
+		sizes = [
+			parse_size(size)
+			for size in option_value(arguments, "--sizes", "1KB,64KB").split(",")
+		]
+		files = int(option_value(arguments, "--files", "200"))
+		depth = int(option_value(arguments, "--depth", "100"))
+		repeat = int(option_value(arguments, "--repeat", "3"))
+		incremental = "-i" in arguments
+		splice = "-s" in arguments
+		results = run_benchmarks(sizes, files, depth, repeat, incremental, splice)
+		options = {
+			"sizes": sizes,
+			"files": files,
+			"depth": depth,
+			"repeat": repeat,
+			"incremental": incremental,
+			"splice": splice,
+		}
+		save_run(history_path, results, options)
+		print("Saved in", history_path)
+		return 0
+	if command == "compare":
+		threshold = float(option_value(arguments, "--threshold", "10"))
+		history = load_history(history_path)
+		if not history:
+			print(f"No runs in {history_path}")
+			return 1
+		latest = history[-1]
+		previous = next(
+			(run for run in reversed(history[:-1]) if run["options"] == latest["options"]),
+			None,
+		)
+		if previous is None:
+			print("No previous run with the same options")
+			return 0
+		print(f"{previous['date']} ({previous['commit']}) -> {latest['date']} ({latest['commit']})")
+		comparisons = compare_runs(previous, latest, threshold)
+		print(f"{'Benchmark':<24}{'Old (per s)':>16}{'New (per s)':>16}{'Change':>10}")
+		for name, old, new, change, regressed in comparisons:
+			print(
+				f"{name:<24}{old:>16.1f}{new:>16.1f}{change:>+9.1f}%",
+				"SLOWER" if regressed else "",
+			)
+		return 1 if any(regressed for *_, regressed in comparisons) else 0
+	print("Usage: python Benchmark.py run|compare [options]")
+	return 2
+
+
+if __name__ == "__main__":
+	sys_exit(main(argv))
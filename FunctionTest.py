@@ -1,9 +1,20 @@
 import unittest
-import LangTrans
+import unittest.mock
+import LangTransEngine as LangTrans
+import LangTransClient
+import Benchmark
 import re
 import contextlib
 import io
 import sys
+import os
+import tempfile
+import json
+import socket
+import threading
+import time
+import subprocess
+import importlib
 
 @contextlib.contextmanager
 def capture_print_output():
@@ -14,6 +25,21 @@ def capture_print_output():
         yield captured_output
     finally:
         sys.stdout = original_stdout
+
+
+def part_rule(regex, tokens=("x",), is_global=True, defaults=None, once=False, err=None):
+	"""PartRule of a regex without unmatch options."""
+	return LangTrans.PartRule(LangTrans.sanitize_regex(regex), tokens, is_global, ({}, ()), defaults or {}, once, err)
+
+
+def compiled_details(yaml_details):
+	"""Yaml details with compiled target templates, like extract_yaml_details gives."""
+	(match_rules, transform_rules, outside_errors), templates = yaml_details
+	if templates is not None:
+		templates = LangTrans.compile_templates(match_rules, templates)
+	return (match_rules, transform_rules, outside_errors), templates
+
+
 class TransTest(unittest.TestCase):
 	invalid_regex = r"[a-z"
 	# '\x1b[31m' means red color in terminal (ANSI escape code)
@@ -79,6 +105,23 @@ class TransTest(unittest.TestCase):
 		result = LangTrans.replace_variables(global_variables, source_string)
 		self.assertEqual(result, expected_result)
 
+	def test_resolve_variables(self):
+		# Variables inside variables, in any order
+		variables = LangTrans.resolve_variables(
+			{"lines": "<line>+", "line": r"(?:\n<any>)", "any": ".+", "other": "<unknown>"}
+		)
+		self.assertEqual(variables["lines"], r"(?:\n.+)+")
+		self.assertEqual(variables["other"], "<unknown>")
+		self.assertEqual(
+			LangTrans.expand_variables(variables, "^<lines>$ <unknown>"), r"^(?:\n.+)+$ <unknown>"
+		)
+		# Cycle
+		with self.assertRaises(SystemExit):
+			LangTrans.resolve_variables({"a": "<b>", "b": "x<a>"})
+		# Builtin variables are resolved in rulesets without settings
+		with unittest.mock.patch.object(LangTrans, "load_builtin_variables", return_value={"a": "<b>x", "b": "y"}):
+			match_options = LangTrans.extract({"part": {"regex": "(<a>)", "tokens": ["token"]}})[1][0]
+		self.assertEqual(match_options["part"].regex.pattern, "(yx)")
 	def test_extract_token_options(self):
 		# Basic
 		definition = { # TEMPLATE
@@ -198,7 +241,7 @@ class TransTest(unittest.TestCase):
 		# Test basic matching of a pattern with regex and token names
 		source_content = "123 456 789"
 		match_options = {
-		    "pattern1": (
+		    "pattern1": LangTrans.PartRule(
 		        LangTrans.sanitize_regex(r"(\d+)"),
 		        ("number",),
 		        True,
@@ -221,7 +264,7 @@ class TransTest(unittest.TestCase):
 		}
 		source_content = "123 456 789"
 		match_options = {
-		    "pattern1": (
+		    "pattern1": LangTrans.PartRule(
 		        LangTrans.sanitize_regex(r"(\d+)"),
 		        ("number",),
 		        True,
@@ -238,13 +281,14 @@ class TransTest(unittest.TestCase):
 		expected_result = {
 		    "pattern1": [("123", {"number": "123"}), ("789", {"number": "789"})]
 		}
+		result = {part: [(record.text, record.tokens) for record in records] for part, records in result.items()}
 		self.assertEqual(result, expected_result)
 	def test_convert_syntax(self):
 		# TODO: Thorough check needed for below test implementation
-		extracted_yaml_details = (
+		extracted_yaml_details = compiled_details((
 		    (
 		        {
-		            "part1": (
+		            "part1": LangTrans.PartRule(
 		                LangTrans.sanitize_regex(r"(123)"),
 		                ("num",),
 		                True,
@@ -263,7 +307,7 @@ class TransTest(unittest.TestCase):
 		        {},
 		    ),
 		    {"part1": "<num>"},  # Replace with the actual pattern template
-		)
+		))
 		original_content = "123"
 		is_recursive = False
 		conversion_parts = ()
@@ -276,6 +320,1012 @@ class TransTest(unittest.TestCase):
 		self.assertEqual(result,expected_result)
 
 		#TODO: Test for condition `is_recursive=True`
+	def test_convert_incremental(self):
+		# Parts feeding each other over several iterations
+		extracted_yaml_details = compiled_details((
+			(
+				{
+					"part1": part_rule(r"x(\d)", ("num",)),
+					"part2": part_rule(r"y(\d)y", ("num",)),
+					"part3": part_rule(r"^z(\w+)$", ("word",)),
+				},
+				{"part1": ({}, None), "part2": ({}, None), "part3": ({}, None)},
+				None,
+			),
+			{"part1": "y<num>y", "part2": "<num>\nz<num>", "part3": "[<word>]"},
+		))
+		original_content = "x1 y2y\nzab\nx3x4\n\nz"
+		expected_result = LangTrans.convert_syntax(extracted_yaml_details, original_content)
+		result = LangTrans.convert_syntax(
+			extracted_yaml_details, original_content, incremental=True
+		)
+		self.assertEqual(result, expected_result)
+		self.assertEqual(result, "1\nz1 2\n[2]\n[ab]\n3\n[34]\n[4]\n\nz")
+	def test_is_line_local(self):
+		self.assertTrue(LangTrans.is_line_local(r"x(\d)", 8))
+		self.assertFalse(LangTrans.is_line_local(r"x\s+y", 8))
+		self.assertFalse(LangTrans.is_line_local(r"x(?!\n)", 8))
+		self.assertFalse(LangTrans.is_line_local(r"x*", 8))
+	def test_line_span(self):
+		self.assertEqual(LangTrans.line_span(LangTrans.sanitize_regex(r"(\w+) = (\w+)").pattern, 8), 2)  # Spaces only cross empty lines
+		self.assertEqual(LangTrans.line_span(r"a\nb\n(?=c)", 8), 2)
+		self.assertIsNone(LangTrans.line_span(r"a(?:\n.+)+", 8))
+		self.assertIsNone(LangTrans.line_span(r"a$", 0))
+	def test_convert_incremental_spanning(self):
+		# Parts crossing lines rescan the lines around the changes
+		extracted_yaml_details = compiled_details((
+			({"open": part_rule(r"(u)"), "block": part_rule(r"s\n(\w*)\nt")}, {"open": ({}, None), "block": ({}, None)}, None),
+			{"open": "t", "block": "S<x>"},
+		))
+		content = "".join("s\nx\nu\n" if number % 50 == 0 else "line\n" for number in range(500))
+		expected = LangTrans.convert_syntax(extracted_yaml_details, content)
+		self.assertEqual(expected.count("Sx"), 10)
+		with unittest.mock.patch.object(LangTrans, "rescan_spanning_part", side_effect=LangTrans.rescan_spanning_part) as rescan:
+			for splice in (False, True):
+				LangTrans.init_converter(extracted_yaml_details, incremental=True, splice=splice)
+				self.assertEqual(LangTrans.convert_syntax(extracted_yaml_details, content, incremental=True, splice=splice), expected)
+		self.assertEqual(rescan.call_count, 4)
+	def test_convert_splice(self):
+		# Only the matched position is rewritten
+		extracted_yaml_details = compiled_details((
+			(
+				{
+					"part1": part_rule(r"^let (\w+)", ("name",)),
+					"part2": part_rule(r"(\w+)\+\+", ("name",)),
+				},
+				{"part1": ({}, None), "part2": ({}, None)},
+				None,
+			),
+			{"part1": "var <name>", "part2": "<name> += 1"},
+		))
+		original_content = "let x\nprint('let x')\nlet y++"
+		result = LangTrans.convert_syntax(extracted_yaml_details, original_content, splice=True)
+		self.assertEqual(result, "var x\nprint('let x')\nvar y += 1")
+	def test_resolve_overlaps(self):
+		# Overlapping matches of later parts are dropped
+		content = "let x++   let y     z++"
+		matched_parts = {
+			part: LangTrans.scan_part(content, part, part_rule(regex, ()))
+			for part, regex in (("part1", r"let \w"), ("part2", r"\w\+\+"))
+		}
+		self.assertEqual([record.start for record in matched_parts["part2"]], [4, 20])
+		self.assertEqual(
+			[(part, record.start) for part, record in LangTrans.resolve_overlaps(matched_parts)],
+			[("part1", 0), ("part1", 10), ("part2", 20)],
+		)
+	def test_match_record(self):
+		# Tokens are extracted from the match when they are used
+		rule = part_rule(r"(\w+)=(\d+)?", ("name", "value"), defaults={"value": "0"})
+		record = LangTrans.scan_part("a=1 b=", "part", rule)[1]
+		self.assertEqual((record.start, record.end, record.text, record.tokens), (4, 6, "b=", {"name": "b", "value": "0"}))
+		moved = record.moved(3)
+		self.assertEqual((moved.start, moved.end, moved.text, moved.tokens), (7, 9, "b=", {"name": "b", "value": "0"}))
+		self.assertEqual(repr(moved), "('b=', {'name': 'b', 'value': '0'})")
+	def test_render_template(self):
+		template, literals, placeholders, _ = LangTrans.compile_template("<tab>def <name>():<tab>", ("tab", "name"))
+		self.assertEqual(template, "<tab>def <name>():<tab>")
+		self.assertEqual(literals, ("", "def ", "():", ""))
+		self.assertEqual(placeholders, ("tab", "name", "tab"))
+		tokens = {"tab": "  ", "name": "test"}
+		compiled = LangTrans.compile_template("<tab>def <name>():", ("tab", "name"))
+		self.assertEqual(LangTrans.render_template(compiled, tokens), "  def test():")
+		# Same as replacing variables twice when tokens make a new placeholder
+		tokens = {"a": "<", "b": "a>"}
+		self.assertEqual(
+			LangTrans.render_template(LangTrans.compile_template("<a><b>", ("a", "b")), tokens),
+			LangTrans.replace_variables(tokens, LangTrans.replace_variables(tokens, "<a><b>")),
+		)
+	def test_compile_templates(self):
+		# Templates are compiled once with the ruleset, unknown placeholders are reported
+		match_options = {"part": part_rule("(a)")}
+		with capture_print_output() as output:
+			templates = LangTrans.compile_templates(match_options, {"part": "<x><y>", "other": "<z>"})
+		self.assertEqual(output.getvalue(), "\x1b[33mWarning: <y> not found in tokens of part\n")
+		self.assertEqual(templates["part"][1:3], (("", "<y>"), ("x",)))
+		self.assertEqual(templates["other"], "<z>")
+	def test_translate_batch(self):
+		extracted_yaml_details = compiled_details((
+			(
+				{"part1": part_rule(r"(1)", ("num",))},
+				{"part1": ({}, None)},
+				None,
+			),
+			{"part1": "one"},
+		))
+		with tempfile.TemporaryDirectory() as directory:
+			source_directory = os.path.join(directory, "src")
+			os.makedirs(os.path.join(source_directory, "sub"))
+			for name, content in (("b.txt", "123"), ("a.txt", "x"), ("sub/c.txt", "0123")):
+				with open(os.path.join(source_directory, name), "w") as source_file:
+					source_file.write(content)
+			sources = LangTrans.collect_sources(source_directory)
+			self.assertEqual([output for _, output in sources], ["a.txt", "b.txt", os.path.join("sub", "c.txt")])
+			self.assertEqual(len(LangTrans.collect_sources(os.path.join(source_directory, "*.txt"))), 2)
+			# Manifest entries outside the output directory or with the same output
+			manifest_path = os.path.join(directory, "manifest.txt")
+			for entries, message in (
+				(["src/a.txt", "../a.txt"], "outside the output directory"),
+				([os.path.join(source_directory, "a.txt"), os.path.join(source_directory, "sub", "a.txt")], "have the same output a.txt"),
+			):
+				with open(manifest_path, "w") as manifest:
+					manifest.write("\n".join(entries))
+				with self.assertRaises(SystemExit) as exit_error:
+					LangTrans.collect_sources("@" + manifest_path)
+				self.assertIn(message, exit_error.exception.code)
+
+			output_directory = os.path.join(directory, "out")
+			results = LangTrans.translate_batch(sources, output_directory, extracted_yaml_details, jobs=1)
+			self.assertEqual([status for _, _, status, _ in results], ["ok", "ok", "ok"])
+			with open(os.path.join(output_directory, "sub", "c.txt")) as output_file:
+				self.assertEqual(output_file.read(), "0one23")
+	def test_after_commands(self):
+		self.assertEqual(LangTrans.platform_after_command(["a $target", "b"]), "a $target && b")
+		self.assertEqual(LangTrans.expand_after_command("run $source $target", "a.x", "out/a.y"), "run a.x out/a.y")
+		# Commands that quote their paths keep them as they are
+		self.assertEqual(LangTrans.expand_after_command('python "$target"', "a.x", "out dir/a b.py"), 'python "out dir/a b.py"')
+		self.assertEqual(LangTrans.expand_after_command('python "$target"', "a.x", "out dir/a b.py", quote=True), 'python "out dir/a b.py"')
+		self.assertEqual(
+			LangTrans.expand_after_command("python $target", "a.x", "out dir/a b.py", quote=True),
+			"python " + LangTrans.quote_path("out dir/a b.py"),
+		)
+		with tempfile.TemporaryDirectory() as directory:
+			source_path = os.path.join(directory, "a b;touch PWNED;.txt")
+			with open(source_path, "w") as source_file:
+				source_file.write("text")
+			command = LangTrans.expand_after_command(f'"{sys.executable}" -c "import sys; print(open(sys.argv[1]).read())" $source', source_path, "out", quote=True)
+			with capture_print_output() as output:
+				self.assertEqual(LangTrans.run_after_commands([("a", command)], jobs=1), 0)
+			self.assertIn("[a]\x1b[39m text\n", output.getvalue())
+			self.assertEqual(os.listdir(directory), ["a b;touch PWNED;.txt"])
+			self.assertFalse(os.path.exists("PWNED"))
+		python = f'"{sys.executable}" -c'
+		commands = [
+			("a.txt", f"{python} \"print('built a')\""),
+			("b.txt", f"{python} \"import sys; print('bad b'); sys.exit(3)\""),
+			("c.txt", f"{python} \"pass\""),
+		]
+		with capture_print_output() as output:
+			self.assertEqual(LangTrans.run_after_commands(commands, jobs=2), 1)
+		printed = output.getvalue()
+		self.assertIn("[a.txt]\x1b[39m built a\n", printed)
+		self.assertIn("[b.txt]\x1b[39m bad b\n", printed)
+		self.assertIn("exit 3 \x1b[39m b.txt\n", printed)
+		self.assertTrue(printed.endswith("After command succeeded for 2/3 files\n"))
+	def test_is_chunk_local(self):
+		self.assertTrue(LangTrans.is_chunk_local(r"print (\w+)\n", 8))
+		self.assertFalse(LangTrans.is_chunk_local(r"print\s*(\w+)", 8))
+		self.assertFalse(LangTrans.is_chunk_local(r"(?<=\n)x", 8))
+		self.assertFalse(LangTrans.is_chunk_local(r"\n(\w+)", 8))  # Across an indentation reset
+		self.assertTrue(LangTrans.is_chunk_local(r"^(\s*)print", 8))  # Indentation after a line with text
+	def test_read_chunks(self):
+		self.assertEqual(list(LangTrans.read_chunks(["a\n", "\n", "b\n", "\n", "c\n"], 1)), ["a\n", "\nb\n", "\nc\n"])
+		self.assertEqual(list(LangTrans.read_chunks(["a\n", "\tb\n", "c\n", "\n", "\n", "d\n"], 1)), ["a\n\tb\n", "c\n", "\n\nd\n"])
+	def test_translate_stream(self):
+		extracted_yaml_details = compiled_details((
+			(
+				{
+					"part1": part_rule(r"print:(\w+)"),
+					"part2": part_rule(r"print\((\w+)\)\n\n", is_global=False),
+				},
+				{"part1": ({}, None), "part2": ({}, None)},
+				None,
+			),
+			{"part1": "print(<x>)", "part2": "<x>"},
+		))
+		self.assertEqual(LangTrans.stream_unsafe_parts(extracted_yaml_details), [])
+		content = "print:a\n\nprint:b\nx\n\n\nprint:c\n"
+		with tempfile.TemporaryDirectory() as directory:
+			source_path = os.path.join(directory, "source.txt")
+			output_path = os.path.join(directory, "output.txt")
+			with open(source_path, "w") as source_file:
+				source_file.write(content)
+			self.assertTrue(LangTrans.translate_stream(source_path, output_path, extracted_yaml_details, chunk_size=1, splice=True))
+			with open(output_path) as output_file:
+				self.assertEqual(output_file.read(), LangTrans.convert_syntax(extracted_yaml_details, content, splice=True))
+	def test_translate_stream_output_file(self):
+		extracted_yaml_details = compiled_details((
+			({"part1": part_rule(r"print:(\w+)")}, {"part1": ({}, None)}, None),
+			{"part1": "print(<x>)"},
+		))
+		with tempfile.TemporaryDirectory() as directory:
+			source_path = os.path.join(directory, "source.txt")
+			output_path = os.path.join(directory, "output.txt")
+			with open(source_path, "w") as source_file:
+				source_file.write("print:a\n")
+			umask = os.umask(0o022)
+			try:
+				self.assertTrue(LangTrans.translate_stream(source_path, output_path, extracted_yaml_details))
+			finally:
+				os.umask(umask)
+			self.assertEqual(os.stat(output_path).st_mode & 0o777, 0o644)
+			# Unchanged output is not replaced, a changed one keeps its mode
+			os.chmod(output_path, 0o640)
+			self.assertFalse(LangTrans.translate_stream(source_path, output_path, extracted_yaml_details))
+			with open(source_path, "w") as source_file:
+				source_file.write("print:b\n")
+			self.assertTrue(LangTrans.translate_stream(source_path, output_path, extracted_yaml_details))
+			self.assertEqual(os.stat(output_path).st_mode & 0o777, 0o640)
+			self.assertEqual(sorted(os.listdir(directory)), ["output.txt", "source.txt"])
+	def test_translate_chunks(self):
+		# Replacement removes the empty line between chunks
+		merge_yaml_details = compiled_details((
+			({"part1": part_rule(r"x\n", ())}, {"part1": ({}, None)}, None),
+			{"part1": "x"},
+		))
+		content = "a\n\nx\n\ny\n"
+		chunks = LangTrans.read_chunks(content.splitlines(True), 1)
+		self.assertEqual("".join(LangTrans.translate_chunks(chunks, merge_yaml_details, splice=True)), "a\n\nxy\n")
+		# Boundaries that keep changing: one join, then the rest is translated as one
+		content = "a\n" + "\nx\n" * 40
+		chunks = LangTrans.read_chunks(content.splitlines(True), 1)
+		with capture_print_output() as output:
+			self.assertEqual("".join(LangTrans.translate_chunks(chunks, merge_yaml_details, splice=True)), "a\n\n" + "x" * 40)
+		self.assertIn("translating the rest of the file as one", output.getvalue())
+	def test_stitch_chunks(self):
+		converted = []
+		def convert(text):
+			converted.append(text)
+			return text
+		chunks = [f"\n{number}\n" for number in range(100)]
+		with capture_print_output():
+			self.assertEqual("".join(LangTrans.stitch_chunks(chunks, convert, lambda *_: False)), "".join(chunks))
+		self.assertEqual(len(converted), 5)  # 3 chunks, 1 join and the rest
+	def test_crossing_parts(self):
+		# Global part across empty lines is checked at every boundary
+		extracted_yaml_details = compiled_details((
+			(
+				{"part1": part_rule(r"print:(\w+)"), "part2": part_rule(r"print\((\w+)\)\n\n")},
+				{"part1": ({}, None), "part2": ({}, None)},
+				None,
+			),
+			{"part1": "print(<x>)", "part2": "<x>"},
+		))
+		self.assertEqual(LangTrans.stream_unsafe_parts(extracted_yaml_details), [])
+		self.assertEqual(LangTrans.crossing_parts(extracted_yaml_details), [extracted_yaml_details[0][0]["part2"].regex])
+		content = "print:a\n\nprint(b)\n\nprint:c\n\nprint(d)\n"
+		chunks = LangTrans.read_chunks(content.splitlines(True), 1)
+		with capture_print_output() as output:
+			self.assertEqual("".join(LangTrans.translate_chunks(chunks, extracted_yaml_details, splice=True)), "abcprint(d)\n")
+		self.assertIn("translating the rest of the file as one", output.getvalue())
+		self.assertEqual(LangTrans.convert_syntax(extracted_yaml_details, content, splice=True), "abcprint(d)\n")
+	def test_translate_chunks_replace(self):
+		# Without splice, identical texts are replaced in every chunk
+		replace_yaml_details = compiled_details((
+			({"part1": part_rule(r"y(x)")}, {"part1": ({}, None)}, None),
+			{"part1": "Z"},
+		))
+		chunks = LangTrans.read_chunks(["xa\n", "\n", "yxa\n"], 1)
+		self.assertEqual("".join(LangTrans.translate_chunks(chunks, replace_yaml_details)), LangTrans.convert_syntax(replace_yaml_details, "xa\n\nyxa\n"))
+	def test_translate_parallel(self):
+		extracted_yaml_details = compiled_details((
+			(
+				{
+					"part1": part_rule(r"print:(\w+)"),
+					"part2": part_rule(r"print\((\w+)\)\n\n", is_global=False),
+				},
+				{"part1": ({"x": {"replace": ((LangTrans.sanitize_regex("a"), "A"),)}}, None), "part2": ({}, None)},
+				None,
+			),
+			{"part1": "print(<x>)", "part2": "<x>"},
+		))
+		content = "".join(f"print:a{number}\n\n" if number % 3 else f"x{number}\n" for number in range(60))
+		LangTrans.init_converter(extracted_yaml_details, splice=True)
+		expected = LangTrans.convert_syntax(extracted_yaml_details, content, splice=True)
+		self.assertEqual(LangTrans.translate_parallel(content, extracted_yaml_details, jobs=2, chunk_size=1, splice=True), expected)
+		self.assertEqual(LangTrans.translate_parallel(content, extracted_yaml_details, jobs=1, splice=True), expected)
+		# Replacement removes the empty line between regions
+		merge_yaml_details = compiled_details((
+			({"part1": part_rule(r"x\n", ())}, {"part1": ({}, None)}, None),
+			{"part1": "x"},
+		))
+		self.assertEqual(LangTrans.translate_parallel("a\n\nx\n\ny\n", merge_yaml_details, jobs=2, chunk_size=1), "a\n\nxy\n")
+		self.assertEqual(LangTrans.translate_parallel("a\n\nx\n\ny\n", merge_yaml_details, jobs=2, chunk_size=1, splice=True), "a\n\nxy\n")
+		# Without splice, a replacement reaches identical texts in other regions
+		replace_yaml_details = compiled_details((
+			({"part1": part_rule(r"x(?=a\n)", ())}, {"part1": ({}, None)}, None),
+			{"part1": "Z"},
+		))
+		self.assertEqual(LangTrans.translate_parallel("xa\n\nyxa", replace_yaml_details, jobs=2, chunk_size=1), "Za\n\nyZa")
+		LangTrans.translate_parallel("xa", replace_yaml_details, jobs=1, part_budget=5.0)
+		self.assertEqual(LangTrans.current_state().part_budget, 5.0)
+		LangTrans.current_state().part_budget = None
+	def test_profile(self):
+		extracted_yaml_details = compiled_details((
+			(
+				{
+					"part1": part_rule(r"f\((\w+)\)", ("arg",)),
+					"part2": part_rule(r"(\d)", ("num",), is_global=False),
+				},
+				{"part1": ({"arg": {"call": ("part2",)}}, None), "part2": ({}, None)},
+				None,
+			),
+			{"part1": "g(<arg>)", "part2": "n"},
+		))
+		LangTrans.init_converter(extracted_yaml_details)
+		LangTrans.start_profile()
+		self.assertEqual(LangTrans.convert_syntax(extracted_yaml_details, "f(1) f(2)"), "g(n) g(n)")
+		summary = LangTrans.stop_profile(1.0)
+		self.assertIsNone(LangTrans.current_state().profile_report)
+		parts = {stats["part"]: stats for stats in summary["parts"]}
+		self.assertEqual(parts["part1"]["matches"], 2)
+		self.assertEqual(parts["part2"]["matches"], 2)
+		self.assertGreater(parts["part1"]["recursion"], 0)
+		self.assertEqual(summary["iterations"], {"1": 3})
+		self.assertEqual(summary["max_depth"], 1)
+		with capture_print_output() as output:
+			LangTrans.print_profile(summary)
+		self.assertIn("part1", output.getvalue())
+		self.assertIsNone(LangTrans.stop_profile(1.0))
+	def test_convert_memo(self):
+		extracted_yaml_details = compiled_details((
+			(
+				{
+					"part1": part_rule(r"f\((\w+)\)", ("arg",)),
+					"part2": part_rule(r"(\d)", ("num",), is_global=False),
+				},
+				{"part1": ({"arg": {"call": ("part2",)}}, None), "part2": ({}, None)},
+				None,
+			),
+			{"part1": "g(<arg>)", "part2": "n"},
+		))
+		content = "f(1) f(12) f(1x) f(12)"
+		LangTrans.init_converter(extracted_yaml_details, memo_size=0)
+		self.assertIsNone(LangTrans.current_state().translator.memo)
+		expected = LangTrans.convert_syntax(extracted_yaml_details, content)
+		LangTrans.init_converter(extracted_yaml_details)
+		self.assertEqual(LangTrans.convert_syntax(extracted_yaml_details, content), expected)
+		self.assertEqual(LangTrans.convert_syntax(extracted_yaml_details, content), expected)
+		memo_info = LangTrans.current_state().translator.memo.cache_info()
+		self.assertEqual((memo_info.hits, memo_info.misses), (5, 3))
+		# `once` parts are not memoized
+		extracted_yaml_details[0][0]["part2"] = extracted_yaml_details[0][0]["part2"]._replace(once=True)
+		LangTrans.init_converter(extracted_yaml_details)
+		self.assertEqual(LangTrans.convert_syntax(extracted_yaml_details, content), expected)
+		self.assertEqual(LangTrans.current_state().translator.memo.cache_info().misses, 0)
+	def test_dependency_order(self):
+		extracted_yaml_details = compiled_details((
+			({"b": part_rule(r"B(\w)"), "a": part_rule(r"A(\w)"), "c": part_rule(r"C(\w)")}, {"b": ({}, None), "a": ({}, None), "c": ({}, None)}, None),
+			{"b": "C<x>", "a": "B<x>", "c": "<x>"},
+		))
+		graph = LangTrans.dependency_graph(extracted_yaml_details)
+		self.assertEqual(graph, {"b": ["c"], "a": ["b"], "c": []})
+		self.assertEqual(LangTrans.rewrite_cycles(graph), [])
+		order = LangTrans.dependency_order(graph)
+		self.assertEqual(order, (("a",), ("b",), ("c",)))
+		LangTrans.init_converter(extracted_yaml_details)
+		LangTrans.start_profile()
+		self.assertEqual(LangTrans.convert_syntax(extracted_yaml_details, "Ax Bx", order=order), "x x")
+		self.assertEqual(LangTrans.stop_profile(1.0)["iterations"], {"1": 1})
+	def test_rewrite_cycles(self):
+		extracted_yaml_details = compiled_details((
+			({"b": part_rule(r"B(\w)"), "c": part_rule(r"C(\w)")}, {"b": ({}, None), "c": ({}, None)}, None),
+			{"b": "C<x>", "c": "C<x>!"},
+		))
+		self.assertEqual(LangTrans.rewrite_cycles(LangTrans.dependency_graph(extracted_yaml_details)), [["c"]])
+		with capture_print_output() as output:
+			LangTrans.warn_rewrite_cycles(extracted_yaml_details)
+		self.assertIn("c -> c can match its own output", output.getvalue())
+		# Matches its own output but stops: every rewrite removes an arrow
+		flow = part_rule(r"(\w+) -> (\w+) ->", ("x", "y"))
+		flow_yaml_details = compiled_details((({"flow": flow}, {"flow": ({}, None)}, None), {"flow": "<y>_<x> ->"}))
+		self.assertEqual(LangTrans.rewrite_cycles(LangTrans.dependency_graph(flow_yaml_details)), [["flow"]])
+		with capture_print_output() as output:
+			LangTrans.warn_rewrite_cycles(flow_yaml_details, check_samples=True)
+		self.assertEqual(output.getvalue(), "")
+		with capture_print_output() as output:
+			LangTrans.warn_rewrite_cycles(flow_yaml_details)
+		self.assertIn("flow -> flow can match its own output (--explain-order", output.getvalue())
+	def test_rewrite_cycle_warning_on_load(self):
+		with tempfile.TemporaryDirectory() as directory:
+			with open(os.path.join(directory, "source.yaml"), "w") as source_file:
+				source_file.write("grow:\n  regex: (a+)\n  tokens: [x]\n")
+			with open(os.path.join(directory, "target.yaml"), "w") as target_file:
+				target_file.write("grow: <x>a\n")
+			# Samples are only translated by -c and --explain-order
+			with capture_print_output() as output, unittest.mock.patch.object(LangTrans, "cycle_stops") as cycle_stops:
+				LangTrans.extract_yaml_details(os.path.join(directory, "source"), os.path.join(directory, "target"))
+			self.assertFalse(cycle_stops.called)
+			self.assertIn("grow -> grow can match its own output", output.getvalue())
+			with capture_print_output() as output:
+				LangTrans.extract_yaml_details(os.path.join(directory, "source"), os.path.join(directory, "target"), check_samples=True)
+			self.assertIn("grow -> grow can match its own output (loop limit", output.getvalue())
+	def test_ordered_cycle(self):
+		example = os.path.join(os.path.dirname(os.path.abspath(__file__)), "example")
+		with capture_print_output():
+			extracted_yaml_details = LangTrans.extract_yaml_details(os.path.join(example, "source"), os.path.join(example, "target"))[1]
+		order = LangTrans.dependency_order(LangTrans.dependency_graph(extracted_yaml_details))
+		self.assertIn(("flow",), order)
+		self.assertLess(order.index(("flow",)), order.index(("endflow",)))
+		# endflow waits until flow stops matching
+		content = "1 -> inc -> twice -> print\n"
+		LangTrans.init_converter(extracted_yaml_details)
+		expected = LangTrans.convert_syntax(extracted_yaml_details, content)
+		self.assertEqual(expected, "print(twice(inc(1)))\n")
+		LangTrans.init_converter(extracted_yaml_details)
+		self.assertEqual(LangTrans.convert_syntax(extracted_yaml_details, content, order=order), expected)
+	def test_required_literals(self):
+		def literals(regex):
+			pattern = LangTrans.sanitize_regex(regex)
+			return LangTrans.required_literals(pattern.pattern, pattern.flags)
+		self.assertEqual(literals(r"make (\w+):"), {"make"})
+		self.assertEqual(literals(r"(\w+) (?:=>|->) (\w+)"), {"=>", "->"})
+		self.assertEqual(literals(r"(?:try|x?)(\w+)"), set())
+		self.assertEqual(literals(r"(?i)fun(\w+)"), set())
+	def test_literal_finder(self):
+		finder = LangTrans.LiteralFinder(frozenset({"fun", "function", "un", "->", "-", "x.y"}))
+		self.assertEqual(finder.find("function f -> x"), {"fun", "function", "un", "->", "-"})
+		self.assertEqual(finder.find("xay fu"), set())
+		self.assertEqual(LangTrans.LiteralFinder(frozenset()).find("text"), set())
+	def test_literal_prefilter(self):
+		match_rules = {"fun": part_rule(r"fun (\w+)"), "try": part_rule(r"try (\w+)"), "word": part_rule(r"(\d+)")}
+		self.assertEqual(LangTrans.possible_parts("fun main", match_rules), {"fun", "word"})
+		extracted_yaml_details = compiled_details((
+			(match_rules, {"fun": ({}, None), "try": ({}, None), "word": ({}, None)}, None),
+			{"fun": "def <x>", "try": "<x>", "word": "<x>"},
+		))
+		LangTrans.start_profile()
+		self.assertEqual(LangTrans.convert_syntax(extracted_yaml_details, "fun main"), "def main")
+		scanned = [stats["part"] for stats in LangTrans.stop_profile(1.0)["parts"]]
+		self.assertEqual(sorted(scanned), ["fun", "word"])
+	def test_translator(self):
+		extracted_yaml_details = compiled_details((
+			({"header": part_rule(r"^#(\w+)", once=True), "print": part_rule(r"print:(\w+)")}, {"header": ({}, None), "print": ({}, None)}, None),
+			{"header": "# <x>", "print": "print(<x>)"},
+		))
+		translator = LangTrans.Translator(extracted_yaml_details)
+		LangTrans.current_state().once_complete.clear()
+		results = []
+		threads = [
+			threading.Thread(target=lambda: results.append(translator.translate("#a\nprint:b")))
+			for _ in range(8)
+		]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		# `once` parts are matched again in every document
+		self.assertEqual(results, [LangTrans.TranslationResult("# a\nprint(b)", [], None)] * 8)
+		self.assertEqual(LangTrans.current_state().once_complete, [])
+	def test_translator_errors(self):
+		semicolon = {"semicolon": {"regex": LangTrans.sanitize_regex(";"), "msg": "Remove ;"}}
+		extracted_yaml_details = compiled_details((
+			({"print": part_rule(r"print:(\w+;?)", err=semicolon), "loop": part_rule(r"loop(\w)")}, {"print": ({}, None), "loop": ({}, None)}, None),
+			{"print": "print(<x>)", "loop": "loop<x><x>"},
+		))
+		translator = LangTrans.Translator(extracted_yaml_details)
+		with capture_print_output() as output:
+			result = translator.translate("print:b;\nprint:c;")
+			self.assertIsNone(result.output)
+			self.assertEqual([diagnostic["line"] for diagnostic in result.diagnostics], [1, 2])
+			self.assertEqual([diagnostic["line"] for diagnostic in translator.check("x\nprint:c;")], [2])
+			self.assertIn("Loop Limit Exceeded", translator.translate("loopx").error)
+		self.assertEqual(output.getvalue(), "")
+	def test_translator_caches(self):
+		# Caches belong to the translator and states to their thread
+		semicolon = {"semicolon": {"regex": LangTrans.sanitize_regex(";"), "msg": "Remove ;"}}
+		extracted_yaml_details = compiled_details((
+			({"print": part_rule(r"print:(\w+;?)", err=semicolon)}, {"print": ({}, None)}, None),
+			{"print": "print(<x>)"},
+		))
+		translator = LangTrans.Translator(extracted_yaml_details)
+		translator.translate("print:b")
+		self.assertIn(id(semicolon), translator.caches.error_checkers)
+		self.assertNotIn(id(semicolon), LangTrans.Translator(extracted_yaml_details).caches.error_checkers)
+		thread_states = []
+		thread = threading.Thread(target=lambda: thread_states.append(LangTrans.current_state()))
+		thread.start()
+		thread.join()
+		self.assertIsNot(thread_states[0], LangTrans.current_state())
+	def test_source_map(self):
+		extracted_yaml_details = compiled_details((
+			({"say": part_rule(r"say\x20(\w+)"), "upper": part_rule(r"U(\w)"), "block": part_rule(r"block:\n(\w+)")}, {"say": ({}, None), "upper": ({}, None), "block": ({}, None)}, None),
+			{"say": "print(U<x>)", "upper": "<x>", "block": "{<x>}"},
+		))
+		translator = LangTrans.Translator(extracted_yaml_details, source_maps=True)
+		source = "x = 1\nsay hi\n"
+		result = translator.translate(source)
+		self.assertEqual(result.output, "x = 1\nprint(hi)\n")
+		self.assertEqual(result.source_map, [(0, 6, 0, 6, ""), (6, 12, 6, 12, "say"), (12, 13, 6, 12, "upper"), (13, 15, 6, 12, "say"), (15, 16, 12, 13, "")])
+		# Translator options can be given to load
+		example = os.path.join(os.path.dirname(os.path.abspath(__file__)), "example")
+		with tempfile.TemporaryDirectory() as directory, unittest.mock.patch.object(LangTrans, "default_cache_directory", return_value=directory), capture_print_output():
+			loaded = LangTrans.Translator.load(os.path.join(example, "source"), os.path.join(example, "target"), source_maps=True, memo_size=0, part_budget=1.0)
+		self.assertTrue(loaded.source_maps and loaded.splice)
+		self.assertIsNone(loaded.memo)
+		self.assertEqual(loaded.part_budget, 1.0)
+		self.assertIsNotNone(loaded.translate("print(x)\n").source_map)
+	def test_retranslate(self):
+		extracted_yaml_details = compiled_details((
+			({"say": part_rule(r"say\x20(\w+)"), "block": part_rule(r"block:\n(\w+)")}, {"say": ({}, None), "block": ({}, None)}, None),
+			{"say": "print(<x>)", "block": "{<x>}"},
+		))
+		translator = LangTrans.Translator(extracted_yaml_details, source_maps=True)
+		source = "x = 1\nsay hi\n"
+		result = translator.translate(source)
+		# Only the edited line is translated again
+		with unittest.mock.patch.object(LangTrans.Translator, "translate", autospec=True, side_effect=LangTrans.Translator.translate) as full_run:
+			edited = translator.retranslate(source, result, (0, 5, "say yo"))
+			self.assertEqual(edited, translator.translate("say yo\nsay hi\n"))
+			self.assertEqual(full_run.call_count, 1)  # Only the comparison
+			# Parts that can match across lines need the whole document
+			translator.retranslate(source, result, (0, 0, "block:\n"))
+			self.assertEqual(full_run.call_count, 2)
+	def test_retranslate_multiline_parts(self):
+		# Other parts that can match across lines do not match next to the edit
+		example = os.path.join(os.path.dirname(os.path.abspath(__file__)), "example")
+		with capture_print_output():
+			example_yaml_details = LangTrans.extract_yaml_details(os.path.join(example, "source"), os.path.join(example, "target"))[1]
+		translator = LangTrans.Translator(example_yaml_details, source_maps=True)
+		source = "".join(f"x{number} = list(1..{number})\n" for number in range(2, 200)) + "\nprint(x2)\n"
+		result = translator.translate(source)
+		start = source.index("1..50")
+		with unittest.mock.patch.object(LangTrans.Translator, "translate", autospec=True, side_effect=LangTrans.Translator.translate) as full_run:
+			edited = translator.retranslate(source, result, (start, start + 5, "1..60"))
+			self.assertEqual(full_run.call_count, 0)
+			self.assertEqual(edited, translator.translate(source.replace("1..50", "1..60")))
+	def test_server(self):
+		with tempfile.TemporaryDirectory() as directory:
+			with open(os.path.join(directory, "source.yaml"), "w") as yaml_file:
+				yaml_file.write("num:\n  regex: (1)\n  tokens: [one]\n")
+			with open(os.path.join(directory, "target.yaml"), "w") as yaml_file:
+				yaml_file.write("num: one\n")
+			with open(os.path.join(directory, "input.txt"), "w") as input_file:
+				input_file.write("x = 1")
+			socket_path = os.path.join(directory, "server.sock")
+			server = threading.Thread(target=LangTrans.serve, args=([socket_path],))
+			with capture_print_output(), unittest.mock.patch.dict(os.environ, {"LANGTRANS_CACHE": directory}):
+				server.start()
+				while not os.path.exists(socket_path):
+					time.sleep(0.01)
+				self.assertEqual(os.stat(socket_path).st_mode & 0o077, 0)
+				# Sockets of other users are never used, they choose the after command
+				with unittest.mock.patch.object(os, "getuid", return_value=os.getuid() + 1):
+					with self.assertRaises(PermissionError):
+						LangTransClient.send_request(socket_path, {"argv": ["LangTrans.py"], "cwd": directory})
+					self.assertEqual(LangTransClient.main(["LangTransClient.py", "--socket", socket_path, "-h"]), 1)
+				with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+					client.connect(socket_path)
+					client.sendall(b"not json\n")
+					with client.makefile("rb") as response_file:
+						malformed = json.loads(response_file.readline())
+				missing_directory = LangTransClient.send_request(
+					socket_path, {"argv": ["LangTrans.py"], "cwd": os.path.join(directory, "missing")}
+				)
+				with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+					client.connect(socket_path)  # Disconnects before the response
+					client.sendall(json.dumps({"argv": ["LangTrans.py"]}).encode() + b"\n")
+				nested_server = LangTransClient.send_request(
+					socket_path, {"argv": ["LangTrans.py", "--serve", os.path.join(directory, "nested.sock")], "cwd": directory}
+				)
+				response = LangTransClient.send_request(
+					socket_path,
+					{"argv": ["LangTrans.py", "input.txt", "output.txt", "source", "target"], "cwd": directory},
+				)
+				LangTransClient.main(["LangTransClient.py", "--socket", socket_path, "--stop"])
+				server.join()
+			self.assertEqual(malformed["code"], 1)
+			self.assertIn("Invalid request", malformed["output"])
+			self.assertEqual(missing_directory["code"], 1)
+			self.assertEqual(nested_server["code"], 1)
+			self.assertIn("--serve can not be sent to the server", nested_server["output"])
+			self.assertFalse(os.path.exists(os.path.join(directory, "nested.sock")))
+			self.assertEqual(response["code"], 0)
+			self.assertIn("Saved as", response["output"])
+			with open(os.path.join(directory, "output.txt")) as output_file:
+				self.assertEqual(output_file.read(), "x = one")
+	def test_socket_path(self):
+		with tempfile.TemporaryDirectory() as directory:
+			with unittest.mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": directory}):
+				self.assertEqual(LangTrans.default_socket_path(), os.path.join(directory, "langtrans.sock"))
+				self.assertEqual(LangTransClient.default_socket_path(), LangTrans.default_socket_path())
+			with unittest.mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": ""}), unittest.mock.patch("tempfile.tempdir", directory):
+				socket_path = LangTrans.default_socket_path()
+				self.assertEqual(os.path.dirname(os.path.dirname(socket_path)), directory)
+				LangTrans.private_socket_directory(socket_path)
+				self.assertEqual(os.stat(os.path.dirname(socket_path)).st_mode & 0o777, 0o700)
+				# A directory that other users can write to is refused
+				os.chmod(os.path.dirname(socket_path), 0o777)
+				with self.assertRaises(SystemExit):
+					LangTrans.private_socket_directory(socket_path)
+	def test_output_cache(self):
+		with tempfile.TemporaryDirectory() as directory:
+			output_path = os.path.join(directory, "output.txt")
+			self.assertTrue(LangTrans.write_if_changed(output_path, "x = 1"))
+			self.assertFalse(LangTrans.write_if_changed(output_path, "x = 1"))
+			self.assertTrue(LangTrans.write_if_changed(output_path, "x = 2"))
+
+			cache_directory = os.path.join(directory, "cache")
+			cache_path = LangTrans.output_cache_path(cache_directory, "fingerprint", "x = one")
+			self.assertNotEqual(cache_path, LangTrans.output_cache_path(cache_directory, "changed", "x = one"))
+			self.assertIsNone(LangTrans.cached_output(cache_path))
+			LangTrans.store_output(cache_path, "x = 1")
+			self.assertEqual(LangTrans.cached_output(cache_path), "x = 1")
+			# Eviction
+			LangTrans.evict_cache(cache_directory, 100)
+			self.assertEqual(LangTrans.cached_output(cache_path), "x = 1")
+			# The outputs are only listed when the saved size is larger than the limit
+			LangTrans.store_output(LangTrans.output_cache_path(cache_directory, "fingerprint", "x = two"), "x = 2")
+			with unittest.mock.patch.object(os, "walk", side_effect=os.walk) as walk:
+				LangTrans.evict_cache(cache_directory, 100)
+				self.assertEqual(walk.call_count, 0)
+			with open(os.path.join(cache_directory, "outputs.size")) as size_file:
+				self.assertEqual(size_file.read(), "10")
+			LangTrans.evict_cache(cache_directory, 0)
+			self.assertIsNone(LangTrans.cached_output(cache_path))
+			with open(os.path.join(cache_directory, "outputs.size")) as size_file:
+				self.assertEqual(size_file.read(), "0")
+			# Compiled rulesets (-f) have their own fingerprint
+			source_path = os.path.join(directory, "hello.txt")
+			with open(source_path, "w") as source_file:
+				source_file.write("hello world")
+			with open(os.path.join(directory, "source.yaml"), "w") as yaml_file:
+				yaml_file.write("hello:\n  regex: hello\n  tokens: []\n")
+			for name in ("A", "B"):
+				with open(os.path.join(directory, "target.yaml"), "w") as yaml_file:
+					yaml_file.write(f"hello: {name}\n")
+				with open(os.path.join(directory, name + ".ltz"), "w") as ltz_file:
+					details = LangTrans.extract_yaml_details(
+						os.path.join(directory, "source"), os.path.join(directory, "target")
+					)
+					ltz_file.write(LangTrans.encode_ruleset(details))
+			for name in ("A", "B", "A"):
+				with capture_print_output():
+					LangTrans.main(
+						["LangTrans.py", source_path, output_path, "-n"]
+						+ ["--cache-dir", cache_directory, "-f", os.path.join(directory, name)]
+					)
+				with open(output_path) as output_file:
+					self.assertEqual(output_file.read(), name + " world")
+	def test_compiled_ruleset(self):
+		with tempfile.TemporaryDirectory() as directory:
+			with open(os.path.join(directory, "source.yaml"), "w") as yaml_file:
+				yaml_file.write("num:\n  regex: (1)\n  tokens: [one]\n")
+			with open(os.path.join(directory, "target.yaml"), "w") as yaml_file:
+				yaml_file.write("num: one\n")
+			source, target = os.path.join(directory, "source"), os.path.join(directory, "target")
+			cache_directory = os.path.join(directory, "cache")
+			with capture_print_output():
+				yaml_details = LangTrans.extract_yaml_details(source, target)
+				self.assertEqual(LangTrans.load_compiled_ruleset(source, target, cache_directory), yaml_details)
+			# Loaded from cache with regexes compiled on first use
+			compiled = LangTrans.load_compiled_ruleset(source, target, cache_directory)
+			self.assertEqual(compiled, yaml_details)
+			regex = compiled[1][0][0]["num"][0]
+			self.assertIsInstance(regex, LangTrans.LazyPattern)
+			self.assertEqual(regex.search("x = 1").group(), "1")
+			# Pickled .ltz files are not loaded
+			with open(os.path.join(directory, "old.ltz"), "wb") as ltz_file:
+				ltz_file.write(b"\x80\x05N.")
+			with self.assertRaises(SystemExit), capture_print_output() as output:
+				LangTrans.load_compiled_yaml_details(os.path.join(directory, "old"))
+			self.assertIn("Compile it again", output.getvalue())
+			# Warnings are printed again when the ruleset is loaded from the cache
+			with open(os.path.join(directory, "warn.yaml"), "w") as yaml_file:
+				yaml_file.write("num: <two>\n")
+			warn_target = os.path.join(directory, "warn")
+			printed = []
+			for _ in range(2):
+				with capture_print_output() as output:
+					LangTrans.load_compiled_ruleset(source, warn_target, cache_directory)
+				printed.append(output.getvalue())
+			self.assertIn("<two> not found in tokens of num", printed[0])
+			self.assertEqual(printed[1], printed[0])
+	def test_check_source(self):
+		with tempfile.TemporaryDirectory() as directory:
+			with open(os.path.join(directory, "source.yaml"), "w") as yaml_file:
+				yaml_file.write(f"settings:\n  errfile: {os.path.join(directory, 'errors')}\nprint:\n  regex: print:(.+)\n  tokens: [value]\n")
+			with open(os.path.join(directory, "target.yaml"), "w") as yaml_file:
+				yaml_file.write("print: print(<value>)\n")
+			with open(os.path.join(directory, "errors.yaml"), "w") as yaml_file:
+				yaml_file.write("print:\n  semicolon:\n    regex: ;\n    msg: Remove ; after <value>\n  empty:\n    regex: '\"\"'\n    msg: Empty\noutside:\n  todo:\n    regex: TODO (\\w+)\n    msg: Unfinished <$1>\n")
+			with capture_print_output():
+				yaml_details = LangTrans.extract_yaml_details(os.path.join(directory, "source"), os.path.join(directory, "target"))[1]
+		found = LangTrans.check_source(yaml_details, 'print:x;\n  print:"";\n# TODO later\n')
+		self.assertEqual(
+			[(diagnostic["error"], diagnostic["line"], diagnostic["column"], diagnostic["message"]) for diagnostic in found],
+			[("todo", 3, 3, "Unfinished later"), ("semicolon", 1, 8, "Remove ; after x;"), ("semicolon", 2, 11, 'Remove ; after "";'), ("empty", 2, 9, "Empty")],
+		)
+		self.assertEqual(LangTrans.check_source(yaml_details, "print:x\n"), [])
+		# Translation stops after reporting every error of the part
+		with self.assertRaises(SystemExit), capture_print_output() as output:
+			LangTrans.convert_syntax(yaml_details, 'print:x;\nprint:"";\n')
+		self.assertEqual(output.getvalue().count("semicolon"), 2)
+		self.assertIn("Empty", output.getvalue())
+		# The reference engine stops at the first error, like the first versions
+		with self.assertRaises(SystemExit), capture_print_output() as output:
+			LangTrans.reference_translation(yaml_details, 'print:x;\nprint:"";\n')
+		self.assertEqual(output.getvalue().count("semicolon"), 1)
+		self.assertNotIn("Empty", output.getvalue())
+	def test_shadow_translation(self):
+		extracted_yaml_details = compiled_details((
+			(
+				{"print": part_rule(r"print:(\w+)")},
+				{"print": ({}, None)},
+				None,
+			),
+			{"print": "print(<x>)"},
+		))
+		content = "a\nprint:v5\nprint:v52\n"
+		self.assertTrue(LangTrans.shadow_translation(extracted_yaml_details, content, incremental=True)["identical"])
+		# str.replace also rewrites "print:v5" in "print:v52"
+		report = LangTrans.shadow_translation(extracted_yaml_details, content, splice=True)
+		self.assertFalse(report["identical"])
+		self.assertEqual(
+			(report["line"], report["reference_line"], report["candidate_line"], report["part"]),
+			(3, "print(v5)2\n", "print(v52)\n", "print"),
+		)
+		self.assertGreater(report["speedup"], 0)
+		self.assertEqual(LangTrans.reference_translation(extracted_yaml_details, content), "a\nprint(v5)\nprint(v5)2\n")
+	def test_reference_token_options(self):
+		# The reference engine applies token options like convert_syntax
+		options_yaml_details = compiled_details((
+			(
+				{
+					"block": part_rule(r"do:(\w+)((?:\n\w+)+)", ("name", "body")),
+					"word": part_rule(r"b(a\w)", ("word",), is_global=False),
+				},
+				{
+					"block": ({"name": {"replace": ((LangTrans.sanitize_regex("o"), "0"),)}, "body": {"call": ("word",), "eachline": "  <line>;"}}, None),
+					"word": ({}, None),
+				},
+				None,
+			),
+			{"block": "def <name>:<body>", "word": "B<word>"},
+		))
+		content = "do:foo\nbar\nbaz\n"
+		LangTrans.init_converter(options_yaml_details)
+		self.assertEqual(LangTrans.reference_translation(options_yaml_details, content), LangTrans.convert_syntax(options_yaml_details, content))
+	def test_timed_translation(self):
+		extracted_yaml_details = compiled_details((
+			(
+				{"print": part_rule(r"print:(\w+)")},
+				{"print": ({}, None)},
+				None,
+			),
+			{"print": "print(<x>)"},
+		))
+		# The converter is set once, outside of the timed translation
+		LangTrans.init_converter(extracted_yaml_details)
+		translator = LangTrans.current_state().translator
+		output, _, messages = LangTrans.timed_translation(lambda source: LangTrans.convert_syntax(extracted_yaml_details, source), "print:x\n")
+		self.assertEqual((output, messages), ("print(x)\n", ""))
+		self.assertIs(LangTrans.current_state().translator, translator)
+	def test_shadow_sources(self):
+		extracted_yaml_details = compiled_details((
+			(
+				{"print": part_rule(r"print:(\w+)")},
+				{"print": ({}, None)},
+				None,
+			),
+			{"print": "print(<x>)"},
+		))
+		content = "a\nprint:v5\nprint:v52\n"
+		with tempfile.TemporaryDirectory() as directory:
+			for name, source in (("a.txt", content), ("b.txt", "print:x\n")):
+				with open(os.path.join(directory, name), "w") as source_file:
+					source_file.write(source)
+			json_path = os.path.join(directory, "report.json")
+			with capture_print_output() as output:
+				different = LangTrans.shadow_sources(LangTrans.collect_sources(os.path.join(directory, "*.txt")), extracted_yaml_details, splice=True, json_path=json_path)
+			self.assertEqual(different, 1)
+			self.assertIn("line 3, part print", output.getvalue())
+			self.assertIn("Identical 1/2 files", output.getvalue())
+			with open(json_path) as json_file:
+				self.assertEqual([report["identical"] for report in json.load(json_file)], [False, True])
+	def test_reference_translation(self):
+		# Outputs of the first LangTrans version for the example ruleset
+		example = os.path.join(os.path.dirname(os.path.abspath(__file__)), "example")
+		with capture_print_output():
+			example_yaml_details = LangTrans.extract_yaml_details(os.path.join(example, "source"), os.path.join(example, "target"))[1]
+		corpus = (
+			(
+				(
+					'p"Hello World"\n'
+					"inc = (x) => x+1\n"
+					"twice(x) = 2*x\n"
+					'try inc("1") Exception print("Error:",err)\n'
+					'print((x||True)?"Done":"Failed")\n'
+					"print('x is not defined') if !x\n"
+					"1 -> inc -> print\n"
+					"print((inc+twice)(3))\n"
+					"print(list(!1..5))\n"
+					"print(!2,1..9)\n"
+					"fun hello\n"
+					"#scope1#\n"
+					'print("Scope1")\n'
+					'print("Done")\n'
+					"\n"
+					"make type name(object):\n"
+					"    x = 1\n"
+					"    if x==1:\n"
+					"      pass\n"
+					"    y = 3\n"
+					"\n"
+					"make dict test:\n"
+					'    this =  "this"\n'
+					'    if this == "this":\n'
+					"      pass\n"
+					'    that = "that"\n'
+					"\n"
+				),
+				(
+					'print("Hello World")\n'
+					"inc = lambda x: x+1\n"
+					"twice = lambda x:2*x\n"
+					"try:\n"
+					'  inc("1") Exception print("Error:",err)\n'
+					"except print(\"Done\" if (x if 'x' in locals() else True) else \"Failed\") as err:\n"
+					"  if 'x' not in locals():\n"
+					"  print('x is not defined')\n"
+					"print(inc(1))\n"
+					"print(inc(3)+twice(3))\n"
+					"print(list('1' not in locals()..5))\n"
+					"print('2' not in locals(),*range(1,9+1))\n"
+					"def hello\n"
+					"def scope1():\n"
+					' print("Scope1")\n'
+					' print("Done")\n'
+					"scope1()\n"
+					"\n"
+					"\n"
+					"def name():\n"
+					"    x = 1\n"
+					"    if x==1:\n"
+					"      return locals()\n"
+					"    y = 3\n"
+					"    return locals()\n"
+					"\n"
+					'name = type("name", (object,), name())\n'
+					"\n"
+					"\n"
+					"def test():\n"
+					'    this =  "this"\n'
+					'    if this == "this":\n'
+					"      return locals()\n"
+					'    that = "that"\n'
+					"    return locals()\n"
+					"\n"
+					"test = test()\n"
+					"\n"
+				),
+			),
+			(
+				(
+					"add(x,y) = x+y\n"
+					"1 -> inc\n"
+					"|> twice -> print\n"
+					"print<-inc<-twice<-1\n"
+					"\n"
+					"#scope2#\n"
+					'print("Scope2")\n'
+				),
+				(
+					"add = lambda x,y:x+y\n"
+					"print(twice(inc(1)))\n"
+					"print(inc(twice(1)))\n"
+					"\n"
+					"def scope2():\n"
+					"\n"
+					' print("Scope2")\n'
+					"\n"
+					"scope2()\n"
+					"\n"
+				),
+			),
+		)
+		for content, expected in corpus:
+			LangTrans.init_converter(example_yaml_details)
+			self.assertEqual(LangTrans.reference_translation(example_yaml_details, content), expected)
+			LangTrans.current_state().once_complete.clear()
+			self.assertEqual(LangTrans.convert_syntax(example_yaml_details, content), expected)
+	def test_benchmark(self):
+		self.assertEqual(Benchmark.parse_size("64KB"), 65536)
+		self.assertEqual(Benchmark.format_size(Benchmark.parse_size("1.5MB")), "1536KB")
+		source = Benchmark.generate_source(4096)
+		self.assertGreaterEqual(len(source), 4096)
+		self.assertIn("make dict", source)
+		previous = {"results": {"large": {"throughput": 100.0}, "load": {"throughput": 10.0}}}
+		latest = {"results": {"large": {"throughput": 85.0}, "load": {"throughput": 12.0}, "new": {"throughput": 1.0}}}
+		self.assertEqual(
+			[(name, regressed) for name, _, _, _, regressed in Benchmark.compare_runs(previous, latest, 10)],
+			[("large", True), ("load", False)],
+		)
+	def test_offset_location(self):
+		content = "a = 1\n\n  b = 2\nc"
+		self.assertEqual(LangTrans.line_starts(content), (0, 6, 7, 15))
+		self.assertEqual(LangTrans.offset_location(content, 0), (1, 1, 0, 5))
+		self.assertEqual(LangTrans.offset_location(content, 5), (1, 6, 0, 5))
+		self.assertEqual(LangTrans.offset_location(content, 6), (2, 1, 6, 6))
+		self.assertEqual(LangTrans.offset_location(content, 9), (3, 3, 7, 14))
+		self.assertEqual(LangTrans.offset_location(content, 15), (4, 1, 15, 16))
+		# The index belongs to the state, not to a module-level cache
+		self.assertIs(LangTrans.current_state().line_index[0], content)
+		LangTrans.init_converter(compiled_details((({}, {}, None), {})))
+		self.assertIsNone(LangTrans.current_state().line_index)
+	def test_token_pipeline(self):
+		token_options = {
+			"body": {
+				"eachline": "<line>;",
+				"replace": ((LangTrans.LazyPattern(r"\t", 8), "    "), (LangTrans.sanitize_regex(r";$"), ""), (LangTrans.sanitize_regex(r"x"), "y")),
+			},
+			"name": {"call": ("upper",)},
+			"plain": {},
+		}
+		pipeline = LangTrans.token_pipeline(token_options)
+		self.assertEqual(sorted(pipeline), ["body", "name"])
+		self.assertIs(LangTrans.token_pipeline(token_options), pipeline)
+		# Options run in their order, rules without their literal in the token are skipped
+		self.assertEqual([step.func for step in pipeline["body"]], [LangTrans.eachline_token, LangTrans.replace_token])
+		self.assertEqual([literals for _, _, literals in pipeline["body"][1].args[0]], [("\t",), (";",), ("x",)])
+		self.assertEqual(LangTrans.eachline_token(("<", ">"), "a\n  \n\tb", None), "<a>\n<\tb>")
+		self.assertEqual(LangTrans.replace_token(pipeline["body"][1].args[0], "\ta;\nx;", None), "    a\ny")
+		extracted_yaml_details = compiled_details((
+			({"upper": part_rule(r"(f)", ("c",))}, {"upper": ({}, None)}, None),
+			{"upper": "F!"},
+		))
+		LangTrans.init_converter(extracted_yaml_details)
+		self.assertEqual(
+			LangTrans.render_match(LangTrans.compile_template("def <name>(<plain>):\n<body>", ("name", "plain", "body")), {"name": "f", "plain": "\t", "body": "\tx\n\n\tz"}, token_options, None),
+			"def F!(\t):\n    y\n    z",
+		)
+	def test_startup(self):
+		import colorama
+		self.assertEqual(
+			[getattr(LangTrans.Fore, color) for color in ("RED", "GREEN", "YELLOW", "MAGENTA", "CYAN", "RESET")],
+			[getattr(colorama.Fore, color) for color in ("RED", "GREEN", "YELLOW", "MAGENTA", "CYAN", "RESET")],
+		)
+		# The entry point prints the help and the documentation without the engine
+		entry_path = os.path.join(os.path.dirname(LangTrans.__file__), "LangTrans.py")
+		for arguments, printed in (["-h"], "Arg usage:"), (["-d", os.path.join(os.path.dirname(entry_path), "example", "source")], "Language: Python"):
+			result = subprocess.run([sys.executable, "-X", "importtime", entry_path] + arguments, capture_output=True, text=True)
+			self.assertIn(printed, result.stdout)
+			self.assertNotIn("LangTransEngine", result.stderr)
+		# Names of the engine are loaded from LangTrans on first use
+		self.assertIs(importlib.import_module("LangTrans").Translator, LangTrans.Translator)
+		# Parsed builtin.yaml is shared and not changed by settings
+		builtin_path = os.path.join(os.path.dirname(LangTrans.__file__), "builtin")
+		version = LangTrans.file_versions([builtin_path + ".yaml"])[0]
+		builtin_variables = LangTrans.load_builtin_variables(builtin_path, version)
+		match_options = LangTrans.extract({"settings": {"variables": {"number": "(x)"}}, "part": {"regex": "<number>", "tokens": ["value"]}})[1][0]
+		self.assertEqual(match_options["part"][0].pattern, "(x)")
+		self.assertIs(LangTrans.load_builtin_variables(builtin_path, version), builtin_variables)
+		self.assertEqual(builtin_variables["number"], r"(\d+(?:\.\d+)?)")
+		# Invalid files are reported with a snippet with or without libyaml
+		with tempfile.TemporaryDirectory() as directory:
+			with open(os.path.join(directory, "invalid.yaml"), "w") as yaml_file:
+				yaml_file.write("a: [1, 2\nb: c\n")
+			with self.assertRaises(SystemExit), capture_print_output() as output:
+				LangTrans.load_yaml_file(os.path.join(directory, "invalid"))
+		self.assertIn("    b: c\n     ^", output.getvalue())
+	def test_backtracking(self):
+		self.assertEqual(LangTrans.backtracking_shapes(r"^((?:\t|\s)+)*#", 8), (("exponential", "nested quantifiers"),))
+		self.assertEqual(LangTrans.backtracking_shapes(r"(?:x\w|\wx)*!", 8), (("exponential", "overlapping alternatives"),))
+		self.assertEqual(LangTrans.backtracking_shapes(LangTrans.sanitize_regex(r"(\w+)=~ (\w+)").pattern, 8), (("polynomial", "adjacent quantifiers"),))
+		# Repeats that can not cross lines or that need a different character every time
+		self.assertEqual(LangTrans.backtracking_shapes(r"^(\s*)(\w+)\s*=\s*(.+)$", 8), ())
+		self.assertEqual(LangTrans.backtracking_shapes(r'("(?:[^"\\]|\\.)*")(?:\n.+)*', 8), ())
+		with capture_print_output() as output:
+			LangTrans.warn_backtracking("comment", LangTrans.sanitize_regex(r"^((?:\t|\s)+)*#(.*)"), "<tab>#(.*)", {"tab": r"^((?:\t|\s)+)*"})
+		self.assertIn("Part comment can take exponential time to match (nested quantifiers in <tab>)", output.getvalue())
+		# Variables that are only a regex together, with a backreference between them
+		variables = {"ind": r"(\n(?:((?:\t|\s)+)).*(?:(?:\n\\", "ent": r".*)*\n*)*)"}
+		with capture_print_output() as output:
+			LangTrans.warn_backtracking("fun", LangTrans.sanitize_regex(LangTrans.expand_variables(variables, r"fun (\w+):<ind>3<ent>")), r"fun (\w+):<ind>3<ent>", variables)
+		self.assertIn("Part fun can take exponential time to match (nested quantifiers in <ind>3<ent>)", output.getvalue())
+		with capture_print_output() as output:
+			example = os.path.join(os.path.dirname(os.path.abspath(__file__)), "example")
+			LangTrans.extract_yaml_details(os.path.join(example, "source"), os.path.join(example, "target"))
+		self.assertNotIn("time to match", output.getvalue())  # The example has no slow regexes
+		if LangTrans.budget_available():
+			extracted_yaml_details = compiled_details((
+				({"comment": part_rule(r"^((?:\t|\s)+)*#", ("tab",))}, {"comment": ({}, None)}, None),
+				{"comment": "<tab>//"},
+			))
+			translator = LangTrans.Translator(extracted_yaml_details, part_budget=0.05)
+			self.assertEqual(translator.translate("\t#\n").output, "\t//\n")
+			result = translator.translate("\t#\nx = 1\n" + "\t" * 40 + "x\n")
+			self.assertIsNone(result.output)
+			self.assertEqual(result.error, "Part comment exceeded the time budget of 0.05s at line 3")
 	def test_find_substring_lines(self):
 		code_lines = [
 		    "This is a test.",
@@ -0,0 +1,132 @@
+"""
+LangTrans Client
+----------------
+Sends LangTrans commands to a server started with `python langtrans.py --serve`.
+It takes the same arguments as LangTrans.py and only imports the standard library,
+so a translation does not wait for YAML files to be loaded and regexes to be compiled.
+
+Use `--socket <path>` to connect to a socket other than the default one. Use `--stop`
+to stop the server. If no server is running, the command runs in this process.
+
+License
+-------
+MIT License
+Copyright (c) 2021 Bijin Regi Panicker
+See LICENSE file for orginal text.
+"""
+import json
+import os
+import socket
+from sys import argv, exit as sys_exit
+from typing import Any, Dict, List
+
+
+def default_socket_path() -> str:
+	"""
+	Gets the default path of the server's Unix socket (same as LangTransEngine.py).
+
+	:return: Path in $XDG_RUNTIME_DIR, or in a directory of the temp directory
+		that is different for every user.
+	:rtype: str
+	"""
+	from tempfile import gettempdir
+
+	if os.environ.get("XDG_RUNTIME_DIR"):
+		return os.path.join(os.environ["XDG_RUNTIME_DIR"], "langtrans.sock")
+	user = os.getuid() if hasattr(os, "getuid") else os.getlogin()
+	return os.path.join(gettempdir(), f"langtrans-{user}", "server.sock")
+
+
+def send_request(socket_path: str, request: Dict[str, Any]) -> Dict[str, Any]:
+	"""
+	Sends a request to the server and waits for the response.
+
+	:param socket_path: Path of the server's Unix socket.
+	:type socket_path: str
+
+	:param request: Request for the server.
+	:type request: Dict[str, Any]
+
+	:return: Response of the server.
+	:rtype: Dict[str, Any]
+
+	:raises OSError: If the server is not running.
+	:raises PermissionError: If the socket belongs to another user.
+
+	The server sends the after command to run, so a socket created by another
+	user is never used.
+	"""
+	if hasattr(os, "getuid") and os.stat(socket_path).st_uid != os.getuid():
+		raise PermissionError(f"{socket_path} belongs to another user")
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:  # type: ignore[attr-defined]
+		client.connect(socket_path)
+		client.sendall(json.dumps(request).encode() + b"\n")
+		with client.makefile("rb") as response_file:
+			return json.loads(response_file.readline())
+
+
+def run_after_command(command: str, yes: bool) -> None:
+	"""
+	Runs the after command, asking the user first.
+
+	:param command: The after command.
+	:type command: str
+
+	:param yes: Run without asking.
+	:type yes: bool
+
+	:return: None
+	"""
+	if not yes:
+		print("\nEnter to run and n to exit\nCommand:", command)
+		if input().lower() == "n":
+			return
+	os.system(command)
+
+
+def main(arguments: List[str]) -> int:
+	"""
+	Runs a LangTrans command on the server.
+
+	:param arguments: Command line arguments (argv).
+	:type arguments: List[str]
+
+	:return: Exit code of the command.
+	:rtype: int
+	"""
+	arguments = list(arguments)
+	socket_path = default_socket_path()
+	if "--socket" in arguments:
+		index = arguments.index("--socket")
+		socket_path = arguments[index + 1]
+		del arguments[index : index + 2]
+	if "--stop" in arguments:
+		send_request(socket_path, {"shutdown": True})
+		return 0
+
+	try:
+		response = send_request(socket_path, {"argv": arguments, "cwd": os.getcwd()})
+	except PermissionError as error:
+		print("Error:", error)
+		return 1
+	except OSError:  # No server, run in this process
+		from LangTransEngine import init_terminal, main as run_langtrans
+
+		init_terminal()
+		try:
+			run_langtrans(arguments)
+		except SystemExit as exit_error:
+			if isinstance(exit_error.code, int) or exit_error.code is None:
+				return exit_error.code or 0
+			print(exit_error.code)
+			return 1
+		return 0
+
+	print(response["output"], end="")
+	if response["after"]:
+		run_after_command(*response["after"])
+	return response["code"]
+
+
+if __name__ == "__main__":
+	sys_exit(main(argv))
@@ -0,0 +1,7257 @@
+"""
+LangTrans Engine
+----------------
+Translates source code with the parts of a syntax (the translation engine).
+LangTrans.py runs it from the command line and loads its names on first use,
+so `from LangTrans import Translator` works too.
+
+License
+-------
+MIT License
+Copyright (c) 2021 Bijin Regi Panicker
+See LICENSE file for orginal text.
+"""
+__version__ = "1.6"
+
+from os import system
+from os.path import dirname
+import os
+import re
+from sys import exit as sys_exit
+from functools import partial, lru_cache
+from bisect import bisect_left, bisect_right
+from time import perf_counter
+from contextvars import ContextVar, copy_context
+from typing import (
+	Any,
+	Callable,
+	Iterable,
+	Iterator,
+	Match,
+	NamedTuple,
+	Pattern,
+	Dict,
+	FrozenSet,
+	Union,
+	Optional,
+	List,
+	Set,
+	Tuple,
+)
+
+from LangTransYaml import Fore, error_msg, load_yaml_file, print_yaml_documentation
+
+try:  # Python 3.11+
+	from re import _parser as sre_parse  # type: ignore[attr-defined]
+except ImportError:
+	import sre_parse
+
+
+# Types ------------------------------
+_RegexPattern = Pattern[str]  # Compiled Regex
+_StringMatch = Match[str]  # Matched String
+_ErrorDetails = Dict[str, Union[_RegexPattern, str]]
+_ErrorDictionary = Dict[str, _ErrorDetails]
+_UnmatchedPatterns = Dict[str, Tuple[_RegexPattern, ...]]
+_MatchOptions = Dict[str, "PartRule"]
+_MatchParts = Dict[str, List["PartMatch"]]
+_CleanRun = Tuple[int, int, int]  # start in old content, start in new content, length
+_CleanWindow = Tuple[int, int, int, int]  # run start(old, new), clean lines(start, end)
+_OutsideOptions = Optional[Dict[str, _ErrorDictionary]]
+_TokenPattern = Optional[Dict[str, "_CompiledTemplate"]]  # see compile_templates
+_NextOptions = Optional[Union[Tuple[str, ...]]]
+_TokenProcessingOptions = Dict[
+	str, Union[Tuple[Tuple[Union[_RegexPattern, str], str], ...], Tuple[str, ...], str]
+]
+_TokenOptions = Dict[str, _TokenProcessingOptions]
+# Step of a token pipeline, called with the token and the profile of the part
+_TokenStep = Callable[[str, Optional[Dict[str, float]]], str]
+_OperationTuples = Tuple[_TokenOptions, _NextOptions]
+_TranslationOptions = Dict[str, _OperationTuples]
+_ParseYAMLDetails = Tuple[
+	Tuple[_MatchOptions, _TranslationOptions, _OutsideOptions], _TokenPattern
+]
+_Collections = Optional[Dict[str, Optional[List[str]]]]
+_AfterProcessing = Optional[Union[List[str], str, Dict[str, str]]]
+_ArbitraryDict = Dict[str, Dict[str, Any]]
+_VariablesDict = Dict[str, str]
+_ErrorTokensDict = Dict[str, Union[str, int, float, bool]]
+_TargetStringLines = Optional[Tuple[int, int, List[str]]]
+_CompileErrorTuple = Tuple[Dict[str, _ErrorDictionary], _OutsideOptions]
+_CompiledTemplate = Tuple[
+	str,  # template
+	Tuple[str, ...],  # literals
+	Tuple[str, ...],  # token names between literals
+	_RegexPattern,  # placeholders
+]
+_ErrorChecker = Tuple[
+	Optional[_RegexPattern],  # all error regexes in one regex (None if not combinable)
+	Tuple[Tuple[str, Any, str], ...],  # name, regex and message of each error
+]
+_Diagnostic = Dict[str, Any]  # part, error, message, line, column, text, source_line
+# Output start, output end, source start, source end, part ("" for unchanged text)
+_SourceSegment = Tuple[int, int, int, int, str]
+_PartOrder = Tuple[Tuple[str, ...], ...]  # groups of parts, see dependency_order
+
+
+def expand_whitespace(regex: str) -> str:
+	"""
+	Replaces spaces with `\\s+` and `~` with `\\s*` in a regex.
+
+	:param regex: Regex from a yaml file.
+	:type regex: str
+
+	:return: Regex with optional whitespace.
+	:rtype: str
+	"""
+	return regex.replace(" ", r"\s+").replace("~", r"\s*")
+
+
+def sanitize_regex(regex: str) -> _RegexPattern:
+	"""
+	Sanitizes the regular expression pattern.
+
+	:param regex: The regular expression pattern to compile.
+	:type regex: str
+
+	:return: A compiled regular expression pattern object.
+	:rtype: _RegexPattern
+
+	:raises re.error: If the regular expression pattern is invalid.
+
+	It sanitizes the pattern by replacing spaces and `~` with regex to allow for optional
+	whitespace. It then compiles the pattern and returns the compiled.
+	"""
+
+	regex = expand_whitespace(regex)
+
+	try:
+		return re.compile(regex, 8)  # re.MULTILINE=8
+	except re.error as error:
+		print(error_msg, "Invalid regex")
+		print(error.msg)
+		print("Regex:", regex.replace("\n", r"\n").replace("\t", r"\t"))
+		if error.pos is not None:
+			print(" " * (error.pos + 7) + "^")
+		raise error
+
+
+def check_collections(calls: List[str], collections: _Collections) -> Tuple[str, ...]:
+	"""
+	Adds collections to the call list.
+
+	:param calls: A list of collection names and part names.
+	:type calls: List[str]
+
+	:param collections: A dictionary of collections and their names.
+	:type collections: _Collections
+
+	:return: A tuple of the collection-replaced call list.
+	:rtype: Tuple[str, ...]
+
+	:raises KeyError: If a collection is not found.
+
+	If a collection name starts with '$', the function looks up the collection in the
+	collections dictionary and replaces the collection name with the collection values.
+	"""
+
+	if not collections:
+		return tuple(calls)
+
+	new_collections: List[str] = []
+	for collection in calls:
+		if collection.startswith("$"):
+			collection_name = collection[1:]
+			try:
+				collection_values = collections[collection_name]
+				if collection_values is not None:
+					new_collections.extend(collection_values)
+			except KeyError as key_error:
+				raise KeyError(
+					f"Error: Collection ${collection_name} not found"
+				) from key_error
+		else:
+			new_collections.append(collection)
+
+	return tuple(new_collections)
+
+
+def extract_token_options(
+	definition: Dict[str, Any], collections: _Collections, variables: _VariablesDict
+) -> Optional[
+	Tuple[
+		_UnmatchedPatterns,
+		Dict[str, str],
+		Tuple[_TokenOptions, Optional[Tuple[str, ...]]],
+	]
+]:
+	"""
+	Extracts token options from the definition.
+
+	:param definition: Contains token options.
+	:type definition: Dict[str, Any]
+
+	:param collections: Dictionary of collections and their names.
+	:type collections: _Collections
+
+	:return: unmatched_patterns, default values, translation options, and next call list.
+	:rtype: Tuple[_UnmatchedPatterns, Dict[str, str], Tuple[_TokenOptions,
+			Optional[Tuple[str, ...]]]]
+
+	:raises KeyError: If a collection is not found.
+
+	It extracts the token options from the definition and returns the unmatched patterns,
+	default values, translation options, and next call list.
+	"""
+
+	conversion_options: _TokenOptions = {}
+	unmatched_patterns: _UnmatchedPatterns = {}
+	defaults: Dict[str, str] = {}
+	tokens: list = definition.get("tokens", [])
+
+	for token_name, options in definition.items():
+		if isinstance(options, Dict):
+			processing_options: _TokenProcessingOptions = {}
+			# Token options
+			for option, value in options.items():
+				if option == "eachline":
+					processing_options["eachline"] = value
+				elif option == "replace":
+					try:
+						processing_options["replace"] = tuple(
+							[
+								(sanitize_regex(reprgx[0]), reprgx[1])  # For replacing
+								if len(reprgx) == 2
+								else (sanitize_regex(reprgx[0]), "")  # For removing
+								for reprgx in value
+							]
+						)
+					except re.error as error:
+						print(f"Location: Replace option for token({token_name})")
+						raise error
+				elif option == "call":
+					processing_options["call"] = check_collections(value, collections)
+				elif option == "unmatch":
+					if not isinstance(value, list):
+						value = (value,)
+					try:  # Compiling regex
+						unmatched_patterns[token_name] = tuple(
+							[
+								sanitize_regex(expand_variables(variables, rgx))
+								for rgx in value
+							]
+						)
+					except re.error as error:
+						print(f"Location: Unmatch for token({token_name})")
+						raise error
+				elif option == "default":
+					defaults[token_name] = value
+			if "," in token_name:  # Splitting Token options
+				for token in token_name.split(","):
+					if token not in tokens:
+						return print(f"Error: {token} not found in tokens")  # TypeError
+					conversion_options[token] = processing_options
+				continue
+			if token_name not in tokens:
+				return print(
+					f"{error_msg} {token_name} not found in tokens"
+				)  # TypeError
+			conversion_options[token_name] = processing_options
+
+	# Next Options
+	next_value = definition.get("next", None)
+	next_collections = (
+		check_collections(next_value, collections) if next_value else None
+	)
+
+	return (
+		unmatched_patterns,
+		defaults,
+		(
+			conversion_options,
+			next_collections,
+		),
+	)
+
+
+def replace_variables(
+	global_variables: _VariablesDict,
+	source_string: str,
+) -> str:
+	"""
+	Replaces variable_name with its variable_value.
+
+	:param global_vars: A dictionary of global variables.
+	:type global_vars: _VariablesDict
+
+	:param source_string: A string containing <var_name>.
+	:type source_string: str
+
+	:return: A variable-replaced string.
+	:rtype: str
+
+	This function replaces all occurrences of variable_name in the `source_string` string
+	with their corresponding values in the `global_variables` dictionary. The replacement
+	is done in reverse order of the items to ensure that longer variable names are
+	replaced before shorter ones.
+	"""
+	for variable_name, variable_value in reversed(global_variables.items()):
+		source_string = source_string.replace(f"<{variable_name}>", variable_value)
+	return source_string
+
+
+def resolve_variables(variables: _VariablesDict) -> _VariablesDict:
+	"""
+	Expands variables used inside the value of other variables.
+
+	:param variables: A dictionary of variables.
+	:type variables: _VariablesDict
+
+	:return: A dictionary of variables without variables inside their values.
+	:rtype: _VariablesDict
+
+	Variables can be used in any order (eg. `lines: <line>+` before `line`). Every
+	value is expanded once, so expanding a string with expand_variables is a single
+	pass. The program is terminated if variables use each other in a cycle.
+	"""
+	resolved: _VariablesDict = {}
+	resolving: List[str] = []  # Variables being expanded
+
+	def resolve(variable_name: str) -> str:
+		if variable_name in resolved:
+			return resolved[variable_name]
+		if variable_name in resolving:
+			cycle = resolving[resolving.index(variable_name) :] + [variable_name]
+			sys_exit(f"{error_msg} Variables in a cycle: {' -> '.join(cycle)}")
+		resolving.append(variable_name)
+		variable_value = variables[variable_name]
+		resolved[variable_name] = placeholder_rgx.sub(
+			lambda match: (
+				resolve(match.group(1)) if match.group(1) in variables else match.group()
+			),
+			variable_value if isinstance(variable_value, str) else str(variable_value),
+		)
+		resolving.pop()
+		return resolved[variable_name]
+
+	for variable_name in variables:
+		resolve(variable_name)
+	return resolved
+
+
+def expand_variables(variables: _VariablesDict, source_string: str) -> str:
+	"""
+	Replaces every <variable_name> with its value in a single pass.
+
+	:param variables: A dictionary of variables from resolve_variables.
+	:type variables: _VariablesDict
+
+	:param source_string: A string containing <variable_name>.
+	:type source_string: str
+
+	:return: A variable-replaced string.
+	:rtype: str
+	"""
+	if "<" not in source_string:
+		return source_string
+	return placeholder_rgx.sub(
+		lambda match: variables.get(match.group(1), match.group()), source_string
+	)
+
+
+def compile_template(template: str, token_names: Tuple[str, ...]) -> _CompiledTemplate:
+	"""
+	Splits a target template into literals and token placeholders.
+
+	:param template: Target template of a part.
+	:type template: str
+
+	:param token_names: Token names of the part.
+	:type token_names: Tuple[str, ...]
+
+	:return: The template, its literals, token names between the literals and
+		regex of the placeholders.
+	:rtype: _CompiledTemplate
+	"""
+	placeholder = re.compile(
+		"<("
+		+ "|".join(
+			re.escape(name) for name in sorted(set(token_names), key=len, reverse=True)
+		)
+		+ ")>"
+		if token_names
+		else "(?!)"  # Never matches
+	)
+	literals = []
+	placeholders = []
+	position = 0
+	for match in placeholder.finditer(template):
+		literals.append(template[position : match.start()])
+		placeholders.append(match.group(1))
+		position = match.end()
+	literals.append(template[position:])
+	return template, tuple(literals), tuple(placeholders), placeholder
+
+
+def render_template(compiled: _CompiledTemplate, token_match: Dict[str, str]) -> str:
+	"""
+	Replaces token placeholders in the target template with tokens.
+
+	:param compiled: Compiled target template of a part (see compile_template).
+	:type compiled: _CompiledTemplate
+
+	:param token_match: Tokens of the match.
+	:type token_match: Dict[str, str]
+
+	:return: The rendered template.
+	:rtype: str
+
+	This gives the same result as replacing variables twice with replace_variables.
+	Only when the joined result has a new placeholder (made from tokens like "<"
+	and "name>"), the template is rendered with replace_variables.
+	"""
+	template, literals, placeholders, placeholder = compiled
+	pieces = [literals[0]]
+	for name, literal in zip(placeholders, literals[1:]):
+		pieces.append(token_match.get(name, f"<{name}>"))  # Missing groups stay
+		pieces.append(literal)
+	rendered = "".join(pieces)
+	if "<" in rendered and placeholder.search(rendered):
+		return replace_variables(token_match, replace_variables(token_match, template))
+	return rendered
+
+
+def compile_templates(
+	match_options: _MatchOptions, pattern_templates: Dict[str, Any]
+) -> Dict[str, Any]:
+	"""
+	Compiles target templates and warns about unknown placeholders.
+
+	:param match_options: Match options of the parts.
+	:type match_options: _MatchOptions
+
+	:param pattern_templates: Target templates of the parts.
+	:type pattern_templates: Dict[str, Any]
+
+	:return: Target templates, compiled if they are templates of parts.
+	:rtype: Dict[str, Any]
+
+	The compiled templates are kept in the yaml details, so rendering a match is a
+	single join (see render_template).
+	"""
+	compiled = dict(pattern_templates)
+	for part, template in pattern_templates.items():
+		if part not in match_options or not isinstance(template, str):
+			continue
+		token_names = match_options[part].tokens
+		compiled[part] = compile_template(template, token_names)
+		for name in var_rgx.findall(template):
+			if name[1:-1] not in token_names:
+				print(Fore.YELLOW + "Warning:", name, f"not found in tokens of {part}")
+	return compiled
+
+
+def compile_error_regexes(
+	error_definitions: _ArbitraryDict, global_variables: _VariablesDict
+) -> _ArbitraryDict:
+	"""
+	Compiles regex patterns for each error in the errors dictionary.
+
+	:param error_definitions: A dictionary of errors and their properties.
+	:type error_definitions: _ArbitraryDict
+
+	:param global_variables: A dictionary of global variables.
+	:type global_variables: _VariablesDict
+
+	:return: The `errors` dictionary with compiled regex patterns.
+	:rtype: _ArbitraryDict
+	"""
+	result: _ArbitraryDict = {}
+
+	for error_name, error in error_definitions.items():
+		if error_name == "outside":
+			result[error_name] = compile_error_regexes(error, global_variables)
+		else:
+			result[error_name] = error.copy()
+			result[error_name]["regex"] = sanitize_regex(
+				expand_variables(global_variables, error["regex"])
+			)
+
+	return result
+
+
+def compile_error_regex_in_file(
+	file_name: str, global_variables: _VariablesDict
+) -> _CompileErrorTuple:
+	"""
+	Compiles regexes in an error file.
+
+	:param file_name: Name of errfile.
+	:type file_name: str
+
+	:param global_variables: Global variables.
+	:type global_variables: _VariablesDict
+
+	:return: Tuple of dictionaries, one compiled error inside and one for outside part.
+	:rtype: _CompileErrorTuple
+
+	Loads an error definitions file, compiles the regular expressions in the error
+	definitions, and separates 'outside' errors.
+	"""
+	error_definitions = load_yaml_file(file_name)
+	inside_errors = {}
+	outside_errors = {}
+
+	for error_part, errors in error_definitions.items():
+		compiled_errors = compile_error_regexes(errors, global_variables)
+		if error_part == "outside":  # Outside errors not related to any part
+			outside_errors[""] = compiled_errors
+			continue
+		if "outside" in compiled_errors:
+			outside_errors[error_part] = compiled_errors.pop("outside")
+		inside_errors[error_part] = compiled_errors
+
+	return inside_errors, outside_errors
+
+
+class PartRule(NamedTuple):
+	"""
+	Match options of a part in the source yaml file.
+
+	Unlike PartMatch and MovedMatch, it is a NamedTuple instead of a class with
+	__slots__. A NamedTuple has no instance dictionary either, and as a tuple it is
+	pickled for batch workers and saved by encode_ruleset like the other tuples of
+	yaml details. Rules are immutable and made once per part, so _replace is used
+	to change them.
+	"""
+
+	regex: _RegexPattern
+	tokens: Tuple[str, ...]  # Token names
+	is_global: bool
+	unmatch: Tuple[_UnmatchedPatterns, Tuple[_RegexPattern, ...]]  # tokens, part
+	defaults: Dict[str, str]
+	once: bool
+	err: Optional[_ErrorDictionary]
+
+
+def extract(
+	spattern: _ArbitraryDict,
+) -> Tuple[
+	_AfterProcessing, Tuple[_MatchOptions, _TranslationOptions, _OutsideOptions]
+]:
+	"""
+	This function extracts contents needed from yaml file with regex.
+
+	:param spattern: Dictionary with yaml file details.
+	:return: after command and (match options, token options).
+	"""
+	# Importing builtin variables
+	builtin_path = os.path.join(dirname(__file__), "builtin")
+	variables = dict(
+		load_builtin_variables(builtin_path, *file_versions([builtin_path + ".yaml"]))
+	)
+	# Settings-------------------------------------------------------
+	errfile = outside = None
+	setting = spattern.pop("settings") if "settings" in spattern else {}
+	after = setting.get("after")
+	if "varfile" in setting:  # Importing variables from varfile
+		variables.update(load_variables(setting["varfile"]))
+	if "variables" in setting:  # Adding variables in settings
+		variables.update(setting["variables"])
+	variables = resolve_variables(variables)  # Also builtin variables without settings
+	if "errfile" in setting:
+		errfile, outside = compile_error_regex_in_file(
+			os.path.join(dirname(__file__), setting["errfile"]), variables
+		)
+	collections = setting.get("collections")
+	# ----------------------------------------------------------------
+	trans_options: _TranslationOptions = {}
+	match_options: _MatchOptions = {}
+	try:
+		for part, sdef in spattern.items():
+			for opt in sdef.values():
+				if isinstance(opt, Dict) and "replace" in opt:
+					for replace in opt[
+						"replace"
+					]:  # Replacing variables in replace option
+						replace[0] = expand_variables(variables, replace[0])
+			regex = sanitize_regex(
+				expand_variables(variables, sdef["regex"])
+			)  # Compiled regex without variables
+			tokens = tuple(sdef["tokens"])  # Token_names
+			if regex.groups != len(tokens):
+				if regex.groups == 0 and len(tokens) < 2:
+					regex = sanitize_regex(f"({regex.pattern})")
+				else:
+					print("Part:", part)
+					print("Token Names:", len(tokens), "Capture Groups:", regex.groups)
+					sys_exit(
+						error_msg
+						+ " Number of token names is not equal to number of capture groups"
+					)
+			result = extract_token_options(sdef, collections, variables)
+			if result is None:
+				print(f"Error: failed to extract token options for part: {part}")
+				continue
+
+			unmatches, defaults, tknopns = result
+
+			if match_var := var_rgx.search(regex.pattern):
+				print(Fore.YELLOW + "Warning:", match_var.group(), "not found")
+			warn_backtracking(part, regex, sdef["regex"], variables)
+			match_options[part] = PartRule(
+				regex,
+				tokens,
+				"global" not in sdef or sdef["global"],  # Checking Global
+				(  # Unmatch regexs for tokens
+					unmatches,
+					(  # Unmatch regexs for part
+						tuple(
+							[
+								sanitize_regex(expand_variables(variables, unmatch))
+								for unmatch in sdef["unmatch"]
+							]
+						)
+						if "unmatch" in sdef
+						else ()
+					),
+				),
+				defaults,
+				"once" in sdef and sdef["once"],
+				(errfile[part] if errfile and part in errfile else None),
+			)
+			trans_options[part] = tknopns
+
+	except (re.error, TypeError):  # Regex and unknown token option error
+		print(f"Part:{part}")
+		sys_exit()
+	except KeyError as key_error:  # For part without regex or tokens
+		print()
+		sys_exit()
+	return after, (match_options, trans_options, (outside or None))
+
+
+def warn_backtracking(
+	part: str, regex: _RegexPattern, source_regex: str, variables: _VariablesDict
+) -> None:
+	"""
+	Warns about shapes of a part regex that can take exponential or polynomial time
+	to match (see backtracking_shapes).
+
+	:param part: Name of the part.
+	:type part: str
+
+	:param regex: Compiled regex of the part.
+	:type regex: _RegexPattern
+
+	:param source_regex: Regex of the part in the yaml file.
+	:type source_regex: str
+
+	:param variables: Variables used in the regex.
+	:type variables: _VariablesDict
+
+	:return: None
+
+	Variables of the regex that have the same shape on their own are named as the
+	cause of the warning. Variables like <ind> and <ent> that are only a regex
+	together are tested as a pair with the text between them. Empty groups are put
+	before them, so backreferences like the 4 of <ind>4<ent> still parse.
+	"""
+	groups = "()" * regex.groups  # Groups for backreferences to the whole regex
+
+	def has_shape(variable_regex: str) -> bool:
+		try:
+			return (growth, shape) in backtracking_shapes(
+				groups + expand_whitespace(variable_regex), regex.flags
+			)
+		except re.error:  # Not a regex on its own
+			return False
+
+	names = list(var_rgx.finditer(source_regex))
+	for growth, shape in backtracking_shapes(regex.pattern, regex.flags):
+		causes = [
+			name
+			for name in dict.fromkeys(match.group() for match in names)
+			if has_shape(variables.get(name[1:-1], ""))
+		]
+		for first, second in zip(names, names[1:]):
+			if (
+				first.group() not in causes
+				and second.group() not in causes
+				and has_shape(
+					variables.get(first.group()[1:-1], "")
+					+ source_regex[first.end() : second.start()]
+					+ variables.get(second.group()[1:-1], "")
+				)
+			):
+				causes.append(source_regex[first.start() : second.end()])
+		print(
+			Fore.YELLOW + "Warning:",
+			f"Part {part} can take {growth} time to match ({shape}"
+			+ (f" in {', '.join(dict.fromkeys(causes))})" if causes else ")"),
+		)
+
+
+def line_starts(content: str) -> Tuple[int, ...]:
+	"""
+	Finds the position where every line of a document starts.
+
+	:param content: Document.
+	:type content: str
+
+	:return: Sorted start positions, the first one is 0.
+	:rtype: Tuple[int, ...]
+	"""
+	return (0, *(match.end() for match in newline_rgx.finditer(content)))
+
+
+def document_line_starts(content: str) -> Tuple[int, ...]:
+	"""
+	Gets the line starts of the document of the current translation.
+
+	:param content: Document.
+	:type content: str
+
+	:return: Sorted start positions (see line_starts).
+	:rtype: Tuple[int, ...]
+
+	The index is kept in the TranslationState until another document is located,
+	so every error of a scan searches the same index and the index is freed with
+	the state.
+	"""
+	state = current_state()
+	if state.line_index is None or state.line_index[0] is not content:
+		state.line_index = (content, line_starts(content))
+	return state.line_index[1]
+
+
+def offset_location(content: str, position: int) -> Tuple[int, int, int, int]:
+	"""
+	Finds the line and column of a position in a document.
+
+	:param content: Document.
+	:type content: str
+
+	:param position: Position in the document.
+	:type position: int
+
+	:return: Line and column (from 1), start and end (without newline) of the line.
+	:rtype: Tuple[int, int, int, int]
+	"""
+	starts = document_line_starts(content)
+	line = bisect_right(starts, position)
+	line_end = starts[line] - 1 if line < len(starts) else len(content)
+	return line, position - starts[line - 1] + 1, starts[line - 1], line_end
+
+
+def make_diagnostic(
+	error_part: str,
+	error_message: str,
+	error_name: str,
+	match: _StringMatch,
+	tokens: dict,
+	source_content: str,
+	position: int,
+) -> _Diagnostic:
+	"""
+	Creates the diagnostic of an error found in source code.
+
+	:param error_part: Name of the part where error occurred.
+	:type error_part: str
+
+	:param error_message: The error message.
+	:type error_message: str
+
+	:param error_name: The name of the error.
+	:type error_name: str
+
+	:param match: The string match object of the error.
+	:type match: _StringMatch
+
+	:param tokens: Dictionary of variables for replacement in the error message.
+	:type tokens: _VariablesDict
+
+	:param source_content: The source code content.
+	:type source_content: str
+
+	:param position: Position of the error in the source content.
+	:type position: int
+
+	:return: Part, error name, message with variables replaced, line and column
+		(from 1), matched text and the source line of the error.
+	:rtype: _Diagnostic
+	"""
+	line, column, line_start, line_end = offset_location(source_content, position)
+	return {
+		"part": error_part,
+		"error": error_name,
+		"message": replace_variables(
+			{
+				"$" + str(idx): token for idx, token in enumerate(match.groups(), start=1)
+			},  # Error variables
+			replace_variables(tokens, error_message),  # Main variables
+		),
+		"line": line,
+		"column": column,
+		"text": match.group(),
+		"source_line": source_content[line_start:line_end],
+	}
+
+
+def print_diagnostic(diagnostic: _Diagnostic) -> None:
+	"""
+	Prints a diagnostic in a colored format.
+
+	:param diagnostic: Diagnostic from make_diagnostic.
+	:type diagnostic: _Diagnostic
+
+	:return: None
+	"""
+	if diagnostic["part"]:  # Print part name
+		print(f"[{Fore.MAGENTA + diagnostic['part'] + Fore.RESET}]")
+
+	source_line = diagnostic["source_line"]
+	indent = min(len(source_line) - len(source_line.lstrip()), diagnostic["column"] - 1)
+	first_line = source_line[indent:]
+	column = diagnostic["column"] - 1 - indent
+	highlighted_part = diagnostic["text"].split("\n", 1)[0]
+	line_number = str(diagnostic["line"]) + " |"
+
+	# Print error line with error part highlighted
+	print(
+		Fore.CYAN + line_number,
+		first_line[:column]
+		+ Fore.RED
+		+ highlighted_part
+		+ Fore.RESET
+		+ first_line[column + len(highlighted_part) :],
+	)
+
+	# Print error name
+	print(
+		" " * (column + len(line_number)),
+		Fore.RED + diagnostic["error"].replace("_", " "),
+	)
+
+	# Print error message
+	print(Fore.YELLOW + diagnostic["message"])
+
+
+def report_diagnostics(found: List[_Diagnostic]) -> None:
+	"""
+	Reports diagnostics, collecting them in check mode.
+
+	:param found: Diagnostics found in a scan.
+	:type found: List[_Diagnostic]
+
+	:return: None
+
+	Outside check mode (see check_source), every diagnostic is printed and the
+	program is terminated, or TranslationError is raised (see TranslationState).
+	"""
+	if not found:
+		return
+	state = current_state()
+	if state.diagnostics is not None:
+		state.diagnostics.extend(found)
+		return
+	if state.raise_errors:
+		raise TranslationError("Syntax error", found)
+	for diagnostic in found:
+		print_diagnostic(diagnostic)
+	sys_exit()
+
+
+MEMO_TEXT_LIMIT = 4096  # Longer texts are not memoized
+
+
+class RulesetCaches:
+	"""
+	Objects created once from the yaml details of a ruleset.
+
+	Entries are keyed by id and keep the object they were created from, so an id
+	reused by another object is not mistaken for it. A Translator has its own
+	caches, so they are freed with it and never shared by two rulesets.
+	"""
+
+	__slots__ = ("sub_rulesets", "literal_triggers", "error_checkers", "token_pipelines")
+
+	def __init__(self) -> None:
+		# Match options of `call`/`next` parts by id of all match options
+		self.sub_rulesets: Dict[
+			Tuple[int, Tuple[str, ...]], Tuple[_MatchOptions, _MatchOptions]
+		] = {}
+		# Required literals of parts by id of match options
+		self.literal_triggers: Dict[
+			int, Tuple[_MatchOptions, Dict[str, FrozenSet[str]], "LiteralFinder"]
+		] = {}
+		# Compiled error checks by id of error definitions
+		self.error_checkers: Dict[int, Tuple[_ErrorDictionary, _ErrorChecker]] = {}
+		# Steps of token options by id of the token options of a part
+		self.token_pipelines: Dict[
+			int, Tuple[_TokenOptions, Dict[str, Tuple[_TokenStep, ...]]]
+		] = {}
+
+
+class TranslationState:
+	"""
+	State of the translation of a document.
+
+	:param translator: Converter for `call` and `next` options.
+	:type translator: Optional[Translator]
+
+	:param raise_errors: Raise TranslationError instead of printing errors and
+		terminating the program.
+	:type raise_errors: bool
+
+	:param part_budget: Seconds a part may take to find a match (see
+		budgeted_matches). No limit if None.
+	:type part_budget: Optional[float]
+
+	The state is read from translation_state, so every Translator.translate call
+	has its own `once` parts, diagnostics and timings. The command line uses the
+	state of its thread (see current_state).
+	"""
+
+	__slots__ = (
+		"once_complete",
+		"translator",
+		"raise_errors",
+		"diagnostics",
+		"profile_report",
+		"part_budget",
+		"local_caches",
+		"line_index",
+	)
+
+	def __init__(
+		self,
+		translator: Optional["Translator"] = None,
+		raise_errors: bool = False,
+		part_budget: Optional[float] = None,
+	) -> None:
+		self.once_complete: List[str] = []  # `once` parts that are already matched
+		self.translator = translator
+		self.raise_errors = raise_errors
+		self.part_budget = part_budget
+		# Diagnostics collected in check mode (None when errors stop the translation)
+		self.diagnostics: Optional[List[_Diagnostic]] = None
+		# Timings collected in --profile mode (None when not profiling)
+		self.profile_report: Optional[Dict[str, Any]] = None
+		self.local_caches: Optional[RulesetCaches] = None  # Used without translator
+		# Document and its line starts (see document_line_starts)
+		self.line_index: Optional[Tuple[str, Tuple[int, ...]]] = None
+
+	@property
+	def caches(self) -> RulesetCaches:
+		"""
+		Caches of the translator, or of this state when there is no translator.
+		"""
+		if self.translator is not None:
+			return self.translator.caches
+		if self.local_caches is None:
+			self.local_caches = RulesetCaches()
+		return self.local_caches
+
+
+# No default: a default state would be shared by every thread (see current_state)
+translation_state: ContextVar[TranslationState] = ContextVar("translation_state")
+
+
+def current_state() -> TranslationState:
+	"""
+	Gets the translation state of the current context, creating it the first time.
+
+	:return: The translation state.
+	:rtype: TranslationState
+	"""
+	try:
+		return translation_state.get()
+	except LookupError:
+		state = TranslationState()
+		translation_state.set(state)
+		return state
+
+
+class TranslationError(Exception):
+	"""
+	Error that stops a translation with raise_errors (see TranslationState).
+
+	:param message: Description of the error.
+	:type message: str
+
+	:param diagnostics: Errors found in the source code (see make_diagnostic).
+	:type diagnostics: Iterable[_Diagnostic]
+	"""
+
+	def __init__(self, message: str, diagnostics: Iterable[_Diagnostic] = ()) -> None:
+		super().__init__(message)
+		self.diagnostics = list(diagnostics)
+
+
+def start_profile() -> None:
+	"""
+	Starts collecting timings of parts.
+
+	:return: None
+	"""
+	current_state().profile_report = {
+		"parts": {},
+		"iterations": {},
+		"depth": 0,
+		"max_depth": 0,
+	}
+
+
+def part_profile(part: str) -> Dict[str, float]:
+	"""
+	Gets the timings of a part in the profile report.
+
+	:param part: Name of the part.
+	:type part: str
+
+	:return: Seconds spent in matching, checks (tokens, unmatch and err), token
+		options, rendering and `call`/`next` recursion and the number of matches.
+	:rtype: Dict[str, float]
+	"""
+	profile_report = current_state().profile_report
+	assert profile_report is not None
+	parts = profile_report["parts"]
+	if part not in parts:
+		parts[part] = dict.fromkeys(
+			("match", "checks", "tokens", "render", "recursion", "matches"), 0.0
+		)
+	return parts[part]
+
+
+def count_iterations(iteration_count: int) -> None:
+	"""
+	Adds a conversion to the iteration histogram of the profile report.
+
+	:param iteration_count: Number of iterations of the conversion.
+	:type iteration_count: int
+
+	:return: None
+	"""
+	profile_report = current_state().profile_report
+	assert profile_report is not None
+	histogram = profile_report["iterations"]
+	histogram[iteration_count] = histogram.get(iteration_count, 0) + 1
+
+
+def timed_matches(
+	matches: Iterator[_StringMatch], stats: Dict[str, float]
+) -> Iterator[_StringMatch]:
+	"""
+	Measures the time the regex takes to find each match.
+
+	:param matches: Matches from finditer.
+	:type matches: Iterator[_StringMatch]
+
+	:param stats: Timings of the part.
+	:type stats: Dict[str, float]
+
+	:return: The same matches.
+	:rtype: Iterator[_StringMatch]
+	"""
+	while True:
+		started = perf_counter()
+		match = next(matches, None)
+		stats["match"] += perf_counter() - started
+		if match is None:
+			return
+		yield match
+
+
+class PartTimeout(Exception):
+	"""
+	Raised by the alarm signal when a part exceeds its time budget.
+	"""
+
+
+def raise_part_timeout(signal_number: int, frame: Any) -> None:
+	"""
+	Signal handler of budgeted_matches.
+
+	:raises PartTimeout: Always.
+	"""
+	raise PartTimeout()
+
+
+def budget_available() -> bool:
+	"""
+	Checks whether a time budget can stop a match in this thread.
+
+	:return: True on POSIX systems in the main thread.
+	:rtype: bool
+
+	Only the main thread receives signals, and SRE only stops a running match to
+	handle a signal.
+	"""
+	import signal
+	import threading
+
+	return (
+		hasattr(signal, "setitimer")
+		and threading.current_thread() is threading.main_thread()
+	)
+
+
+def budgeted_matches(
+	matches: Iterator[_StringMatch],
+	part: str,
+	part_pattern: _RegexPattern,
+	source_content: str,
+	start: int,
+	end: int,
+	budget: float,
+) -> Iterator[_StringMatch]:
+	"""
+	Stops a part that takes longer than its time budget to find a match.
+
+	:param matches: Matches from finditer.
+	:type matches: Iterator[_StringMatch]
+
+	:param part: Name of the part.
+	:type part: str
+
+	:param part_pattern: Regex of the part.
+	:type part_pattern: _RegexPattern
+
+	:param source_content: Source code that is matched.
+	:type source_content: str
+
+	:param start: Position the part starts matching from.
+	:type start: int
+
+	:param end: Position the part stops matching at.
+	:type end: int
+
+	:param budget: Seconds the part may take to find each match.
+	:type budget: float
+
+	:return: The same matches.
+	:rtype: Iterator[_StringMatch]
+
+	The budget is measured with SIGALRM, so it must only be used when
+	budget_available. A runaway match is reported with exceed_part_budget.
+	"""
+	import signal
+
+	position = start  # Where the search for the next match starts
+	previous_handler = signal.signal(signal.SIGALRM, raise_part_timeout)
+	try:
+		while True:
+			try:
+				signal.setitimer(signal.ITIMER_REAL, budget)
+				match = next(matches, None)
+				signal.setitimer(signal.ITIMER_REAL, 0)
+			except PartTimeout:
+				exceed_part_budget(
+					part,
+					budget,
+					runaway_line(part_pattern, source_content, position, end, budget),
+				)
+			if match is None:
+				return
+			position = match.end()
+			yield match
+	finally:
+		signal.setitimer(signal.ITIMER_REAL, 0)
+		signal.signal(signal.SIGALRM, previous_handler)
+
+
+def runaway_line(
+	part_pattern: _RegexPattern, source_content: str, start: int, end: int, budget: float
+) -> int:
+	"""
+	Finds the line where a search that exceeded the time budget got stuck.
+
+	:param part_pattern: Regex of the part.
+	:type part_pattern: _RegexPattern
+
+	:param source_content: Source code that was matched.
+	:type source_content: str
+
+	:param start: Position where the search that exceeded the budget started.
+	:type start: int
+
+	:param end: Position the search stops at.
+	:type end: int
+
+	:param budget: Seconds a search may take.
+	:type budget: float
+
+	:return: Line number of the last line that a search exceeds the budget from.
+	:rtype: int
+
+	A search from a later line than the stuck one finishes in time, and a search
+	from an earlier line (without matches before the stuck line) does not, so the
+	line is found with a binary search over the lines. Must be called with the
+	signal handler of budgeted_matches.
+	"""
+	import signal
+
+	starts = document_line_starts(source_content)
+	stuck, finished = bisect_right(starts, start) - 1, bisect_left(starts, end)
+	while finished - stuck > 1:
+		middle = (stuck + finished) // 2
+		try:
+			signal.setitimer(signal.ITIMER_REAL, budget)
+			part_pattern.search(source_content, starts[middle], end)
+			signal.setitimer(signal.ITIMER_REAL, 0)
+			finished = middle
+		except PartTimeout:
+			stuck = middle
+	return stuck + 1
+
+
+def exceed_part_budget(part: str, budget: float, line: int) -> None:
+	"""
+	Terminates the program when a part exceeds its time budget.
+
+	:param part: Name of the part.
+	:type part: str
+
+	:param budget: Seconds the part could take to find a match.
+	:type budget: float
+
+	:param line: Line where the match got stuck (see runaway_line).
+	:type line: int
+
+	:return: None
+
+	:raises TranslationError: With raise_errors (see TranslationState).
+	"""
+	message = f"Part {part} exceeded the time budget of {budget:g}s at line {line}"
+	if current_state().raise_errors:
+		raise TranslationError(message)
+	print(error_msg, message)
+	print("Check the regex of the part for nested quantifiers")
+	sys_exit()
+
+
+def convert_recursively(
+	content: str, conversion_parts: Tuple[str, ...], stats: Optional[Dict[str, float]]
+) -> str:
+	"""
+	Converts content with the `call` or `next` parts of a part.
+
+	:param content: Token or rendered template.
+	:type content: str
+
+	:param conversion_parts: Parts to convert.
+	:type conversion_parts: Tuple[str, ...]
+
+	:param stats: Timings of the calling part (None when not profiling).
+	:type stats: Optional[Dict[str, float]]
+
+	:return: Converted content.
+	:rtype: str
+	"""
+	state = current_state()
+	assert state.translator is not None, "Converter not set (see init_converter)"
+	profile_report = state.profile_report
+	if stats is None or profile_report is None:
+		return state.translator.convert(content, conversion_parts)
+	profile_report["depth"] += 1
+	profile_report["max_depth"] = max(profile_report["max_depth"], profile_report["depth"])
+	started = perf_counter()
+	try:
+		return state.translator.convert(content, conversion_parts)
+	finally:
+		stats["recursion"] += perf_counter() - started
+		profile_report["depth"] -= 1
+
+
+def stop_profile(total_time: float) -> Optional[Dict[str, Any]]:
+	"""
+	Stops collecting timings and summarizes them.
+
+	:param total_time: Seconds taken by the whole translation.
+	:type total_time: float
+
+	:return: Parts ranked by their own time (without recursion), the iteration
+		histogram and the maximum recursion depth. None if not profiling.
+	:rtype: Optional[Dict[str, Any]]
+	"""
+	state = current_state()
+	report, state.profile_report = state.profile_report, None
+	if report is None:
+		return None
+	memo = state.translator.memo if state.translator is not None else None
+	parts = []
+	for part, stats in report["parts"].items():
+		own_time = stats["match"] + stats["checks"] + stats["tokens"] + stats["render"]
+		parts.append({"part": part, **stats, "matches": int(stats["matches"]), "self": own_time})
+	parts.sort(key=lambda stats: stats["self"], reverse=True)
+	return {
+		"total": total_time,
+		"parts": parts,
+		"iterations": {
+			str(count): conversions
+			for count, conversions in sorted(report["iterations"].items())
+		},
+		"max_depth": report["max_depth"],
+		"memo": memo.cache_info()._asdict() if memo is not None else None,
+	}
+
+
+def print_profile(summary: Dict[str, Any]) -> None:
+	"""
+	Prints the summary of stop_profile as a table in milliseconds.
+
+	:param summary: Summary from stop_profile.
+	:type summary: Dict[str, Any]
+
+	:return: None
+	"""
+	columns = ("match", "checks", "tokens", "render", "recursion", "self")
+	print(
+		f"{'Part':<24}{'Matches':>9}"
+		+ "".join(f"{column.title():>11}" for column in columns)
+		+ f"{'%':>7}"
+	)
+	total_time = summary["total"] or 1.0
+	for stats in summary["parts"]:
+		print(
+			f"{stats['part']:<24}{stats['matches']:>9}"
+			+ "".join(f"{stats[column] * 1000:>11.2f}" for column in columns)
+			+ f"{stats['self'] * 100 / total_time:>7.1f}"
+		)
+	histogram = ", ".join(
+		f"{count}: {conversions}" for count, conversions in summary["iterations"].items()
+	)
+	print("Iterations (iterations: conversions):", histogram or "-")
+	print("Max recursion depth:", summary["max_depth"])
+	if summary["memo"] is not None:
+		print("Call/next memo: {hits} hits, {misses} misses".format(**summary["memo"]))
+	print(f"Total: {summary['total'] * 1000:.2f} ms")
+
+
+def part_enabled(part: str, is_global: bool, once: bool, is_recursion: bool) -> bool:
+	"""
+	Checks whether a part should be matched in this pass.
+
+	:param part: Name of the part.
+	:type part: str
+
+	:param is_global: `global` option of the part.
+	:type is_global: bool
+
+	:param once: `once` option of the part.
+	:type once: bool
+
+	:param is_recursion: Boolean to find if the convert function is in recursion or not.
+	:type is_recursion: bool
+
+	:return: True if the part should be matched.
+	:rtype: bool
+
+	Non-global parts are only matched through `call` and `next`. A `once` part is
+	marked as complete the first time it is checked.
+	"""
+	if is_recursion:
+		return True
+	if not is_global:
+		return False
+	if once:
+		once_complete = current_state().once_complete
+		if part in once_complete:
+			return False
+		once_complete.append(part)
+	return True
+
+
+class MovedMatch:
+	"""
+	Match whose text and groups were extracted from the content it matched.
+
+	PartMatch.moved uses it for matches kept in the next content, so the previous
+	content is not kept alive by its match objects.
+	"""
+
+	__slots__ = ("span", "text", "token_groups")
+
+	def __init__(
+		self, span: Tuple[int, int], text: str, token_groups: Tuple[Optional[str], ...]
+	) -> None:
+		self.span = span
+		self.text = text
+		self.token_groups = token_groups
+
+	def start(self) -> int:
+		return self.span[0]
+
+	def end(self) -> int:
+		return self.span[1]
+
+	def group(self) -> str:
+		return self.text
+
+	def groups(self) -> Tuple[Optional[str], ...]:
+		return self.token_groups
+
+
+class PartMatch:
+	"""
+	Match of a part that extracts its text and tokens only when they are used.
+
+	:param match: Match of the part regex.
+	:type match: Union[_StringMatch, MovedMatch]
+
+	:param rule: Match options of the part.
+	:type rule: PartRule
+
+	Only the match object is kept, so matches dropped by overlaps or by the loop
+	limit never create the substrings and the dictionary of their tokens.
+	"""
+
+	__slots__ = ("match", "rule")
+
+	def __init__(self, match: Union[_StringMatch, MovedMatch], rule: PartRule) -> None:
+		self.match = match
+		self.rule = rule
+
+	@property
+	def start(self) -> int:
+		return self.match.start()
+
+	@property
+	def end(self) -> int:
+		return self.match.end()
+
+	@property
+	def text(self) -> str:
+		return self.match.group()
+
+	@property
+	def tokens(self) -> Dict[str, str]:
+		"""
+		Tokens of the match, with the defaults of the part for groups that did not
+		participate in the match.
+
+		:return: New dictionary of token names and strings.
+		:rtype: Dict[str, str]
+		"""
+		defaults = self.rule.defaults
+		return {
+			token_name: token if token is not None else defaults.get(token_name, "")
+			for token_name, token in zip(self.rule.tokens, self.match.groups())
+		}
+
+	def moved(self, shift: int) -> "PartMatch":
+		"""
+		Copies the match for content in which its text starts shift characters later.
+
+		:param shift: Change of the position.
+		:type shift: int
+
+		:return: Match with its text and groups extracted (see MovedMatch).
+		:rtype: PartMatch
+		"""
+		match = self.match
+		return PartMatch(
+			MovedMatch(
+				(match.start() + shift, match.end() + shift), match.group(), match.groups()
+			),
+			self.rule,
+		)
+
+	def __repr__(self) -> str:
+		return repr((self.text, self.tokens))
+
+
+def scan_part(
+	source_content: str,
+	part: str,
+	options: PartRule,
+	start: int = 0,
+	end: Optional[int] = None,
+) -> List[PartMatch]:
+	"""
+	Matches a single part in source code.
+
+	:param source_content: source code.
+	:type source_content: str
+
+	:param part: Name of the part.
+	:type part: str
+
+	:param options: Options of the part in yaml file.
+	:type options: PartRule
+
+	:param start: Position to start matching from.
+	:type start: int
+
+	:param end: Position to stop matching at. Matches the whole content if None.
+	:type end: Optional[int]
+
+	:return: Matches of the part.
+	:rtype: List[PartMatch]
+
+	This function skips matches rejected by `unmatch` options and reports errors
+	defined for the part. Every error in the matches is reported before the program
+	is terminated (see report_diagnostics). With a part_budget in the
+	TranslationState, a runaway match is stopped (see budgeted_matches). Tokens are
+	only extracted here for `unmatch` options of tokens and errors.
+	"""
+	part_pattern = options.regex
+	unmatched_tokens, unmatched_parts = options.unmatch
+	err = options.err
+	part_match: List[PartMatch] = []  # Part matches
+	found: List[_Diagnostic] = []  # Errors in matches
+	end = len(source_content) if end is None else end
+	matches = part_pattern.finditer(source_content, start, end)
+	state = current_state()
+	if state.part_budget and budget_available():
+		matches = budgeted_matches(
+			matches, part, part_pattern, source_content, start, end, state.part_budget
+		)
+	profiling = state.profile_report is not None
+	if profiling:
+		stats = part_profile(part)
+		started, match_time = perf_counter(), stats["match"]
+		matches = timed_matches(matches, stats)
+	for match in matches:
+		if unmatched_parts:
+			match_string = match.group()
+			if any((bool(rgx.search(match_string)) for rgx in unmatched_parts)):
+				continue
+		record = PartMatch(match, options)
+		if err:  # Static Code Analysis
+			token_match = record.tokens
+			found.extend(
+				make_diagnostic(
+					part,
+					error_message,
+					name,
+					err_match,
+					token_match,
+					source_content,
+					match.start() + err_match.start(),
+				)
+				for name, err_match, error_message in find_errors(
+					error_checker(err), match.group()
+				)
+			)
+		if unmatched_tokens and any(
+			(  # Checking unmatch on every token
+				bool(rgx.search(token_string))
+				for token_match_name, token_string in record.tokens.items()
+				for rgx in unmatched_tokens.get(token_match_name, ())
+			)
+		):
+			continue
+		part_match.append(record)
+	if profiling:
+		stats["checks"] += perf_counter() - started - (stats["match"] - match_time)
+		stats["matches"] += len(part_match)
+	report_diagnostics(found)
+	return part_match
+
+
+class LiteralFinder:
+	"""
+	Finds which of many literals occur in a text with one regex search.
+
+	:param literals: Literals to search.
+	:type literals: FrozenSet[str]
+
+	The regex is a lookahead alternation of the literals, longest first, so it
+	finds the longest literal at every position. Shorter literals inside a found
+	literal are added from the literals it contains.
+	"""
+
+	__slots__ = ("regex", "contained")
+
+	def __init__(self, literals: FrozenSet[str]) -> None:
+		ordered = sorted(literals, key=lambda literal: (-len(literal), literal))
+		self.regex: Optional[_RegexPattern] = (
+			re.compile("(?=(" + "|".join(map(re.escape, ordered)) + "))")
+			if ordered
+			else None
+		)
+		self.contained = {
+			literal: frozenset(other for other in literals if other in literal)
+			for literal in literals
+		}
+
+	def find(self, text: str) -> Set[str]:
+		"""
+		Finds the literals in a text.
+
+		:param text: Text to search.
+		:type text: str
+
+		:return: Literals that occur in the text.
+		:rtype: Set[str]
+		"""
+		if self.regex is None:
+			return set()
+		longest = set(self.regex.findall(text))  # Longest literal at each position
+		return set().union(*(self.contained[literal] for literal in longest))
+
+
+def part_triggers(
+	match_options: _MatchOptions,
+) -> Tuple[Dict[str, FrozenSet[str]], LiteralFinder]:
+	"""
+	Gets the required literals of every part, finding them once per ruleset.
+
+	:param match_options: Options for each part in yaml file.
+	:type match_options: _MatchOptions
+
+	:return: Literals of each part (see required_literals) and a finder of all
+		literals.
+	:rtype: Tuple[Dict[str, FrozenSet[str]], LiteralFinder]
+	"""
+	literal_triggers = current_state().caches.literal_triggers
+	cached = literal_triggers.get(id(match_options))
+	if cached is None or cached[0] is not match_options:  # id of a new ruleset
+		triggers = {
+			part: required_literals(options.regex.pattern, options.regex.flags)
+			for part, options in match_options.items()
+		}
+		finder = LiteralFinder(frozenset().union(*triggers.values()))
+		cached = (match_options, triggers, finder)
+		literal_triggers[id(match_options)] = cached
+	return cached[1], cached[2]
+
+
+def possible_parts(source_content: str, match_options: _MatchOptions) -> Set[str]:
+	"""
+	Finds the parts that can match source code from their required literals.
+
+	:param source_content: source code.
+	:type source_content: str
+
+	:param match_options: Options for each part in yaml file.
+	:type match_options: _MatchOptions
+
+	:return: Names of the parts whose regex needs to be matched.
+	:rtype: Set[str]
+
+	All literals are found in one pass over the source (see LiteralFinder), so parts
+	that cannot occur in the source are skipped before their regex runs.
+	"""
+	triggers, finder = part_triggers(match_options)
+	found = finder.find(source_content)
+	return {
+		part
+		for part, part_literals in triggers.items()
+		if not part_literals or not part_literals.isdisjoint(found)
+	}
+
+
+def match_parts(
+	source_content: str, match_options: _MatchOptions, is_recursion: bool
+) -> _MatchParts:
+	"""
+	Matches parts of source code.
+
+	:param source_code: source code.
+	:type source_code: str
+
+	:param match_options: Options for each part in yaml file.
+	:type match_options: _MatchOptions
+
+	:param is_recursive: Boolean to find if the convert function is in recursion or not.
+	:type is_recursive: bool
+
+	:return: Return matched parts (see PartMatch).
+	:rtype: _MatchParts
+
+	This function takes in source code and match options for each part and returns
+	matched parts and tokens. It also checks for errors in the source code and
+	terminates the program if any error is found. Parts without their required
+	literals in the source code are skipped (see possible_parts).
+	"""
+
+	part_matches = {}
+	candidates = possible_parts(source_content, match_options)
+	for part, options in match_options.items():
+		if not part_enabled(part, options.is_global, options.once, is_recursion):
+			continue
+		if part not in candidates:
+			continue
+		part_match = scan_part(source_content, part, options)
+		if part_match:
+			part_matches.update({part: part_match})
+	return part_matches
+
+
+def newline_capacity(subpattern: Any, flags: int) -> int:
+	"""
+	Counts how many newlines a parsed regex can match.
+
+	:param subpattern: Parsed regex from sre_parse.
+	:type subpattern: Any
+
+	:param flags: Regex flags active for the subpattern.
+	:type flags: int
+
+	:return: 0 for none, 1 for a single newline and 2 for more than one.
+	:rtype: int
+
+	Lookarounds are counted like normal groups because they can look at text across
+	lines. Backreferences and string anchors (\\A, \\Z) are counted as 2.
+	"""
+	capacity = 0
+	for operation, value in subpattern:
+		name = str(operation)
+		if name == "LITERAL":
+			count = int(value == 10)
+		elif name == "NOT_LITERAL":
+			count = int(value != 10)
+		elif name == "ANY":
+			count = int(bool(flags & re.DOTALL))
+		elif name == "IN":
+			count = int(set_matches_newline(value))
+		elif name == "AT":
+			count = 2 if str(value) in ("AT_BEGINNING_STRING", "AT_END_STRING") else 0
+		elif name == "BRANCH":
+			count = max(newline_capacity(branch, flags) for branch in value[1])
+		elif name == "SUBPATTERN":
+			_, add_flags, del_flags, group = value
+			count = newline_capacity(group, (flags | add_flags) & ~del_flags)
+		elif name == "ATOMIC_GROUP":
+			count = newline_capacity(value, flags)
+		elif name in ("ASSERT", "ASSERT_NOT"):
+			count = newline_capacity(value[1], flags)
+		elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+			_, max_repeat, item = value
+			count = min(2, newline_capacity(item, flags) * max_repeat)
+		elif name == "GROUPREF_EXISTS":
+			_, yes, no = value
+			count = max(
+				newline_capacity(yes, flags), newline_capacity(no, flags) if no else 0
+			)
+		else:  # Backreferences and unknown operations
+			count = 2
+		capacity = min(2, capacity + count)
+	return capacity
+
+
+def set_matches_newline(items: List[Tuple[Any, Any]]) -> bool:
+	"""
+	Checks whether a parsed character set ([...], \\s, etc.) matches a newline.
+
+	:param items: Items of the parsed character set.
+	:type items: List[Tuple[Any, Any]]
+
+	:return: True if the set matches a newline.
+	:rtype: bool
+	"""
+	negate = False
+	matches = False
+	for operation, value in items:
+		name = str(operation)
+		if name == "NEGATE":
+			negate = True
+		elif name == "LITERAL":
+			matches = matches or value == 10
+		elif name == "RANGE":
+			matches = matches or value[0] <= 10 <= value[1]
+		elif name == "CATEGORY":
+			matches = matches or str(value) in (
+				"CATEGORY_SPACE",
+				"CATEGORY_NOT_DIGIT",
+				"CATEGORY_NOT_WORD",
+				"CATEGORY_LINEBREAK",
+			)
+		else:
+			return True
+	return matches != negate
+
+
+@lru_cache(maxsize=None)
+def is_line_local(regex: str, flags: int) -> bool:
+	"""
+	Checks whether every match of a regex lies inside a single line.
+
+	:param regex: Sanitized regex.
+	:type regex: str
+
+	:param flags: Flags of the compiled regex.
+	:type flags: int
+
+	:return: True if the regex can neither match nor look at a newline.
+	:rtype: bool
+
+	Matches of a line-local regex depend only on the text of their line. Regexes
+	that can match an empty string are never line-local.
+	"""
+	parsed = sre_parse.parse(regex, flags)
+	if parsed.getwidth()[0] == 0:
+		return False
+	return newline_capacity(parsed, flags | parsed.state.flags) == 0
+
+
+def text_line_span(subpattern: Any, flags: int) -> Optional[int]:
+	"""
+	Counts how many times a parsed regex can move to another line with text.
+
+	:param subpattern: Parsed regex from sre_parse.
+	:type subpattern: Any
+
+	:param flags: Regex flags active for the subpattern.
+	:type flags: int
+
+	:return: Number of newlines it can cross, None if there is no limit.
+	:rtype: Optional[int]
+
+	A repeat that only matches whitespace (like the `\\s+` of a space) counts once,
+	because the lines between its first and last line are empty. Lookarounds are
+	counted like normal groups. Backreferences, string anchors, ^ and $ without
+	MULTILINE and unknown operations have no limit.
+	"""
+	span = 0
+	for operation, value in subpattern:
+		name = str(operation)
+		count: Optional[int]
+		if name in ("LITERAL", "NOT_LITERAL", "ANY", "IN"):
+			count = int(matches_character(name, value, "\n", bool(flags & re.DOTALL)))
+		elif name == "AT":
+			anchors = ["AT_BEGINNING_STRING", "AT_END_STRING"]
+			if not flags & re.MULTILINE:
+				anchors += ["AT_BEGINNING", "AT_END"]
+			count = None if str(value) in anchors else 0
+		elif name == "BRANCH":
+			counts = [text_line_span(branch, flags) for branch in value[1]]
+			count = None if None in counts else max(counts)  # type: ignore[type-var]
+		elif name == "SUBPATTERN":
+			_, add_flags, del_flags, group = value
+			count = text_line_span(group, (flags | add_flags) & ~del_flags)
+		elif name == "ATOMIC_GROUP":
+			count = text_line_span(value, flags)
+		elif name in ("ASSERT", "ASSERT_NOT"):
+			count = text_line_span(value[1], flags)
+		elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+			_, max_repeat, item = value
+			count = text_line_span(item, flags)
+			if count and matches_only_whitespace(item):
+				count = 1
+			elif count and max_repeat == sre_parse.MAXREPEAT:
+				count = None
+			elif count:
+				count *= max_repeat
+		elif name == "GROUPREF_EXISTS":
+			_, yes, no = value
+			counts = [text_line_span(yes, flags), text_line_span(no, flags) if no else 0]
+			count = None if None in counts else max(counts)  # type: ignore[type-var]
+		else:  # Backreferences and unknown operations
+			count = None
+		if count is None:
+			return None
+		span += count
+	return span
+
+
+@lru_cache(maxsize=None)
+def line_span(regex: str, flags: int) -> Optional[int]:
+	"""
+	Finds how many times a match of a regex can move to another line with text.
+
+	:param regex: Sanitized regex.
+	:type regex: str
+
+	:param flags: Flags of the compiled regex.
+	:type flags: int
+
+	:return: Limit from text_line_span, None if there is no limit.
+	:rtype: Optional[int]
+
+	Like in is_line_local, regexes that can match an empty string have no limit.
+	"""
+	parsed = sre_parse.parse(regex, flags)
+	if parsed.getwidth()[0] == 0:
+		return None
+	return text_line_span(parsed, flags | parsed.state.flags)
+
+
+def anchors_to_chunk(subpattern: Any, flags: int) -> bool:
+	"""
+	Checks whether a parsed regex depends on the text before or after a chunk.
+
+	:param subpattern: Parsed regex from sre_parse.
+	:type subpattern: Any
+
+	:param flags: Regex flags active for the subpattern.
+	:type flags: int
+
+	:return: True if it has ^ or $ without MULTILINE or a lookbehind that can see
+		a newline.
+	:rtype: bool
+	"""
+	for operation, value in subpattern:
+		name = str(operation)
+		if name == "AT":
+			if str(value) in ("AT_BEGINNING", "AT_END") and not flags & re.MULTILINE:
+				return True
+		elif name == "BRANCH":
+			if any(anchors_to_chunk(branch, flags) for branch in value[1]):
+				return True
+		elif name == "SUBPATTERN":
+			_, add_flags, del_flags, group = value
+			if anchors_to_chunk(group, (flags | add_flags) & ~del_flags):
+				return True
+		elif name == "ATOMIC_GROUP":
+			if anchors_to_chunk(value, flags):
+				return True
+		elif name in ("ASSERT", "ASSERT_NOT"):
+			direction, assertion = value
+			if direction < 0 and newline_capacity(assertion, flags):
+				return True
+			if anchors_to_chunk(assertion, flags):
+				return True
+		elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+			if anchors_to_chunk(value[2], flags):
+				return True
+		elif name == "GROUPREF_EXISTS":
+			_, yes, no = value
+			if anchors_to_chunk(yes, flags) or (no and anchors_to_chunk(no, flags)):
+				return True
+	return False
+
+
+def matches_text(name: str, value: Any) -> bool:
+	"""
+	Checks whether a parsed single-character item can match a character that is not
+	whitespace.
+
+	:param name: Operation of the item (LITERAL, IN, CATEGORY, etc.).
+	:type name: str
+
+	:param value: Value of the item.
+	:type value: Any
+
+	:return: False if the item only matches whitespace. Unknown items match text.
+	:rtype: bool
+	"""
+	if name == "LITERAL":
+		return not chr(value).isspace()
+	if name == "CATEGORY":
+		return str(value) not in ("CATEGORY_SPACE", "CATEGORY_LINEBREAK")
+	if name == "IN":
+		if value and str(value[0][0]) == "NEGATE":  # [^\S...] only matches whitespace
+			return all(str(item) != "CATEGORY_NOT_SPACE" for _, item in value[1:])
+		return any(matches_text(str(operation), item) for operation, item in value)
+	return True
+
+
+def matches_only_whitespace(subpattern: Any) -> bool:
+	"""
+	Checks whether a parsed regex only consumes whitespace, like indentation.
+
+	:param subpattern: Parsed regex from sre_parse.
+	:type subpattern: Any
+
+	:return: True if every character it can match is whitespace.
+	:rtype: bool
+	"""
+	for operation, value in subpattern:
+		name = str(operation)
+		if name in ("LITERAL", "IN"):
+			if matches_text(name, value):
+				return False
+		elif name == "SUBPATTERN":
+			if not matches_only_whitespace(value[3]):
+				return False
+		elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+			if not matches_only_whitespace(value[2]):
+				return False
+		elif name == "BRANCH":
+			if not all(matches_only_whitespace(branch) for branch in value[1]):
+				return False
+		else:
+			return False
+	return True
+
+
+def boundary_crossing(
+	subpattern: Any, flags: int, boundary: str
+) -> Tuple[bool, bool, bool, bool]:
+	"""
+	Checks how a parsed regex can touch a chunk boundary (see read_chunks).
+
+	:param subpattern: Parsed regex from sre_parse.
+	:type subpattern: Any
+
+	:param flags: Regex flags active for the subpattern.
+	:type flags: int
+
+	:param boundary: "blank" for a chunk that starts with an empty line and
+		"indentation" for a chunk that starts with a line without indentation.
+	:type boundary: str
+
+	:return: Whether it can match an empty string, start with the first character of
+		a chunk, end with the newline of the chunk before and match across a boundary.
+	:rtype: Tuple[bool, bool, bool, bool]
+
+	A boundary is a newline followed by a newline or by a character that is not
+	whitespace. Anchors and lookaheads that depend on that character count as
+	starting with it. Backreferences, string anchors and unknown operations can
+	match anything.
+	"""
+	nullable, starts, ends, crosses = True, False, False, False
+	for operation, value in subpattern:
+		name = str(operation)
+		if name in ("LITERAL", "NOT_LITERAL", "ANY", "IN"):
+			newline = matches_character(name, value, "\n", bool(flags & re.DOTALL))
+			first = newline if boundary == "blank" else matches_text(name, value)
+			item = (False, first, newline, False)
+		elif name == "AT":
+			if str(value) in ("AT_BEGINNING_STRING", "AT_END_STRING"):
+				item = (True, True, True, True)
+			elif boundary == "indentation" and str(value) in (
+				"AT_END",
+				"AT_BOUNDARY",
+				"AT_NON_BOUNDARY",
+			):
+				item = (True, True, False, False)
+			else:  # The same at the start and end of a chunk as in the source
+				item = (True, False, False, False)
+		elif name == "BRANCH":
+			branches = [boundary_crossing(branch, flags, boundary) for branch in value[1]]
+			item = (
+				any(branch[0] for branch in branches),
+				any(branch[1] for branch in branches),
+				any(branch[2] for branch in branches),
+				any(branch[3] for branch in branches),
+			)
+		elif name == "SUBPATTERN":
+			_, add_flags, del_flags, group = value
+			item = boundary_crossing(group, (flags | add_flags) & ~del_flags, boundary)
+		elif name == "ATOMIC_GROUP":
+			item = boundary_crossing(value, flags, boundary)
+		elif name in ("ASSERT", "ASSERT_NOT"):
+			assertion = boundary_crossing(value[1], flags, boundary)
+			item = (True, assertion[1], False, assertion[3])
+		elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+			min_repeat, max_repeat, repeated = value
+			if max_repeat == 0:
+				item = (True, False, False, False)
+			else:
+				once = boundary_crossing(repeated, flags, boundary)
+				item = (
+					min_repeat == 0 or once[0],
+					once[1],
+					once[2],
+					once[3] or (max_repeat > 1 and once[1] and once[2]),
+				)
+		elif name == "GROUPREF_EXISTS":
+			_, yes, no = value
+			branches = [boundary_crossing(yes, flags, boundary)] + (
+				[boundary_crossing(no, flags, boundary)] if no else []
+			)
+			item = (
+				not no or any(branch[0] for branch in branches),
+				any(branch[1] for branch in branches),
+				any(branch[2] for branch in branches),
+				any(branch[3] for branch in branches),
+			)
+		else:  # Backreferences and unknown operations
+			item = (True, True, True, True)
+		crosses = crosses or item[3] or (ends and item[1])
+		starts = starts or (nullable and item[1])
+		ends = item[2] or (item[0] and ends)
+		nullable = nullable and item[0]
+	return nullable, starts, ends, crosses
+
+
+@lru_cache(maxsize=None)
+def is_chunk_local(regex: str, flags: int) -> bool:
+	"""
+	Checks whether every match of a regex lies inside a chunk (see read_chunks).
+
+	:param regex: Sanitized regex.
+	:type regex: str
+
+	:param flags: Flags of the compiled regex.
+	:type flags: int
+
+	:return: True if the regex can not match or look across an empty line or an
+		indentation reset.
+	:rtype: bool
+
+	Empty matches and anchors that see the start or end of a chunk as the start or
+	end of the source are not chunk-local. Indentation matched after a MULTILINE ^
+	(like `tab`) can not reach a boundary, because the line before a boundary has
+	text.
+	"""
+	parsed = sre_parse.parse(regex, flags)
+	flags |= parsed.state.flags
+	if parsed.getwidth()[0] == 0 or anchors_to_chunk(parsed, flags):
+		return False
+	items = list(parsed)
+	if (
+		len(items) > 1
+		and str(items[0][0]) == "AT"
+		and str(items[0][1]) == "AT_BEGINNING"
+		and matches_only_whitespace(items[1:2])
+	):
+		items = items[2:]
+	return not any(
+		boundary_crossing(items, flags, boundary)[3]
+		for boundary in ("blank", "indentation")
+	)
+
+
+def literal_candidates(subpattern: Any, flags: int) -> List[FrozenSet[str]]:
+	"""
+	Finds literals that every match of a parsed regex contains.
+
+	:param subpattern: Parsed regex from sre_parse.
+	:type subpattern: Any
+
+	:param flags: Regex flags active for the subpattern.
+	:type flags: int
+
+	:return: Sets of literals, every match contains at least one literal of each set.
+	:rtype: List[FrozenSet[str]]
+
+	Runs of characters are mandatory literals. Groups and repeats of at least one
+	add their own literals, and a branch adds the union of the best literals of its
+	alternatives. Lookarounds and case-insensitive literals are skipped.
+	"""
+	candidates: List[FrozenSet[str]] = []
+	run = ""
+	for operation, value in subpattern:
+		name = str(operation)
+		if name == "LITERAL" and not flags & re.IGNORECASE:
+			run += chr(value)
+			continue
+		if run:
+			candidates.append(frozenset((run,)))
+			run = ""
+		if name == "SUBPATTERN":
+			_, add_flags, del_flags, group = value
+			candidates.extend(literal_candidates(group, (flags | add_flags) & ~del_flags))
+		elif name == "ATOMIC_GROUP":
+			candidates.extend(literal_candidates(value, flags))
+		elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+			if value[0] > 0:
+				candidates.extend(literal_candidates(value[2], flags))
+		elif name == "BRANCH":
+			alternatives = [
+				best_literals(literal_candidates(branch, flags)) for branch in value[1]
+			]
+			if all(alternatives):
+				candidates.append(frozenset().union(*alternatives))
+	if run:
+		candidates.append(frozenset((run,)))
+	return candidates
+
+
+def best_literals(candidates: List[FrozenSet[str]]) -> FrozenSet[str]:
+	"""
+	Selects the set of literals that is the least likely to occur.
+
+	:param candidates: Sets of literals from literal_candidates.
+	:type candidates: List[FrozenSet[str]]
+
+	:return: Set with the longest shortest literal and the fewest literals, empty if
+		there is no candidate.
+	:rtype: FrozenSet[str]
+	"""
+	return max(
+		candidates,
+		key=lambda literals: (min(map(len, literals)), -len(literals)),
+		default=frozenset(),
+	)
+
+
+@lru_cache(maxsize=None)
+def required_literals(regex: str, flags: int) -> FrozenSet[str]:
+	"""
+	Finds the literals that trigger a regex.
+
+	:param regex: Sanitized regex.
+	:type regex: str
+
+	:param flags: Flags of the compiled regex.
+	:type flags: int
+
+	:return: Literals of which every match contains at least one, empty if the regex
+		must always be matched.
+	:rtype: FrozenSet[str]
+	"""
+	parsed = sre_parse.parse(regex, flags)
+	return best_literals(literal_candidates(parsed, flags | parsed.state.flags))
+
+
+def matches_character(name: str, value: Any, character: str, dotall: bool) -> bool:
+	"""
+	Checks whether a parsed single-character item matches a character.
+
+	:param name: Operation of the item (LITERAL, IN, CATEGORY, etc.).
+	:type name: str
+
+	:param value: Value of the item.
+	:type value: Any
+
+	:param character: Character to test.
+	:type character: str
+
+	:param dotall: `.` matches a newline (re.DOTALL).
+	:type dotall: bool
+
+	:return: True if the item can match the character. Unknown items match every
+		character.
+	:rtype: bool
+	"""
+	code = ord(character)
+	if name == "LITERAL":
+		return value == code
+	if name == "NOT_LITERAL":
+		return value != code
+	if name == "ANY":
+		return character != "\n" or dotall
+	if name == "RANGE":
+		return value[0] <= code <= value[1]
+	if name == "CATEGORY":
+		category = category_rgx.get(str(value))
+		return category is None or bool(category.match(character))
+	if name == "IN":
+		negate = bool(value) and str(value[0][0]) == "NEGATE"
+		return negate != any(
+			matches_character(str(operation), item, character, dotall)
+			for operation, item in value[negate:]
+		)
+	return True
+
+
+def consumed_characters(
+	subpattern: Any, flags: int, alphabet: FrozenSet[str], first: bool = False
+) -> FrozenSet[str]:
+	"""
+	Finds the characters of an alphabet that a parsed regex can match.
+
+	:param subpattern: Parsed regex from sre_parse.
+	:type subpattern: Any
+
+	:param flags: Regex flags active for the subpattern.
+	:type flags: int
+
+	:param alphabet: Characters to test.
+	:type alphabet: FrozenSet[str]
+
+	:param first: Only the characters that can start a match.
+	:type first: bool
+
+	:return: Characters of the alphabet that the regex can match.
+	:rtype: FrozenSet[str]
+
+	Lookarounds and anchors match no characters. Backreferences can match every
+	character.
+	"""
+	characters: Set[str] = set()
+	for operation, value in subpattern:
+		name = str(operation)
+		if name in ("LITERAL", "NOT_LITERAL", "ANY", "IN"):
+			dotall = bool(flags & re.DOTALL)
+			variants = (str.lower, str.upper) if flags & re.IGNORECASE else (str,)
+			characters.update(
+				character
+				for character in alphabet
+				if any(
+					matches_character(name, value, variant(character), dotall)
+					for variant in variants
+				)
+			)
+		elif name == "BRANCH":
+			for branch in value[1]:
+				characters |= consumed_characters(branch, flags, alphabet, first)
+		elif name == "SUBPATTERN":
+			_, add_flags, del_flags, group = value
+			characters |= consumed_characters(
+				group, (flags | add_flags) & ~del_flags, alphabet, first
+			)
+		elif name == "ATOMIC_GROUP":
+			characters |= consumed_characters(value, flags, alphabet, first)
+		elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+			characters |= consumed_characters(value[2], flags, alphabet, first)
+		elif name == "GROUPREF_EXISTS":
+			_, yes, no = value
+			characters |= consumed_characters(yes, flags, alphabet, first)
+			if no:
+				characters |= consumed_characters(no, flags, alphabet, first)
+		elif name == "GROUPREF":
+			characters |= alphabet
+		if first and sre_parse.SubPattern(subpattern.state, [(operation, value)]).getwidth()[0]:
+			break
+	return frozenset(characters)
+
+
+def sequence_items(subpattern: Any, flags: int) -> List[Tuple[Any, int]]:
+	"""
+	Lists the items of a parsed regex with the items of its groups in their place.
+
+	:param subpattern: Parsed regex from sre_parse.
+	:type subpattern: Any
+
+	:param flags: Regex flags active for the subpattern.
+	:type flags: int
+
+	:return: Single item subpatterns and their flags.
+	:rtype: List[Tuple[Any, int]]
+	"""
+	items: List[Tuple[Any, int]] = []
+	for operation, value in subpattern:
+		if str(operation) == "SUBPATTERN":
+			_, add_flags, del_flags, group = value
+			items.extend(sequence_items(group, (flags | add_flags) & ~del_flags))
+		else:
+			items.append(
+				(sre_parse.SubPattern(subpattern.state, [(operation, value)]), flags)
+			)
+	return items
+
+
+def backtracking_hazards(
+	subpattern: Any, flags: int, alphabet: FrozenSet[str]
+) -> List[Tuple[str, str]]:
+	"""
+	Finds the shapes of a parsed regex that make backtracking slow.
+
+	:param subpattern: Parsed regex from sre_parse.
+	:type subpattern: Any
+
+	:param flags: Regex flags active for the subpattern.
+	:type flags: int
+
+	:param alphabet: Characters used to compare character sets.
+	:type alphabet: FrozenSet[str]
+
+	:return: Growth (exponential or polynomial) and description of each shape.
+	:rtype: List[Tuple[str, str]]
+
+	An unbounded repeat is exponential if its body has a repeat that can match the
+	rest of the body (nested quantifiers) or alternatives that start with the same
+	character. Two unbounded repeats that can match the same characters with only
+	optional items between them are polynomial. They are only reported when both can match a newline,
+	because other repeats are bounded by the length of a line.
+	"""
+	hazards: List[Tuple[str, str]] = []
+	items = sequence_items(subpattern, flags)
+	for index, (item, item_flags) in enumerate(items):
+		operation, value = item[0]
+		name = str(operation)
+		if name in ("MAX_REPEAT", "MIN_REPEAT") and value[1] == sre_parse.MAXREPEAT:
+			body = sequence_items(value[2], item_flags)
+			for inner_index, (inner, inner_flags) in enumerate(body):
+				inner_name, inner_value = str(inner[0][0]), inner[0][1]
+				if inner_name in ("MAX_REPEAT", "MIN_REPEAT") and inner_value[1] > 1:
+					characters = consumed_characters(inner, inner_flags, alphabet)
+					if all(
+						other.getwidth()[0] == 0
+						or consumed_characters(other, other_flags, alphabet) <= characters
+						for other_index, (other, other_flags) in enumerate(body)
+						if other_index != inner_index
+					):
+						hazards.append(("exponential", "nested quantifiers"))
+						break
+				elif inner_name == "BRANCH":
+					starts = [
+						consumed_characters(branch, inner_flags, alphabet, first=True)
+						for branch in inner_value[1]
+					]
+					if any(
+						starts[first] & starts[second]
+						for first in range(len(starts))
+						for second in range(first + 1, len(starts))
+					):
+						hazards.append(("exponential", "overlapping alternatives"))
+						break
+			characters = consumed_characters(item, item_flags, alphabet)
+			if "\n" in characters:
+				for following, following_flags in items[index + 1 :]:
+					following_name, following_value = str(following[0][0]), following[0][1]
+					if (
+						following_name in ("MAX_REPEAT", "MIN_REPEAT")
+						and following_value[1] == sre_parse.MAXREPEAT
+						and "\n" in consumed_characters(following, following_flags, alphabet)
+						and consumed_characters(
+							following, following_flags, alphabet, first=True
+						)
+						& characters
+					):
+						hazards.append(("polynomial", "adjacent quantifiers"))
+						break
+					if following.getwidth()[0]:
+						break
+		if name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+			hazards.extend(backtracking_hazards(value[2], item_flags, alphabet))
+		elif name == "BRANCH":
+			for branch in value[1]:
+				hazards.extend(backtracking_hazards(branch, item_flags, alphabet))
+		elif name == "ATOMIC_GROUP":
+			hazards.extend(backtracking_hazards(value, item_flags, alphabet))
+		elif name in ("ASSERT", "ASSERT_NOT"):
+			hazards.extend(backtracking_hazards(value[1], item_flags, alphabet))
+		elif name == "GROUPREF_EXISTS":
+			for group in value[1:]:
+				if group:
+					hazards.extend(backtracking_hazards(group, item_flags, alphabet))
+	return hazards
+
+
+@lru_cache(maxsize=None)
+def backtracking_shapes(regex: str, flags: int) -> Tuple[Tuple[str, str], ...]:
+	"""
+	Statically finds the shapes of a regex that can take exponential or polynomial
+	time to match (ReDoS).
+
+	:param regex: Sanitized regex.
+	:type regex: str
+
+	:param flags: Flags of the compiled regex.
+	:type flags: int
+
+	:return: Growth and description of each shape (see backtracking_hazards).
+	:rtype: Tuple[Tuple[str, str], ...]
+
+	:raises re.error: If the regex is invalid.
+
+	Character sets are compared on sample_characters and the characters of the regex.
+	"""
+	parsed = sre_parse.parse(regex, flags)
+	alphabet = frozenset(sample_characters + regex)
+	return tuple(
+		dict.fromkeys(backtracking_hazards(parsed, flags | parsed.state.flags, alphabet))
+	)
+
+
+def error_checker(errors: _ErrorDictionary) -> _ErrorChecker:
+	"""
+	Gets the compiled checks of error definitions, creating them once.
+
+	:param errors: Error definitions with `regex` and `msg`.
+	:type errors: _ErrorDictionary
+
+	:return: Combined regex and every error.
+	:rtype: _ErrorChecker
+
+	Regexes are combined into one alternation when they have the same flags and no
+	backreferences or named groups, which would change their meaning.
+	"""
+	error_checkers = current_state().caches.error_checkers
+	cached = error_checkers.get(id(errors))
+	if cached is not None and cached[0] is errors:
+		return cached[1]
+	checks = []
+	for name, error in errors.items():
+		regex = error.get("regex")
+		if isinstance(regex, str):
+			regex = sanitize_regex(regex)
+		if not isinstance(regex, (Pattern, LazyPattern)):
+			continue
+		message = error.get("msg")
+		checks.append((name, regex, message if isinstance(message, str) else ""))
+	combined = None
+	if len(checks) > 1 and all(
+		regex.flags == checks[0][1].flags
+		and not regex.groupindex
+		and not re.search(r"\\[1-9]|\(\?P=|\(\?\(", regex.pattern)
+		for _, regex, _ in checks
+	):
+		try:
+			combined = re.compile(
+				"|".join(f"(?:{regex.pattern})" for _, regex, _ in checks),
+				checks[0][1].flags,
+			)
+		except re.error:  # Inline flags that are only allowed at the start
+			combined = None
+	checker = (combined, tuple(checks))
+	error_checkers[id(errors)] = (errors, checker)
+	return checker
+
+
+def find_errors(
+	checker: _ErrorChecker, text: str
+) -> List[Tuple[str, _StringMatch, str]]:
+	"""
+	Finds every error in a text.
+
+	:param checker: Checks from error_checker.
+	:type checker: _ErrorChecker
+
+	:param text: Text to check.
+	:type text: str
+
+	:return: Name, match and message of every error, in the order of definitions.
+	:rtype: List[Tuple[str, _StringMatch, str]]
+
+	A text without errors is scanned once with the combined regex. Each error is
+	only searched on its own when the combined regex finds something.
+	"""
+	combined, checks = checker
+	if combined is not None and combined.search(text) is None:
+		return []
+	return [
+		(name, error_match, message)
+		for name, regex, message in checks
+		for error_match in regex.finditer(text)
+	]
+
+
+def find_outside_errors(outside_options: _OutsideOptions, source_code: str) -> None:
+	"""
+	Finds syntax errors in the source code and shows error messages.
+
+	:param outside_options: A dictionary mapping parts of the outside options
+	:type outside_options: _OutsideOptions
+
+	:param source_code: The source code content to check for errors.
+	:type source_code: str
+
+	:return: None
+
+	This function checks for matches of the regular expression patterns associated
+	with each error in the outside options, in the provided source_code. Every match
+	is reported (see report_diagnostics).
+	"""
+
+	if not outside_options:
+		return
+
+	report_diagnostics(
+		[
+			make_diagnostic(
+				part,
+				error_message,
+				error_name,
+				error_match,
+				{},
+				source_code,
+				error_match.start(),
+			)
+			for part, errors in outside_options.items()
+			for error_name, error_match, error_message in find_errors(
+				error_checker(errors), source_code
+			)
+		]
+	)
+
+
+def replace_token(
+	replacements: Tuple[Tuple[_RegexPattern, str, Tuple[str, ...]], ...],
+	token: str,
+	stats: Optional[Dict[str, float]],
+) -> str:
+	"""
+	Applies the `replace` option of a token.
+
+	:param replacements: Regex, replacement and required literals of every rule.
+	:type replacements: Tuple[Tuple[_RegexPattern, str, Tuple[str, ...]], ...]
+
+	:param token: Value of the token.
+	:type token: str
+
+	:param stats: Timings of the part (unused).
+	:type stats: Optional[Dict[str, float]]
+
+	:return: Token with every rule applied in order.
+	:rtype: str
+
+	Rules whose regex needs a literal that is not in the token are skipped.
+	"""
+	for regex, replacement, literals in replacements:
+		if literals:
+			for literal in literals:
+				if literal in token:
+					break
+			else:
+				continue
+		token = regex.sub(replacement, token)
+	return token
+
+
+def call_token(
+	calls: Tuple[str, ...], token: str, stats: Optional[Dict[str, float]]
+) -> str:
+	"""
+	Applies the `call` option of a token.
+
+	:param calls: Parts to convert the token with.
+	:type calls: Tuple[str, ...]
+
+	:param token: Value of the token.
+	:type token: str
+
+	:param stats: Timings of the part (None when not profiling).
+	:type stats: Optional[Dict[str, float]]
+
+	:return: Converted token.
+	:rtype: str
+	"""
+	return convert_recursively(token, calls, stats)
+
+
+def eachline_token(
+	template: Tuple[str, ...], token: str, stats: Optional[Dict[str, float]]
+) -> str:
+	"""
+	Applies the `eachline` option of a token.
+
+	:param template: Line template split at `<line>`.
+	:type template: Tuple[str, ...]
+
+	:param token: Value of the token.
+	:type token: str
+
+	:param stats: Timings of the part (unused).
+	:type stats: Optional[Dict[str, float]]
+
+	:return: Every line of the token that is not blank, in the template.
+	:rtype: str
+	"""
+	return "\n".join([line.join(template) for line in token.split("\n") if line.strip()])
+
+
+def token_pipeline(token_options: _TokenOptions) -> Dict[str, Tuple[_TokenStep, ...]]:
+	"""
+	Gets the steps of the token options of a part, creating them once.
+
+	:param token_options: Token options of the part.
+	:type token_options: _TokenOptions
+
+	:return: Steps of every token with options, in the order of its options.
+	:rtype: Dict[str, Tuple[_TokenStep, ...]]
+
+	The yaml details keep the options as data, so they can be pickled and saved in
+	the ruleset cache. Tokens without options have no steps.
+	"""
+	token_pipelines = current_state().caches.token_pipelines
+	cached = token_pipelines.get(id(token_options))
+	if cached is not None and cached[0] is token_options:
+		return cached[1]
+	pipeline: Dict[str, Tuple[_TokenStep, ...]] = {}
+	for token_name, options in token_options.items():
+		steps: List[_TokenStep] = []
+		value: Any  # Replace rules, calls or line template
+		for option, value in options.items():
+			if option == "replace":
+				replacements = []
+				for regex, replacement in value:
+					if isinstance(regex, LazyPattern):
+						regex = regex.compiled()
+					elif isinstance(regex, str):
+						regex = sanitize_regex(regex)
+					replacements.append(
+						(
+							regex,
+							replacement,
+							tuple(required_literals(regex.pattern, regex.flags)),
+						)
+					)
+				steps.append(partial(replace_token, tuple(replacements)))
+			elif option == "call":
+				steps.append(partial(call_token, value))
+			elif option == "eachline":
+				steps.append(partial(eachline_token, tuple(str(value).split("<line>"))))
+		if steps:
+			pipeline[token_name] = tuple(steps)
+	token_pipelines[id(token_options)] = (token_options, pipeline)
+	return pipeline
+
+
+def render_match(
+	pattern: _CompiledTemplate,
+	token_match: Dict[str, str],
+	token_options: _TokenOptions,
+	next_options: _NextOptions,
+	part: str = "",
+) -> str:
+	"""
+	Renders the target template of a part for a match.
+
+	:param pattern: Compiled target template of the part (see compile_templates).
+	:type pattern: _CompiledTemplate
+
+	:param token_match: Tokens of the match.
+	:type token_match: Dict[str, str]
+
+	:param token_options: Token options of the part.
+	:type token_options: _TokenOptions
+
+	:param next_options: Parts to convert in the rendered template.
+	:type next_options: _NextOptions
+
+	:param part: Name of the part (for the profile report).
+	:type part: str
+
+	:return: The rendered template.
+	:rtype: str
+	"""
+	profiling = current_state().profile_report is not None
+	stats = part_profile(part) if profiling else None
+	if stats is not None:
+		started, recursion_time = perf_counter(), stats["recursion"]
+	pipeline = token_pipeline(token_options)
+	if pipeline:  # Tokens without options are not copied
+		token_match = dict(token_match)
+		for token_name, token in token_match.items():
+			steps = pipeline.get(token_name)
+			if steps is not None:
+				for step in steps:
+					token = step(token, stats)
+				token_match[token_name] = token
+	if stats is not None:
+		rendering = perf_counter()
+		stats["tokens"] += rendering - started - (stats["recursion"] - recursion_time)
+	rendered = render_template(pattern, token_match)
+	if stats is not None:
+		stats["render"] += perf_counter() - rendering
+	if next_options:  # Next Part option
+		rendered = convert_recursively(rendered, next_options, stats)
+	return rendered
+
+
+def exit_loop_limit(matched_parts: Dict[str, List[Any]]) -> None:
+	"""
+	Terminates the program when conversion does not stop.
+
+	:param matched_parts: Parts that were still matching, with their matches.
+	:type matched_parts: Dict[str, List[Any]]
+
+	:return: None
+
+	:raises TranslationError: With raise_errors (see TranslationState).
+	"""
+	if current_state().raise_errors:
+		raise TranslationError(
+			"Loop Limit Exceeded in " + ", ".join(matched_parts)
+		)
+	print(error_msg + " Loop Limit Exceeded")
+	print(
+		"Bug Locations:\n",
+		"\n".join((f"{part}:{matches}" for part, matches in matched_parts.items())),
+	)
+	sys_exit()
+
+
+def convert_syntax(
+	extracted_yaml_details: _ParseYAMLDetails,
+	original_content: str,
+	is_recursive: bool = False,
+	conversion_parts: Union[Tuple[str, ...]] = (),
+	incremental: bool = False,
+	splice: bool = False,
+	order: Optional[_PartOrder] = None,
+	source_map: Optional[List[_SourceSegment]] = None,
+) -> str:
+	"""
+	This function converts new syntax to original syntax as described in extracted_yaml_details.
+
+	:param extracted_yaml_details: Extracted from yaml includes match_parts patterns
+	:type extracted_yaml_details: _ParseYAMLDetails
+
+	:param original_content: Original content in the new syntax that needs to be converted.
+	:type original_content: str
+
+	:param is_recursive: Boolean flag indicating if the conversion should be recursive.
+	:type is_recursive: bool
+
+	:param conversion_parts: Specific parts that need to be converted.
+	:type conversion_parts: Union[Tuple[str, ...]]
+
+	:param incremental: Only rescan the lines changed by the previous iteration.
+	:type incremental: bool
+
+	:param splice: Rewrite each match at its own position instead of replacing every
+		identical text with str.replace.
+	:type splice: bool
+
+	:param order: Match one part at a time in this order (see dependency_order)
+		instead of matching all parts before replacing.
+	:type order: Optional[_PartOrder]
+
+	:param source_map: Filled with the segments linking the output to the content
+		(needs splice, see rewrite_source_map).
+	:type source_map: Optional[List[_SourceSegment]]
+
+	:return: The converted content in the original syntax.
+	:rtype: str
+
+	This function first matches the original content with the match_parts patterns in the
+	extracted_yaml_details. If a match is found, the corresponding transformation is applied to
+	the matched part. This process is repeated until no more matches are found.
+	"""
+	(
+		match_rules,
+		transform_rules,
+		outside_errors,
+	), pattern_templates = extracted_yaml_details
+	iteration_count = 0
+
+	if is_recursive:
+		match_rules = sub_ruleset(match_rules, conversion_parts)
+	elif outside_errors:  # Outside error checks
+		find_outside_errors(outside_errors, original_content)
+
+	if order is not None and not is_recursive:
+		return convert_in_order(
+			match_rules, transform_rules, pattern_templates, original_content, order
+		)
+	if incremental or splice:
+		return convert_with_spans(
+			match_rules,
+			transform_rules,
+			pattern_templates,
+			original_content,
+			is_recursive,
+			incremental,
+			splice,
+			source_map,
+		)
+
+	while True:
+		matched_parts = match_parts(original_content, match_rules, is_recursive)
+		if not matched_parts:  # Break when no match found
+			if current_state().profile_report is not None:
+				count_iterations(iteration_count)
+			break
+		elif iteration_count > 100:
+			exit_loop_limit(matched_parts)
+		iteration_count += 1
+
+		for part, matches in matched_parts.items():
+			pattern = pattern_templates[part] if pattern_templates is not None else None
+			token_options, next_options = transform_rules[part]
+			for record in matches:
+				assert(pattern is not None)
+				temp_pattern = render_match(
+					pattern, record.tokens, token_options, next_options, part
+				)
+				original_content = original_content.replace(record.text, temp_pattern)
+	return original_content
+
+
+def convert_in_order(
+	match_rules: _MatchOptions,
+	transform_rules: _TranslationOptions,
+	pattern_templates: _TokenPattern,
+	original_content: str,
+	order: _PartOrder,
+) -> str:
+	"""
+	Converts content matching one group of parts at a time.
+
+	:param match_rules: Options of parts.
+	:type match_rules: _MatchOptions
+
+	:param transform_rules: Token options and next options of parts.
+	:type transform_rules: _TranslationOptions
+
+	:param pattern_templates: Target templates of parts.
+	:type pattern_templates: _TokenPattern
+
+	:param original_content: Content in the new syntax.
+	:type original_content: str
+
+	:param order: Groups of parts in order (see dependency_order).
+	:type order: _PartOrder
+
+	:return: The converted content.
+	:rtype: str
+
+	Every group matches the content already rewritten by the groups before it, so in
+	dependency order a part sees the output of the parts it depends on in the same
+	iteration. The parts of a group match and replace like convert_syntax until they
+	stop matching, so a cycle is finished before the parts that match its output.
+	"""
+	triggers = part_triggers(match_rules)[0]
+	iteration_count = 0
+	while True:
+		matched_parts: _MatchParts = {}
+		for group in order:
+			group_count = 0
+			while True:
+				group_matches: _MatchParts = {}
+				for part in group:
+					options = match_rules[part]
+					if not part_enabled(part, options.is_global, options.once, False):
+						continue
+					if triggers[part] and not any(
+						literal in original_content for literal in triggers[part]
+					):
+						continue
+					matches = scan_part(original_content, part, options)
+					if matches:
+						group_matches[part] = matches
+				if not group_matches:
+					break
+				elif group_count > 100:
+					exit_loop_limit(group_matches)
+				group_count += 1
+				matched_parts.update(group_matches)
+				for part, matches in group_matches.items():
+					pattern = pattern_templates[part] if pattern_templates is not None else None
+					assert(pattern is not None)
+					token_options, next_options = transform_rules[part]
+					for record in matches:
+						temp_pattern = render_match(
+							pattern, record.tokens, token_options, next_options, part
+						)
+						original_content = original_content.replace(record.text, temp_pattern)
+		if not matched_parts:  # Break when no match found
+			if current_state().profile_report is not None:
+				count_iterations(iteration_count)
+			break
+		elif iteration_count > 100:
+			exit_loop_limit(matched_parts)
+		iteration_count += 1
+	return original_content
+
+
+def convert_with_spans(
+	match_rules: _MatchOptions,
+	transform_rules: _TranslationOptions,
+	pattern_templates: _TokenPattern,
+	original_content: str,
+	is_recursive: bool,
+	incremental: bool = False,
+	splice: bool = False,
+	source_map: Optional[List[_SourceSegment]] = None,
+) -> str:
+	"""
+	Converts syntax like convert_syntax, using the position of every match.
+
+	:param match_rules: Match options of the parts to convert.
+	:type match_rules: _MatchOptions
+
+	:param transform_rules: Token options of the parts.
+	:type transform_rules: _TranslationOptions
+
+	:param pattern_templates: Target templates of the parts.
+	:type pattern_templates: _TokenPattern
+
+	:param original_content: Content in the new syntax.
+	:type original_content: str
+
+	:param is_recursive: Boolean flag indicating if the conversion is recursive.
+	:type is_recursive: bool
+
+	:param incremental: Only rescan the lines changed by the previous iteration.
+	:type incremental: bool
+
+	:param splice: Rewrite each match at its own position (see splice_matches).
+	:type splice: bool
+
+	:param source_map: Filled with the segments linking the output to the content
+		in splice mode.
+	:type source_map: Optional[List[_SourceSegment]]
+
+	:return: The converted content in the original syntax.
+	:rtype: str
+
+	Every replacement is tracked, so after an iteration the unchanged text is known.
+	In incremental mode, parts whose regex cannot cross a line (see is_line_local)
+	keep their matches in unchanged lines and only rescan the changed lines. Parts
+	that can cross a limited number of lines (see line_span) rescan a zone around
+	the changed lines (see rescan_spanning_part). Other parts and parts with
+	`unmatch` or `err` options scan the whole content on every iteration. Required
+	literals are only searched in the changed lines. Without splice, the output is
+	the same as convert_syntax.
+	"""
+	line_local = {
+		part: incremental and is_line_local(options.regex.pattern, options.regex.flags)
+		for part, options in match_rules.items()
+	}
+	spans = {
+		part: line_span(options.regex.pattern, options.regex.flags)
+		if incremental
+		and not line_local[part]
+		and not options.err
+		and not any(options.unmatch)
+		and not current_state().part_budget
+		else None
+		for part, options in match_rules.items()
+	}
+	triggers = part_triggers(match_rules)[0]
+	literal_length = max(
+		(len(literal) for literals in triggers.values() for literal in literals),
+		default=0,
+	)
+	candidates: Set[str] = set()
+	zones: Dict[int, Optional[List[Tuple[int, int]]]] = {}  # By span
+	if source_map is not None:
+		if not splice:
+			raise ValueError("Source maps need splice mode")
+		length = len(original_content)
+		source_map[:] = [(0, length, 0, length, "")] if length else []
+	scans: _MatchParts = {}
+	windows: Optional[List[_CleanWindow]] = None  # None: scan whole content
+	iteration_count = 0
+
+	while True:
+		matched_parts: _MatchParts = {}
+		if windows is None:
+			candidates = possible_parts(original_content, match_rules)
+		else:  # Literals can only be new in the changed lines
+			candidates |= possible_parts(
+				changed_text(original_content, windows, literal_length), match_rules
+			)
+		for part, options in match_rules.items():
+			if not part_enabled(part, options.is_global, options.once, is_recursive):
+				continue
+			span = spans[part]
+			if windows is not None and span is not None and span not in zones:
+				zones[span] = change_zones(original_content, windows, span)
+			part_zones = zones.get(span) if span is not None else None
+			rescan = windows is not None and (line_local[part] or part_zones is not None)
+			if part not in candidates or (
+				windows is not None
+				and not rescan
+				and triggers[part]
+				and not any(literal in original_content for literal in triggers[part])
+			):  # A literal of a part that scans everything can be gone
+				scans[part] = []
+				continue
+			if windows is None or not rescan:
+				found = scan_part(original_content, part, options)
+			elif span is not None and part_zones is not None:
+				found = rescan_spanning_part(
+					original_content,
+					part,
+					options,
+					scans.get(part, []),
+					windows,
+					part_zones,
+					span,
+				)
+			else:
+				found = rescan_part(
+					original_content, part, options, scans.get(part, []), windows
+				)
+			scans[part] = found
+			if found:
+				matched_parts[part] = found
+		if not matched_parts:  # Break when no match found
+			if current_state().profile_report is not None:
+				count_iterations(iteration_count)
+			break
+		elif iteration_count > 100:
+			exit_loop_limit(matched_parts)
+		iteration_count += 1
+
+		previous_length = len(original_content)
+		runs: List[_CleanRun] = [(0, 0, previous_length)]
+		if splice:
+			rewrites = []
+			rewrite_parts = []
+			for part, record in resolve_overlaps(matched_parts):
+				pattern = pattern_templates[part] if pattern_templates is not None else None
+				assert(pattern is not None)
+				token_options, next_options = transform_rules[part]
+				rewrites.append(
+					(
+						record.start,
+						record.end,
+						render_match(
+							pattern, record.tokens, token_options, next_options, part
+						),
+					)
+				)
+				rewrite_parts.append(part)
+			if source_map is not None:
+				source_map[:] = rewrite_source_map(source_map, rewrites, rewrite_parts)
+			original_content, runs = splice_matches(original_content, rewrites)
+		else:
+			for part, matches in matched_parts.items():
+				pattern = pattern_templates[part] if pattern_templates is not None else None
+				token_options, next_options = transform_rules[part]
+				for record in matches:
+					assert(pattern is not None)
+					temp_pattern = render_match(
+						pattern, record.tokens, token_options, next_options, part
+					)
+					original_content, runs = tracked_replace(
+						original_content, record.text, temp_pattern, runs
+					)
+		if incremental:
+			windows = clean_windows(original_content, runs, previous_length)
+			zones.clear()
+	return original_content
+
+
+def resolve_overlaps(matched_parts: _MatchParts) -> List[Tuple[str, PartMatch]]:
+	"""
+	Selects the matches to rewrite in an iteration.
+
+	:param matched_parts: Matches of every part.
+	:type matched_parts: _MatchParts
+
+	:return: Non-overlapping matches with their part, sorted by position.
+	:rtype: List[Tuple[str, PartMatch]]
+
+	Parts are applied in yaml order, so a match is dropped if it overlaps a match
+	of an earlier part (or an earlier match of the same part). Dropped matches are
+	found again in the next iteration if they still match.
+	"""
+	starts: List[int] = []
+	ends: List[int] = []
+	selected: List[Tuple[str, PartMatch]] = []
+	for part, matches in matched_parts.items():
+		for record in matches:
+			start, end = record.start, record.end
+			index = bisect_right(starts, start)
+			if index and (ends[index - 1] > start or starts[index - 1] == start):
+				continue  # Overlaps the previous match
+			if index < len(starts) and starts[index] < end:
+				continue  # Overlaps the next match
+			starts.insert(index, start)
+			ends.insert(index, end)
+			selected.insert(index, (part, record))
+	return selected
+
+
+def splice_matches(
+	content: str, rewrites: List[Tuple[int, int, str]]
+) -> Tuple[str, List[_CleanRun]]:
+	"""
+	Builds the rewritten content in one pass.
+
+	:param content: Content to rewrite.
+	:type content: str
+
+	:param rewrites: Non-overlapping (start, end, replacement) sorted by start.
+	:type rewrites: List[Tuple[int, int, str]]
+
+	:return: Rewritten content and its unchanged runs of text.
+	:rtype: Tuple[str, List[_CleanRun]]
+
+	Unlike str.replace, only the matched position is rewritten. Identical text
+	elsewhere in the content is left as it is.
+	"""
+	pieces = []
+	runs: List[_CleanRun] = []
+	previous_end = new_position = 0
+	for start, end, replacement in rewrites:
+		if start > previous_end:
+			runs.append((previous_end, new_position, start - previous_end))
+			pieces.append(content[previous_end:start])
+			new_position += start - previous_end
+		pieces.append(replacement)
+		new_position += len(replacement)
+		previous_end = end
+	if previous_end < len(content):
+		runs.append((previous_end, new_position, len(content) - previous_end))
+		pieces.append(content[previous_end:])
+	return "".join(pieces), runs
+
+
+def slice_source_map(
+	source_map: List[_SourceSegment],
+	starts: List[int],
+	start: int,
+	end: int,
+	shift: int,
+	source_shift: int = 0,
+) -> List[_SourceSegment]:
+	"""
+	Gets the segments of a source map between two output positions.
+
+	:param source_map: Segments sorted by output position.
+	:type source_map: List[_SourceSegment]
+
+	:param starts: Output start of every segment.
+	:type starts: List[int]
+
+	:param start: Output position to start from.
+	:type start: int
+
+	:param end: Output position to stop at.
+	:type end: int
+
+	:param shift: Added to output positions of the segments.
+	:type shift: int
+
+	:param source_shift: Added to source positions of the segments.
+	:type source_shift: int
+
+	:return: Segments clipped to the range. A clipped rewrite keeps its whole
+		source span.
+	:rtype: List[_SourceSegment]
+	"""
+	first = max(bisect_right(starts, start) - 1, 0)
+	last = bisect_left(starts, end)  # Segments from first to last start before end
+	segments = source_map[first:last]
+	if segments and segments[0][1] <= start:  # Ends before the range
+		del segments[0]
+	if not segments:
+		return []
+	if shift or source_shift:
+		segments = [
+			(
+				output_start + shift,
+				output_end + shift,
+				source_start + source_shift,
+				source_end + source_shift,
+				part,
+			)
+			for output_start, output_end, source_start, source_end, part in segments
+		]
+	start, end = start + shift, end + shift
+	for index in (0, -1):  # Only the first and last segments can cross the range
+		output_start, output_end, source_start, source_end, part = segments[index]
+		clip_start, clip_end = max(output_start, start), min(output_end, end)
+		if not part:  # Unchanged text
+			source_start += clip_start - output_start
+			source_end = source_start + clip_end - clip_start
+		segments[index] = (clip_start, clip_end, source_start, source_end, part)
+	return segments
+
+
+def rewrite_source_map(
+	source_map: List[_SourceSegment],
+	rewrites: List[Tuple[int, int, str]],
+	parts: List[str],
+) -> List[_SourceSegment]:
+	"""
+	Updates a source map after splice_matches.
+
+	:param source_map: Segments of the content before the rewrites.
+	:type source_map: List[_SourceSegment]
+
+	:param rewrites: Rewrites given to splice_matches.
+	:type rewrites: List[Tuple[int, int, str]]
+
+	:param parts: Part of every rewrite.
+	:type parts: List[str]
+
+	:return: Segments of the rewritten content.
+	:rtype: List[_SourceSegment]
+
+	A rewritten span is linked to every source text it replaced, so text rewritten
+	again in a later iteration still points at the source it came from.
+	"""
+	starts = [segment[0] for segment in source_map]
+	length = source_map[-1][1] if source_map else 0
+	segments: List[_SourceSegment] = []
+	previous_end = new_position = 0
+	for (start, end, replacement), part in zip(rewrites, parts):
+		segments += slice_source_map(
+			source_map, starts, previous_end, start, new_position - previous_end
+		)
+		new_position += start - previous_end
+		replaced = slice_source_map(source_map, starts, start, max(end, start + 1), 0)
+		if replaced:
+			source_start = min(segment[2] for segment in replaced)
+			source_end = max(segment[3] for segment in replaced)
+			if end == start:  # Empty match
+				source_end = source_start
+		else:  # Empty match at the end
+			source_start = source_end = source_map[-1][3] if source_map else 0
+		if replacement:
+			segments.append(
+				(
+					new_position,
+					new_position + len(replacement),
+					source_start,
+					source_end,
+					part,
+				)
+			)
+		new_position += len(replacement)
+		previous_end = end
+	segments += slice_source_map(
+		source_map, starts, previous_end, length, new_position - previous_end
+	)
+	return merge_source_map(segments)
+
+
+def merge_source_map(
+	segments: List[_SourceSegment], merged: Optional[List[_SourceSegment]] = None
+) -> List[_SourceSegment]:
+	"""
+	Joins adjacent segments of unchanged text.
+
+	:param segments: Segments sorted by output position.
+	:type segments: List[_SourceSegment]
+
+	:param merged: Segments before them, extended in place.
+	:type merged: Optional[List[_SourceSegment]]
+
+	:return: Segments without two unchanged segments that continue each other.
+	:rtype: List[_SourceSegment]
+	"""
+	if merged is None:
+		merged = []
+	for segment in segments:
+		if (
+			merged
+			and not segment[4]
+			and not merged[-1][4]
+			and merged[-1][1] == segment[0]
+			and merged[-1][3] == segment[2]
+		):
+			merged[-1] = (merged[-1][0], segment[1], merged[-1][2], segment[3], "")
+		else:
+			merged.append(segment)
+	return merged
+
+
+def output_position(
+	source_map: List[_SourceSegment], source_starts: List[int], position: int
+) -> int:
+	"""
+	Finds the output position of a source position outside rewritten spans.
+
+	:param source_map: Segments sorted by output (and source) position.
+	:type source_map: List[_SourceSegment]
+
+	:param source_starts: Source start of every segment.
+	:type source_starts: List[int]
+
+	:param position: Source position at the start or end of a line.
+	:type position: int
+
+	:return: Output position.
+	:rtype: int
+	"""
+	index = bisect_left(source_starts, position)
+	if index < len(source_map) and source_map[index][2] == position:
+		return source_map[index][0]
+	if not index:
+		return 0
+	output_start, output_end, source_start, source_end, part = source_map[index - 1]
+	if not part and position < source_end:
+		return output_start + position - source_start
+	return output_end
+
+
+def changed_text(content: str, windows: List[_CleanWindow], margin: int) -> str:
+	"""
+	Joins the text outside the windows of unchanged lines.
+
+	:param content: Content after the previous iteration.
+	:type content: str
+
+	:param windows: Windows of unchanged lines.
+	:type windows: List[_CleanWindow]
+
+	:param margin: Characters of the windows to add around the changed text, so
+		a literal that starts or ends in a window is found.
+	:type margin: int
+
+	:return: Pieces of changed text separated by NUL characters.
+	:rtype: str
+	"""
+	pieces = []
+	scan_start = 0
+	for _, _, lines_start, lines_end in windows:
+		if lines_start > scan_start:
+			pieces.append(content[max(0, scan_start - margin) : lines_start + margin])
+		scan_start = lines_end
+	pieces.append(content[max(0, scan_start - margin) :])
+	return "\0".join(pieces)
+
+
+def text_lines_before(content: str, position: int, count: int) -> int:
+	"""
+	Finds the start of the line that is a number of lines with text before a line.
+
+	:param content: Content with lines.
+	:type content: str
+
+	:param position: Position in the line.
+	:type position: int
+
+	:param count: Number of lines with text to go back.
+	:type count: int
+
+	:return: Start of the line, with the empty lines before it.
+	:rtype: int
+	"""
+	start = content.rfind("\n", 0, position) + 1
+	while start and (count or not content[content.rfind("\n", 0, start - 1) + 1 : start].strip()):
+		end = start - 1
+		start = content.rfind("\n", 0, end) + 1
+		if content[start:end].strip():
+			count -= 1
+	return start
+
+
+def text_lines_after(content: str, position: int, count: int) -> int:
+	"""
+	Finds the end of the line that is a number of lines with text after a line.
+
+	:param content: Content with lines.
+	:type content: str
+
+	:param position: Position in the line.
+	:type position: int
+
+	:param count: Number of lines with text to go forward.
+	:type count: int
+
+	:return: End of the line after its newline, with the empty lines after it.
+	:rtype: int
+	"""
+	end = content.find("\n", position)
+	while end != -1:
+		next_end = content.find("\n", end + 1)
+		line = content[end + 1 : len(content) if next_end == -1 else next_end]
+		if line.strip():
+			if not count:
+				break
+			count -= 1
+		end = next_end
+	return len(content) if end == -1 else end + 1
+
+
+def change_zones(
+	content: str, windows: List[_CleanWindow], span: int
+) -> Optional[List[Tuple[int, int]]]:
+	"""
+	Finds the text that a part crossing lines has to rescan around the changes.
+
+	:param content: Content after the previous iteration.
+	:type content: str
+
+	:param windows: Windows of unchanged lines.
+	:type windows: List[_CleanWindow]
+
+	:param span: Lines with text a match can move across (see line_span).
+	:type span: int
+
+	:return: Sorted zones that do not overlap, None if they cover more than half
+		of the content (scanning it all is faster then).
+	:rtype: Optional[List[Tuple[int, int]]]
+
+	A match that sees changed text starts and ends within `span` lines with text of
+	it, so every change gets a zone of `span + 2` lines with text around it.
+	"""
+	changes = []
+	scan_start = 0
+	for _, _, lines_start, lines_end in windows:
+		if lines_start > scan_start:
+			changes.append((scan_start, lines_start))
+		scan_start = lines_end
+	if scan_start < len(content):
+		changes.append((scan_start, len(content)))
+	zones: List[Tuple[int, int]] = []
+	covered = 0
+	for start, end in changes:
+		zone_start = text_lines_before(content, start, span + 2)
+		if zones and zone_start <= zones[-1][1]:
+			zone_start, last_end = zones.pop()
+			covered -= last_end - zone_start
+		zone_end = text_lines_after(content, end, span + 2)
+		zones.append((zone_start, zone_end))
+		covered += zone_end - zone_start
+		if covered * 2 > len(content):
+			return None
+	return zones
+
+
+def rescan_spanning_part(
+	content: str,
+	part: str,
+	options: PartRule,
+	previous: List[PartMatch],
+	windows: List[_CleanWindow],
+	zones: List[Tuple[int, int]],
+	span: int,
+) -> List[PartMatch]:
+	"""
+	Matches a part that can match across lines, reusing matches away from changes.
+
+	:param content: Content after the previous iteration.
+	:type content: str
+
+	:param part: Name of the part.
+	:type part: str
+
+	:param options: Options of the part in yaml file (without unmatch or err).
+	:type options: PartRule
+
+	:param previous: Matches of the part in the previous iteration.
+	:type previous: List[PartMatch]
+
+	:param windows: Windows of unchanged lines.
+	:type windows: List[_CleanWindow]
+
+	:param zones: Zones around the changes (see change_zones).
+	:type zones: List[Tuple[int, int]]
+
+	:param span: Lines with text a match can move across (see line_span).
+	:type span: int
+
+	:return: Matches of the part in the whole content.
+	:rtype: List[PartMatch]
+
+	Matches are rescanned from the start of a zone until the scan reaches a point
+	after the zone that no previous match covers. From there the scan finds the previous
+	matches again, so they are reused. A scan only looks `span + 2` lines with text
+	past that point, which is as far as a match that starts before it can reach.
+	"""
+	moved: List[PartMatch] = []
+	index = 0
+	for old_start, run_start, lines_start, lines_end in windows:
+		shift = run_start - old_start
+		old_lines_start, old_lines_end = lines_start - shift, lines_end - shift
+		while index < len(previous) and previous[index].start < old_lines_start:
+			index += 1
+		while index < len(previous) and previous[index].end <= old_lines_end:
+			moved.append(previous[index].moved(shift))
+			index += 1
+	moved_starts = [record.start for record in moved]
+	matches: List[PartMatch] = []
+	position = index = zone = 0
+	while zone < len(zones):
+		zone_start, zone_end = zones[zone]
+		zone += 1
+		while index < len(moved) and moved[index].end <= zone_start:
+			if moved[index].start >= position:
+				matches.append(moved[index])
+			index += 1
+		if index < len(moved):
+			zone_start = min(zone_start, moved[index].start)
+		position = max(position, zone_start)
+		while True:
+			resync = max(position, zone_end)
+			covering = bisect_right(moved_starts, resync) - 1
+			if covering >= 0 and moved[covering].start < resync < moved[covering].end:
+				resync = moved[covering].end
+			if zone < len(zones) and zones[zone][0] <= resync:  # Zones overlap
+				zone_end = max(zone_end, zones[zone][1])
+				zone += 1
+				continue
+			found = [
+				record
+				for record in scan_part(
+					content,
+					part,
+					options,
+					position,
+					text_lines_after(content, resync, span + 2),
+				)
+				if record.start < resync
+			]
+			matches.extend(found)
+			if found and found[-1].end > resync:
+				position = found[-1].end
+				continue
+			position = resync
+			break
+		index = bisect_left(moved_starts, position)
+	matches.extend(moved[bisect_left(moved_starts, position) :])
+	return matches
+
+
+def tracked_replace(
+	content: str, old: str, new: str, runs: List[_CleanRun]
+) -> Tuple[str, List[_CleanRun]]:
+	"""
+	Replaces every occurrence of old like str.replace and tracks unchanged text.
+
+	:param content: Content to replace in.
+	:type content: str
+
+	:param old: String to replace.
+	:type old: str
+
+	:param new: Replacement string.
+	:type new: str
+
+	:param runs: Unchanged runs of text before the replacement.
+	:type runs: List[_CleanRun]
+
+	:return: Replaced content and the unchanged runs after the replacement.
+	:rtype: Tuple[str, List[_CleanRun]]
+	"""
+	if not old:
+		return content.replace(old, new), []
+	positions = []
+	index = content.find(old)
+	while index != -1:
+		positions.append(index)
+		index = content.find(old, index + len(old))
+	if not positions:
+		return content, runs
+
+	pieces = []
+	previous_end = 0
+	for position in positions:
+		pieces.append(content[previous_end:position])
+		pieces.append(new)
+		previous_end = position + len(old)
+	pieces.append(content[previous_end:])
+
+	shift = len(new) - len(old)
+	new_runs: List[_CleanRun] = []
+	replaced = 0  # Occurrences before the current position
+	for old_start, run_start, length in runs:
+		start, end = run_start, run_start + length
+		while start < end:
+			while replaced < len(positions) and positions[replaced] + len(old) <= start:
+				replaced += 1
+			next_position = positions[replaced] if replaced < len(positions) else end
+			if next_position > start:  # Unchanged text before next occurrence
+				piece_end = min(end, next_position)
+				new_runs.append(
+					(
+						old_start + start - run_start,
+						start + replaced * shift,
+						piece_end - start,
+					)
+				)
+				start = piece_end
+			else:  # Skip the replaced occurrence
+				start = min(end, next_position + len(old))
+	return "".join(pieces), new_runs
+
+
+def clean_windows(
+	content: str, runs: List[_CleanRun], previous_length: int
+) -> List[_CleanWindow]:
+	"""
+	Finds the complete lines that are unchanged since the previous iteration.
+
+	:param content: Content after the iteration.
+	:type content: str
+
+	:param runs: Unchanged runs of text.
+	:type runs: List[_CleanRun]
+
+	:param previous_length: Length of the content before the iteration.
+	:type previous_length: int
+
+	:return: Windows of unchanged lines with the start of their run.
+	:rtype: List[_CleanWindow]
+
+	A line is unchanged only if the line and the newlines around it are inside a run.
+	"""
+	windows: List[_CleanWindow] = []
+	for old_start, run_start, length in runs:
+		run_end = run_start + length
+		if run_start == 0 and old_start == 0:
+			lines_start = 0
+		else:
+			lines_start = content.find("\n", run_start, run_end) + 1
+			if not lines_start:
+				continue
+		if run_end == len(content) and old_start + length == previous_length:
+			lines_end = run_end
+		else:
+			lines_end = content.rfind("\n", run_start, run_end)
+		if lines_end >= lines_start:
+			windows.append((old_start, run_start, lines_start, lines_end))
+	return windows
+
+
+def rescan_part(
+	content: str,
+	part: str,
+	options: PartRule,
+	previous: List[PartMatch],
+	windows: List[_CleanWindow],
+) -> List[PartMatch]:
+	"""
+	Matches a line-local part, reusing matches from unchanged lines.
+
+	:param content: Content after the previous iteration.
+	:type content: str
+
+	:param part: Name of the part.
+	:type part: str
+
+	:param options: Options of the part in yaml file.
+	:type options: PartRule
+
+	:param previous: Matches of the part in the previous iteration.
+	:type previous: List[PartMatch]
+
+	:param windows: Windows of unchanged lines.
+	:type windows: List[_CleanWindow]
+
+	:return: Matches of the part in the whole content.
+	:rtype: List[PartMatch]
+	"""
+	matches: List[PartMatch] = []
+	index = 0
+	scan_start = 0
+	for old_start, run_start, lines_start, lines_end in windows:
+		# Changed lines before the window
+		matches.extend(scan_part(content, part, options, scan_start, lines_start))
+		scan_start = lines_end
+		# Unchanged lines
+		shift = run_start - old_start
+		old_lines_start, old_lines_end = lines_start - shift, lines_end - shift
+		while index < len(previous) and previous[index].start < old_lines_start:
+			index += 1
+		while index < len(previous) and previous[index].end <= old_lines_end:
+			matches.append(previous[index].moved(shift))
+			index += 1
+	matches.extend(scan_part(content, part, options, scan_start, len(content)))
+	return matches
+
+
+def find_substring_lines(
+	code_lines: List[str], target_string: str
+) -> _TargetStringLines:
+	"""
+	Finds the lines in which the target string is located.
+
+	:param code_lines: A list of lines of code being checked for the target string.
+	:type code_lines: List[str]
+
+	:param target_string: The string to be found in the lines.
+	:type target_string: str
+
+	:return: Tuple with starting position, length, and a list of the target string lines.
+	:rtype: Optional[Tuple[int, int, List[str]]]
+	"""
+
+	if not code_lines or not target_string:
+		return None
+
+	target_lines_list = target_string.splitlines()
+	target_line_count = len(target_lines_list)
+	max_index = len(code_lines) - target_line_count + 1
+
+	for target_index in range(max_index):
+		if target_lines_list[0] in code_lines[target_index]:
+			matched = True
+			for subline, line_part in zip(target_lines_list[1:], code_lines[target_index + 1 : target_index + target_line_count]):
+				if subline not in line_part:
+					matched = False
+					break
+			if matched:
+				matched_lines = code_lines[target_index : target_index + target_line_count]
+				return target_index, target_line_count, matched_lines
+
+	return None
+
+
+def template_samples(
+	compiled: _CompiledTemplate,
+) -> Iterator[Tuple[str, List[Tuple[int, int]]]]:
+	"""
+	Renders a target template with sample tokens in sample surroundings.
+
+	:param compiled: Compiled target template of a part (see compile_template).
+	:type compiled: _CompiledTemplate
+
+	:return: Sample text and the spans of template literals in it.
+	:rtype: Iterator[Tuple[str, List[Tuple[int, int]]]]
+	"""
+	_, literals, placeholders, _ = compiled
+	for token in ("x", "1", ""):
+		pieces = []
+		spans = []
+		position = 0
+		for index, literal in enumerate(literals):
+			if literal:
+				spans.append((position, position + len(literal)))
+			pieces.append(literal)
+			position += len(literal)
+			if index < len(placeholders):
+				pieces.append(token)
+				position += len(token)
+		rendered = "".join(pieces)
+		for before, after in (("", ""), ("x ", " x"), ("x\n", "\nx"), ("", " " + rendered)):
+			yield before + rendered + after, [
+				(start + len(before), end + len(before)) for start, end in spans
+			]
+
+
+def dependency_graph(yaml_details: _ParseYAMLDetails) -> Dict[str, List[str]]:
+	"""
+	Estimates which parts can match the output of each part.
+
+	:param yaml_details: Extracted yaml details.
+	:type yaml_details: _ParseYAMLDetails
+
+	:return: Parts that can match the output of a part, by part.
+	:rtype: Dict[str, List[str]]
+
+	The target template of a part is rendered with sample tokens ("x", "1" and
+	empty) next to sample text. A part depends on it if its regex matches text
+	from the template itself, not only from the samples. This is an estimate: the
+	real tokens and surroundings can make other matches. Parts without their
+	required literals in the samples are skipped (see possible_parts).
+	"""
+	(match_options, _, _), templates = yaml_details
+	graph: Dict[str, List[str]] = {part: [] for part in match_options}
+	if templates is None:
+		return graph
+	for part, options in match_options.items():
+		samples = list(template_samples(templates[part]))
+		candidates = possible_parts("\n".join(sample for sample, _ in samples), match_options)
+		for other_part, other_options in match_options.items():
+			if other_part not in candidates:
+				continue
+			if any(
+				start < span_end and span_start < end
+				for sample, spans in samples
+				for start, end in (
+					match.span() for match in other_options.regex.finditer(sample)
+				)
+				for span_start, span_end in spans
+			):
+				graph[part].append(other_part)
+	return graph
+
+
+def strongly_connected_parts(graph: Dict[str, List[str]]) -> List[List[str]]:
+	"""
+	Groups parts that can match the output of each other (Tarjan's algorithm).
+
+	:param graph: Graph from dependency_graph.
+	:type graph: Dict[str, List[str]]
+
+	:return: Groups of parts, every group after the groups it feeds.
+	:rtype: List[List[str]]
+	"""
+	indexes: Dict[str, int] = {}
+	low_links: Dict[str, int] = {}
+	stack: List[str] = []
+	groups: List[List[str]] = []
+
+	def visit(part: str) -> None:
+		indexes[part] = low_links[part] = len(indexes)
+		stack.append(part)
+		for other_part in graph[part]:
+			if other_part not in indexes:
+				visit(other_part)
+				low_links[part] = min(low_links[part], low_links[other_part])
+			elif other_part in stack:
+				low_links[part] = min(low_links[part], indexes[other_part])
+		if low_links[part] == indexes[part]:
+			group = []
+			while True:
+				member = stack.pop()
+				group.append(member)
+				if member == part:
+					break
+			groups.append(group)
+
+	for part in graph:
+		if part not in indexes:
+			visit(part)
+	return groups
+
+
+def rewrite_cycles(graph: Dict[str, List[str]]) -> List[List[str]]:
+	"""
+	Finds parts that can match their own output directly or through other parts.
+
+	:param graph: Graph from dependency_graph.
+	:type graph: Dict[str, List[str]]
+
+	:return: Groups of parts in a cycle, in YAML order.
+	:rtype: List[List[str]]
+	"""
+	position = {part: index for index, part in enumerate(graph)}
+	return sorted(
+		(
+			sorted(group, key=position.__getitem__)
+			for group in strongly_connected_parts(graph)
+			if len(group) > 1 or group[0] in graph[group[0]]
+		),
+		key=lambda group: position[group[0]],
+	)
+
+
+def dependency_order(graph: Dict[str, List[str]]) -> _PartOrder:
+	"""
+	Orders parts so that a part comes before the parts that can match its output.
+
+	:param graph: Graph from dependency_graph.
+	:type graph: Dict[str, List[str]]
+
+	:return: All parts of the graph, grouped with the parts of their cycle.
+	:rtype: _PartOrder
+
+	Parts in a cycle and parts without a dependency between them keep their YAML
+	order.
+	"""
+	from heapq import heappush, heappop
+
+	position = {part: index for index, part in enumerate(graph)}
+	groups = [
+		sorted(group, key=position.__getitem__)
+		for group in strongly_connected_parts(graph)
+	]
+	group_of = {part: index for index, group in enumerate(groups) for part in group}
+	feeds: List[Set[int]] = [set() for _ in groups]
+	waiting = [0] * len(groups)
+	for part, other_parts in graph.items():
+		for other_part in other_parts:
+			source, target = group_of[part], group_of[other_part]
+			if source != target and target not in feeds[source]:
+				feeds[source].add(target)
+				waiting[target] += 1
+	ready = sorted(
+		(position[group[0]], index)
+		for index, group in enumerate(groups)
+		if not waiting[index]
+	)
+	order: List[Tuple[str, ...]] = []
+	while ready:
+		_, index = heappop(ready)
+		order.append(tuple(groups[index]))
+		for target in feeds[index]:
+			waiting[target] -= 1
+			if not waiting[target]:
+				heappush(ready, (position[groups[target][0]], target))
+	return tuple(order)
+
+
+def cycle_stops(yaml_details: _ParseYAMLDetails, cycle: List[str]) -> bool:
+	"""
+	Checks whether rewriting the template samples of a cycle stops.
+
+	:param yaml_details: Extracted yaml details.
+	:type yaml_details: _ParseYAMLDetails
+
+	:param cycle: Parts in a cycle (see rewrite_cycles).
+	:type cycle: List[str]
+
+	:return: Whether every sample of the cycle is translated within the loop limit.
+	:rtype: bool
+
+	A part like `a -> b ->` to `b(a) ->` matches its own output, but every rewrite
+	removes an arrow, so it stops. The samples of template_samples are translated
+	with the whole ruleset, so like dependency_graph this is an estimate.
+	"""
+	(match_options, _, _), templates = yaml_details
+	if templates is None:  # No templates, no cycles (see dependency_graph)
+		return True
+	translator = Translator(yaml_details, memo_size=0)
+	return all(
+		translator.translate(sample).output is not None
+		for part in cycle
+		for sample, _ in template_samples(templates[part])
+	)
+
+
+def warn_rewrite_cycles(
+	yaml_details: _ParseYAMLDetails, check_samples: bool = False
+) -> None:
+	"""
+	Warns about parts that can match their own output.
+
+	:param yaml_details: Extracted yaml details.
+	:type yaml_details: _ParseYAMLDetails
+
+	:param check_samples: Whether cycles whose template samples stop being rewritten are left out (see cycle_stops).
+	:type check_samples: bool
+
+	:return: None
+
+	Without check_samples every cycle of the dependency graph is reported, so
+	loading a ruleset does not translate anything. -c and --explain-order check
+	the samples.
+	"""
+	for cycle in rewrite_cycles(dependency_graph(yaml_details)):
+		if not check_samples:
+			print(
+				Fore.YELLOW + "Warning:",
+				" -> ".join(cycle + [cycle[0]]),
+				"can match its own output (--explain-order checks whether it stops)",
+			)
+		elif not cycle_stops(yaml_details, cycle):
+			print(
+				Fore.YELLOW + "Warning:",
+				" -> ".join(cycle + [cycle[0]]),
+				"can match its own output (loop limit if it never stops matching)",
+			)
+
+
+def print_dependency_order(yaml_details: _ParseYAMLDetails) -> None:
+	"""
+	Prints the dependency graph, cycles and order of parts (--explain-order).
+
+	The ruleset is loaded with its template samples checked, so only the cycles
+	that do not stop are warned about (see warn_rewrite_cycles).
+
+	:param yaml_details: Extracted yaml details.
+	:type yaml_details: _ParseYAMLDetails
+
+	:return: None
+	"""
+	graph = dependency_graph(yaml_details)
+	print("Parts that can match the output of each part:")
+	for part, other_parts in graph.items():
+		print(f"  {part} -> {', '.join(other_parts) if other_parts else '-'}")
+	cycles = rewrite_cycles(graph)
+	print("Cycles:", "; ".join(" -> ".join(cycle + [cycle[0]]) for cycle in cycles) or "-")
+	print(
+		"Order (--ordered):",
+		", ".join(" + ".join(group) for group in dependency_order(graph)),
+	)
+
+
+def extract_yaml_details(
+	source_path: str, target_path: str, check_samples: bool = False
+) -> Tuple[_AfterProcessing, _ParseYAMLDetails]:
+	"""
+	Extracts details from source and target YAML files.
+
+	:param source_path: The path to the source YAML file.
+	:type source_path: str
+
+	:param target_path: The path to the target YAML file.
+	:type target_path: str
+
+	:param check_samples: Whether rewrite cycles are checked with their template samples (see warn_rewrite_cycles).
+	:type check_samples: bool
+
+	:return: A tuple containing the after command and YAML details.
+	:rtype: Tuple[_AfterProcessing, _ParseYAMLDetails]
+
+	:raises ValueError: If the source YAML file is invalid.
+	"""
+	source_yaml = load_yaml_file(source_path)
+	target_yaml = load_yaml_file(target_path)
+
+	# Check if all parts in source YAML file have a corresponding part in target YAML file
+	for part in source_yaml:
+		if not (part in target_yaml or part == "settings"):
+			if part.startswith("_"):
+				base_part = part[2:]
+				if base_part in source_yaml:
+					source_yaml[part]["tokens"] = source_yaml[base_part]["tokens"]
+				else:
+					raise ValueError(f"{error_msg} {base_part} for {part} not found")
+				if base_part in target_yaml:
+					target_yaml[part] = target_yaml[base_part]
+					continue
+				part = base_part
+			if not source_yaml[part]["tokens"]:
+				target_yaml[part] = ""
+				continue
+			raise ValueError(f"{error_msg} Template for {part} not found")
+
+	after_command, extracted_source_yaml = extract(source_yaml)
+	templates = compile_templates(extracted_source_yaml[0], target_yaml)
+	warn_rewrite_cycles((extracted_source_yaml, templates), check_samples)
+	return after_command, (extracted_source_yaml, templates)
+
+
+def load_variables(file_path: str) -> _VariablesDict:
+	"""
+	Loads variables from a YAMP file.
+
+	:param file: Path of the YAML file.
+	:type file: str
+
+	:return: Dictionary of variables.
+	:rtype: Dict[str, Any]
+	"""
+	variables = {}
+	try:
+		loaded_variables = load_yaml_file(file_path)
+		if loaded_variables is not None:
+			variables.update(loaded_variables)
+	except ValueError:
+		sys_exit(f"Error: Invalid YAML file: {file_path}\n")
+	return variables
+
+
+@lru_cache(maxsize=1)
+def load_builtin_variables(file_path: str, version: Optional[int]) -> _VariablesDict:
+	"""
+	Loads the builtin variables once for every version of builtin.yaml.
+
+	:param file_path: Path of builtin.yaml (without .yaml).
+	:type file_path: str
+
+	:param version: Modification time of builtin.yaml (see file_versions).
+	:type version: Optional[int]
+
+	:return: Dictionary of variables, shared by every call (copy before changing).
+	:rtype: _VariablesDict
+	"""
+	return load_variables(file_path)
+
+
+class LazyPattern:
+	"""
+	Regex from a compiled ruleset that is compiled when it is used first.
+
+	It has pattern and flags of the regex without compiling it, so parts
+	that never match anything do not cost a compilation.
+	"""
+
+	__slots__ = ("pattern", "flags", "_compiled")
+
+	def __init__(self, pattern: str, flags: int) -> None:
+		self.pattern = pattern
+		self.flags = flags
+		self._compiled: Optional[_RegexPattern] = None
+
+	def compiled(self) -> _RegexPattern:
+		"""
+		Compiles the regex once.
+
+		:return: Compiled regex.
+		:rtype: _RegexPattern
+		"""
+		if self._compiled is None:
+			self._compiled = re.compile(self.pattern, self.flags)
+		return self._compiled
+
+	def __getattr__(self, name: str) -> Any:
+		return getattr(self.compiled(), name)
+
+	def __eq__(self, other: object) -> bool:
+		if isinstance(other, (Pattern, LazyPattern)):
+			return (self.pattern, self.flags) == (other.pattern, other.flags)
+		return NotImplemented
+
+	def __hash__(self) -> int:
+		return hash((self.pattern, self.flags))
+
+	def __reduce__(self) -> Tuple[Any, Tuple[str, int]]:
+		return LazyPattern, (self.pattern, self.flags)
+
+	def __repr__(self) -> str:
+		return f"LazyPattern({self.pattern!r}, {self.flags})"
+
+
+RULESET_FORMAT = 2  # Version of the compiled ruleset format
+
+
+def encode_ruleset(
+	yaml_details: Tuple[_AfterProcessing, _ParseYAMLDetails], warnings: str = ""
+) -> str:
+	"""
+	Serializes yaml details as JSON.
+
+	:param yaml_details: A tuple containing the after command and YAML details.
+	:type yaml_details: Tuple[_AfterProcessing, _ParseYAMLDetails]
+
+	:param warnings: Warnings printed while extracting the details (see
+		capture_warnings), printed again by decode_ruleset.
+	:type warnings: str
+
+	:return: JSON of yaml details.
+	:rtype: str
+
+	Regexes are saved as pattern and flags, tuples and dictionaries with
+	special keys are tagged, so decode_ruleset gives back the same details.
+	Unlike pickle, loading it never runs code.
+	"""
+	from json import dumps
+
+	tags = ("__tuple__", "__regex__", "__dict__")
+
+	def encode(value: Any) -> Any:
+		if isinstance(value, (Pattern, LazyPattern)):
+			return {"__regex__": value.pattern, "flags": value.flags}
+		if isinstance(value, tuple):
+			return {"__tuple__": [encode(item) for item in value]}
+		if isinstance(value, list):
+			return [encode(item) for item in value]
+		if isinstance(value, dict):
+			if all(isinstance(key, str) and key not in tags for key in value):
+				return {key: encode(item) for key, item in value.items()}
+			return {"__dict__": [[encode(key), encode(item)] for key, item in value.items()]}
+		if value is None or isinstance(value, (str, int, float, bool)):
+			return value
+		raise TypeError(f"{type(value).__name__} can not be saved in compiled ruleset")
+
+	return dumps(
+		{
+			"langtrans": __version__,
+			"format": RULESET_FORMAT,
+			"details": encode(yaml_details),
+			"warnings": warnings,
+		},
+		ensure_ascii=False,
+	)
+
+
+def decode_ruleset(text: str) -> Tuple[_AfterProcessing, _ParseYAMLDetails]:
+	"""
+	Loads yaml details serialized by encode_ruleset and prints their warnings.
+
+	:param text: JSON of yaml details.
+	:type text: str
+
+	:return: A tuple containing the after command and YAML details.
+	:rtype: Tuple[_AfterProcessing, _ParseYAMLDetails]
+
+	:raises ValueError: If it is not a compiled ruleset of this version.
+	"""
+	from json import loads
+
+	def decode(value: Dict[str, Any]) -> Any:
+		if "__tuple__" in value and len(value) == 1:
+			return tuple(value["__tuple__"])
+		if "__regex__" in value and len(value) == 2:
+			return LazyPattern(value["__regex__"], value["flags"])
+		if "__dict__" in value and len(value) == 1:
+			return {
+				key if not isinstance(key, list) else tuple(key): item
+				for key, item in value["__dict__"]
+			}
+		return value
+
+	ruleset = loads(text, object_hook=decode)
+	if (
+		not isinstance(ruleset, dict)
+		or ruleset.get("langtrans") != __version__
+		or ruleset.get("format") != RULESET_FORMAT
+	):
+		raise ValueError("Not a compiled ruleset of this version")
+	after, ((match_options, trans_options, outside), templates) = ruleset["details"]
+	match_options = {part: PartRule(*options) for part, options in match_options.items()}
+	print_warnings(ruleset.get("warnings", ""))
+	return after, ((match_options, trans_options, outside), templates)
+
+
+def capture_warnings(
+	load: Callable[[], Tuple[_AfterProcessing, _ParseYAMLDetails]],
+) -> Tuple[Tuple[_AfterProcessing, _ParseYAMLDetails], str]:
+	"""
+	Loads yaml details, keeping the warnings it prints instead of printing them.
+
+	:param load: Function that loads the yaml details.
+	:type load: Callable[[], Tuple[_AfterProcessing, _ParseYAMLDetails]]
+
+	:return: The yaml details and the printed warnings.
+	:rtype: Tuple[Tuple[_AfterProcessing, _ParseYAMLDetails], str]
+
+	The warnings are saved with cached yaml details, so a cached ruleset prints
+	the same warnings as extracting it again. If loading fails, the output is
+	printed before the error.
+	"""
+	from io import StringIO
+	from contextlib import redirect_stdout
+
+	output = StringIO()
+	try:
+		with redirect_stdout(output):
+			yaml_details = load()
+	except BaseException:
+		print_warnings(output.getvalue())
+		raise
+	return yaml_details, output.getvalue()
+
+
+def print_warnings(warnings: str) -> None:
+	"""
+	Prints warnings from capture_warnings.
+
+	:param warnings: Printed warnings.
+	:type warnings: str
+
+	:return: None
+	"""
+	for line in warnings.splitlines():  # Line by line for colorama's autoreset
+		print(line)
+
+
+def load_compiled_yaml_details(
+	filename: str,
+) -> Tuple[_AfterProcessing, _ParseYAMLDetails]:
+	"""
+	Loads compiled yaml_details from .ltz file.
+
+	:param filename: Name of the file.
+	:type filename: str
+
+	:return: yaml_details from .ltz file.
+	:rtype: Tuple[_AfterProcessing, _ParseYAMLDetails]
+	"""
+	try:
+		with open(f"{filename}.ltz", encoding="utf-8") as compiled_yaml:
+			return decode_ruleset(compiled_yaml.read())
+	except FileNotFoundError as fnf_error:
+		print(f"File {fnf_error.filename} not found.")
+		sys_exit()
+	except ValueError:  # Includes UnicodeDecodeError of old pickled files
+		print(
+			f"{error_msg} {filename}.ltz is not compiled by LangTrans {__version__}."
+			" Compile it again with -c"
+		)
+		sys_exit()
+
+
+def init_converter(
+	yaml_details: _ParseYAMLDetails,
+	incremental: bool = False,
+	splice: bool = False,
+	memo_size: int = 4096,
+) -> None:
+	"""
+	Sets the converter used by `call` and `next` options in the current state and
+	forgets the line index of the previous document.
+
+	:param yaml_details: Extracted yaml details.
+	:type yaml_details: _ParseYAMLDetails
+
+	:param incremental: Only rescan the lines changed by the previous iteration.
+	:type incremental: bool
+
+	:param splice: Rewrite each match at its own position.
+	:type splice: bool
+
+	:param memo_size: Number of converted texts to remember (0 to disable).
+	:type memo_size: int
+
+	:return: None
+	"""
+	state = current_state()
+	state.translator = Translator(yaml_details, incremental, splice, memo_size=memo_size)
+	state.line_index = None
+
+
+class TranslationResult(NamedTuple):
+	"""
+	Result of Translator.translate.
+	"""
+
+	output: Optional[str]  # None if the translation stopped
+	diagnostics: List[_Diagnostic]  # Errors in the source code
+	error: Optional[str]  # Why the translation stopped
+	source_map: Optional[List[_SourceSegment]] = None  # See rewrite_source_map
+
+
+class Translator:
+	"""
+	Translates documents with extracted yaml details.
+
+	:param yaml_details: Extracted yaml details (see load_compiled_ruleset).
+	:type yaml_details: _ParseYAMLDetails
+
+	:param incremental: Only rescan the lines changed by the previous iteration.
+	:type incremental: bool
+
+	:param splice: Rewrite each match at its own position.
+	:type splice: bool
+
+	:param order: Match one part at a time in this order (see dependency_order).
+	:type order: Optional[_PartOrder]
+
+	:param memo_size: Number of `call`/`next` conversions to remember (0 to disable).
+	:type memo_size: int
+
+	:param source_maps: Return a source map with every output (implies splice).
+	:type source_maps: bool
+
+	:param part_budget: Seconds a part may take to find a match. Only enforced when
+		translating in the main thread on POSIX systems (see budget_available).
+	:type part_budget: Optional[float]
+
+	Translating does not change the yaml details, so one translator can be used by
+	many threads at the same time. Every call of translate and check runs with its
+	own TranslationState and never prints or terminates the program.
+	"""
+
+	__slots__ = (
+		"yaml_details",
+		"incremental",
+		"splice",
+		"order",
+		"source_maps",
+		"part_budget",
+		"stateful_parts",
+		"memo",
+		"caches",
+	)
+
+	def __init__(
+		self,
+		yaml_details: _ParseYAMLDetails,
+		incremental: bool = False,
+		splice: bool = False,
+		order: Optional[_PartOrder] = None,
+		memo_size: int = 4096,
+		source_maps: bool = False,
+		part_budget: Optional[float] = None,
+	) -> None:
+		if source_maps and order is not None:
+			raise ValueError("Source maps can not be used with an order")
+		self.yaml_details = yaml_details
+		self.incremental = incremental
+		self.splice = splice or source_maps
+		self.order = order
+		self.source_maps = source_maps
+		self.part_budget = part_budget
+		# Parts with `once` or `err` (never memoized)
+		self.stateful_parts = frozenset(
+			part
+			for part, options in yaml_details[0][0].items()
+			if options.once or options.err
+		)
+		# lru_cache of convert_uncached (hits and misses in cache_info)
+		self.memo: Any = (
+			lru_cache(maxsize=memo_size)(self.convert_uncached) if memo_size else None
+		)
+		self.caches = RulesetCaches()  # Shared by the threads using this translator
+
+	@classmethod
+	def load(
+		cls,
+		source_path: str,
+		target_path: str,
+		incremental: bool = False,
+		splice: bool = False,
+		ordered: bool = False,
+		memo_size: int = 4096,
+		source_maps: bool = False,
+		part_budget: Optional[float] = None,
+	) -> "Translator":
+		"""
+		Creates a translator from YAML files, using the compiled ruleset cache.
+
+		:param source_path: Path of the source YAML file (without .yaml).
+		:type source_path: str
+
+		:param target_path: Path of the target YAML file (without .yaml).
+		:type target_path: str
+
+		:param incremental: Only rescan the lines changed by the previous iteration.
+		:type incremental: bool
+
+		:param splice: Rewrite each match at its own position.
+		:type splice: bool
+
+		:param ordered: Match parts in dependency order (see dependency_order).
+		:type ordered: bool
+
+		:param memo_size: Number of `call`/`next` conversions to remember (0 to disable).
+		:type memo_size: int
+
+		:param source_maps: Return a source map with every output (implies splice).
+		:type source_maps: bool
+
+		:param part_budget: Seconds a part may take to find a match.
+		:type part_budget: Optional[float]
+
+		:return: Translator of the syntax.
+		:rtype: Translator
+		"""
+		yaml_details = load_compiled_ruleset(source_path, target_path)[1]
+		order = dependency_order(dependency_graph(yaml_details)) if ordered else None
+		return cls(
+			yaml_details, incremental, splice, order, memo_size, source_maps, part_budget
+		)
+
+	def translate(self, text: str) -> TranslationResult:
+		"""
+		Translates a document.
+
+		:param text: Source code.
+		:type text: str
+
+		:return: Output, or the diagnostics and error that stopped the translation.
+		:rtype: TranslationResult
+		"""
+		return self.translate_with(self.yaml_details, text)
+
+	def translate_with(
+		self, yaml_details: _ParseYAMLDetails, text: str
+	) -> TranslationResult:
+		"""
+		Translates a document with the options of this translator.
+
+		:param yaml_details: Extracted yaml details.
+		:type yaml_details: _ParseYAMLDetails
+
+		:param text: Source code.
+		:type text: str
+
+		:return: Output, or the diagnostics and error that stopped the translation.
+		:rtype: TranslationResult
+		"""
+		source_map: Optional[List[_SourceSegment]] = [] if self.source_maps else None
+		try:
+			output = self.run_isolated(
+				partial(
+					convert_syntax,
+					yaml_details,
+					text,
+					incremental=self.incremental,
+					splice=self.splice,
+					order=self.order,
+					source_map=source_map,
+				)
+			)
+		except TranslationError as error:
+			return TranslationResult(None, error.diagnostics, str(error))
+		return TranslationResult(output, [], None, source_map)
+
+	def retranslate(
+		self, source: str, previous: TranslationResult, edit: Tuple[int, int, str]
+	) -> TranslationResult:
+		"""
+		Translates a document after an edit, reusing the output of unchanged lines.
+
+		:param source: Source code of the previous result.
+		:type source: str
+
+		:param previous: Result of translating the source (with source maps).
+		:type previous: TranslationResult
+
+		:param edit: Start and end of the replaced text in the source and the new text.
+		:type edit: Tuple[int, int, str]
+
+		:return: Result of translating the edited source.
+		:rtype: TranslationResult
+
+		Only the lines of the edit are translated, together with every line of the
+		rewrites they touch. If a part that can occur in the document can match
+		across lines, the region grows to chunk boundaries (see read_chunks) in the
+		source and in the output. Parts that can match across a chunk boundary are
+		checked one by one: the whole document is translated again if one of them
+		matches text in or next to the region, in the source or in the output. It is
+		also translated again for parts with the `once` option.
+		"""
+		start, end, replacement = edit
+		edited = source[:start] + replacement + source[end:]
+		(match_rules, transform_rules, outside_errors), templates = self.yaml_details
+		candidates = possible_parts(edited, match_rules)
+		multiline = [
+			options
+			for part, options in match_rules.items()
+			if options.is_global
+			and part in candidates
+			and (options.once or not is_line_local(options.regex.pattern, options.regex.flags))
+		]
+		if (
+			previous.output is None
+			or previous.source_map is None
+			or any(options.once for options in multiline)
+		):
+			return self.translate(edited)
+		crossing = {
+			part: options.regex
+			for part, options in match_rules.items()
+			if options in multiline
+			and not is_chunk_local(options.regex.pattern, options.regex.flags)
+		}
+		source_map = previous.source_map
+		source_starts = [segment[2] for segment in source_map]
+		region_start = source.rfind("\n", 0, start) + 1
+		region_end = source.find("\n", end)
+		region_end = len(source) if region_end == -1 else region_end
+		shift = len(replacement) - (end - start)
+		while True:  # Grow to whole lines of the rewrites in the region
+			index = max(bisect_right(source_starts, region_start) - 1, 0)
+			while index and source_map[index - 1][3] >= region_start:
+				index -= 1
+			grown_start, grown_end = region_start, region_end
+			while index < len(source_map) and source_map[index][2] <= region_end:
+				_, _, source_start, source_end, part = source_map[index]
+				if part and source_end >= region_start:
+					grown_start = min(grown_start, source.rfind("\n", 0, source_start) + 1)
+					found = source.find("\n", source_end)
+					grown_end = max(grown_end, len(source) if found == -1 else found)
+				index += 1
+			while multiline and not (
+				chunk_boundary(source, grown_start) and chunk_boundary(edited, grown_start)
+			):
+				grown_start = source.rfind("\n", 0, grown_start - 1) + 1
+			while (
+				multiline
+				and grown_end < len(source)
+				and not (
+					chunk_boundary(source, grown_end + 1)
+					and chunk_boundary(edited, grown_end + 1 + shift)
+				)
+			):
+				found = source.find("\n", grown_end + 1)
+				grown_end = len(source) if found == -1 else found
+			if (grown_start, grown_end) == (region_start, region_end):
+				break
+			region_start, region_end = grown_start, grown_end
+		if multiline and region_end < len(source):  # Chunks end with their newline
+			region_end += 1
+		if any(
+			match_touches(regex, edited, region_start, region_end + shift)
+			for regex in crossing.values()
+		):
+			return self.translate(edited)
+		if outside_errors:  # Outside errors can match across lines
+			try:
+				self.run_isolated(partial(find_outside_errors, outside_errors, edited))
+			except TranslationError as error:
+				return TranslationResult(None, error.diagnostics, str(error))
+		result = self.translate_with(
+			((match_rules, transform_rules, None), templates),
+			edited[region_start : region_end + shift],
+		)
+		if result.output is None or result.source_map is None:
+			lines_before = source.count("\n", 0, region_start)
+			for diagnostic in result.diagnostics:
+				diagnostic["line"] += lines_before
+			return result
+		output_start = output_position(source_map, source_starts, region_start)
+		output_end = output_position(source_map, source_starts, region_end)
+		if multiline and not (
+			(
+				not region_start
+				or boundary_kept(
+					previous.output[
+						previous.output.rfind("\n", 0, output_start - 1) + 1 : output_start
+					],
+					result.output,
+					[],
+				)
+			)
+			and (
+				region_end == len(source)
+				or boundary_kept(
+					result.output, previous.output[output_end : output_end + 1], []
+				)
+			)
+		):  # A replacement changed a chunk boundary
+			return self.translate(edited)
+		output = previous.output[:output_start] + result.output + previous.output[output_end:]
+		if any(segment[4] in crossing for segment in result.source_map) or any(
+			match_touches(regex, output, output_start, output_start + len(result.output))
+			for regex in crossing.values()
+		):
+			return self.translate(edited)
+		output_starts = [segment[0] for segment in source_map]
+		output_shift = len(result.output) - (output_end - output_start)
+		after = slice_source_map(
+			source_map,
+			output_starts,
+			output_end,
+			len(previous.output),
+			output_shift,
+			shift,
+		)
+		new_map = merge_source_map(
+			[
+				(
+					segment_start + output_start,
+					segment_end + output_start,
+					source_start + region_start,
+					source_end + region_start,
+					part,
+				)
+				for segment_start, segment_end, source_start, source_end, part in (
+					result.source_map
+				)
+			]
+			+ after[:1],
+			slice_source_map(source_map, output_starts, 0, output_start, 0),
+		)
+		new_map += after[1:]
+		return TranslationResult(output, [], None, new_map)
+
+	def check(self, text: str) -> List[_Diagnostic]:
+		"""
+		Finds every error in a document without translating it (see check_source).
+
+		:param text: Source code.
+		:type text: str
+
+		:return: Diagnostics of the errors.
+		:rtype: List[_Diagnostic]
+		"""
+		return self.run_isolated(partial(check_source, self.yaml_details, text))
+
+	def run_isolated(self, function: Callable[[], Any]) -> Any:
+		"""
+		Runs a function with a new TranslationState of this translator.
+
+		:param function: Function to run.
+		:type function: Callable[[], Any]
+
+		:return: Return value of the function.
+		:rtype: Any
+		"""
+
+		def run_with_state() -> Any:
+			translation_state.set(
+				TranslationState(self, raise_errors=True, part_budget=self.part_budget)
+			)
+			return function()
+
+		return copy_context().run(run_with_state)
+
+	def convert_uncached(
+		self, conversion_parts: Tuple[str, ...], original_content: str
+	) -> str:
+		"""
+		Converts content with `call` or `next` parts (cached by memo).
+
+		:param conversion_parts: Parts of a `call` or `next` option.
+		:type conversion_parts: Tuple[str, ...]
+
+		:param original_content: Token or rendered template.
+		:type original_content: str
+
+		:return: Converted content.
+		:rtype: str
+		"""
+		return convert_syntax(
+			self.yaml_details,
+			original_content,
+			is_recursive=True,
+			conversion_parts=conversion_parts,
+			incremental=self.incremental,
+			splice=self.splice,
+		)
+
+	def convert(self, original_content: str, conversion_parts: Tuple[str, ...]) -> str:
+		"""
+		Converts content with parts, reusing the result for the same text and parts.
+
+		:param original_content: Token or rendered template.
+		:type original_content: str
+
+		:param conversion_parts: Parts of a `call` or `next` option.
+		:type conversion_parts: Tuple[str, ...]
+
+		:return: Converted content.
+		:rtype: str
+
+		A recursive conversion only depends on its text and parts, so the same
+		arguments or conditions are converted once. Long texts and parts with `once`
+		or `err` options are always converted again.
+		"""
+		if (
+			self.memo is None
+			or len(original_content) > MEMO_TEXT_LIMIT
+			or not self.stateful_parts.isdisjoint(conversion_parts)
+		):
+			return self.convert_uncached(tuple(conversion_parts), original_content)
+		return self.memo(tuple(conversion_parts), original_content)
+
+
+def sub_ruleset(
+	match_rules: _MatchOptions, conversion_parts: Tuple[str, ...]
+) -> _MatchOptions:
+	"""
+	Gets the match options of `call` or `next` parts, creating them once.
+
+	:param match_rules: Match options of all parts.
+	:type match_rules: _MatchOptions
+
+	:param conversion_parts: Parts of a `call` or `next` option.
+	:type conversion_parts: Tuple[str, ...]
+
+	:return: Match options of the parts.
+	:rtype: _MatchOptions
+	"""
+	sub_rulesets = current_state().caches.sub_rulesets
+	key = (id(match_rules), tuple(conversion_parts))
+	cached = sub_rulesets.get(key)
+	if cached is None or cached[0] is not match_rules:  # id of a new ruleset
+		cached = (match_rules, {part: match_rules[part] for part in conversion_parts})
+		sub_rulesets[key] = cached
+	return cached[1]
+
+
+def stream_unsafe_parts(yaml_details: _ParseYAMLDetails) -> List[str]:
+	"""
+	Finds parts that do not allow translating a source in chunks.
+
+	:param yaml_details: Extracted yaml details.
+	:type yaml_details: _ParseYAMLDetails
+
+	:return: Names of the parts.
+	:rtype: List[str]
+
+	`once` parts, error checks and outside error checks need the whole source.
+	Global parts that can match across chunks are checked at every boundary (see
+	boundary_kept) and other parts are only matched inside tokens.
+	"""
+	(match_options, _, outside_options), _ = yaml_details
+	unsafe_parts = list(outside_options or ())
+	for part, (_, _, is_global, _, _, once, err) in match_options.items():
+		if is_global and (once or err):
+			unsafe_parts.append(part)
+	return unsafe_parts
+
+
+def crossing_parts(yaml_details: _ParseYAMLDetails) -> List[_RegexPattern]:
+	"""
+	Finds the regexes of global parts that can match across chunks.
+
+	:param yaml_details: Extracted yaml details.
+	:type yaml_details: _ParseYAMLDetails
+
+	:return: Regexes that are not chunk-local (see is_chunk_local).
+	:rtype: List[_RegexPattern]
+	"""
+	(match_options, _, _), _ = yaml_details
+	return [
+		options.regex
+		for options in match_options.values()
+		if options.is_global
+		and not is_chunk_local(options.regex.pattern, options.regex.flags)
+	]
+
+
+def boundary_kept(before: str, after: str, crossing: List[_RegexPattern]) -> bool:
+	"""
+	Checks whether two chunks that follow each other can be translated apart.
+
+	:param before: First chunk.
+	:type before: str
+
+	:param after: Second chunk.
+	:type after: str
+
+	:param crossing: Regexes from crossing_parts.
+	:type crossing: List[_RegexPattern]
+
+	:return: True if the boundary between the chunks still has the shape of
+		read_chunks and every regex finds the same matches in the chunks as in the
+		joined text.
+	:rtype: bool
+	"""
+	if not before.endswith("\n") or not (after.startswith("\n") or after[:1].strip()):
+		return False
+	if not before[before.rfind("\n", 0, -1) + 1 :].strip():
+		return False
+	joined = before + after
+	for regex in crossing:
+		literals = required_literals(regex.pattern, regex.flags)
+		if literals and not any(literal in joined for literal in literals):
+			continue
+		apart = [(match.span(), match.groups()) for match in regex.finditer(before)]
+		apart.extend(
+			((match.start() + len(before), match.end() + len(before)), match.groups())
+			for match in regex.finditer(after)
+		)
+		if apart != [(match.span(), match.groups()) for match in regex.finditer(joined)]:
+			return False
+	return True
+
+
+def read_chunks(lines: Iterable[str], chunk_size: int) -> Iterator[str]:
+	"""
+	Joins lines into chunks that are split at empty lines and indentation resets.
+
+	:param lines: Lines of the source with their newlines.
+	:type lines: Iterable[str]
+
+	:param chunk_size: Minimum number of characters in a chunk (except the last).
+	:type chunk_size: int
+
+	:return: Chunks of the source.
+	:rtype: Iterator[str]
+
+	A chunk ends with a line that has text. The next chunk starts with an empty line
+	or with a line without indentation (the start of a top-level block). A source
+	without such lines is one chunk.
+	"""
+	chunk: List[str] = []
+	size = 0
+	for line in lines:
+		if (
+			size >= chunk_size
+			and (line == "\n" or line[:1].strip())
+			and chunk[-1].endswith("\n")
+			and chunk[-1].strip()
+		):
+			yield "".join(chunk)
+			chunk = []
+			size = 0
+		chunk.append(line)
+		size += len(line)
+	if chunk:
+		yield "".join(chunk)
+
+
+def match_touches(regex: _RegexPattern, text: str, start: int, end: int) -> bool:
+	"""
+	Checks whether a regex matches text in or next to a region.
+
+	:param regex: Compiled regex.
+	:type regex: _RegexPattern
+
+	:param text: Whole text.
+	:type text: str
+
+	:param start: Start of the region.
+	:type start: int
+
+	:param end: End of the region.
+	:type end: int
+
+	:return: True if a match of the regex in the text overlaps or touches the region.
+	:rtype: bool
+	"""
+	for match in regex.finditer(text):
+		if match.start() > end:
+			return False
+		if match.end() >= start:
+			return True
+	return False
+
+
+def chunk_boundary(text: str, position: int) -> bool:
+	"""
+	Checks whether read_chunks can split a text at the start of a line.
+
+	:param text: Text with lines.
+	:type text: str
+
+	:param position: Start of a line in the text.
+	:type position: int
+
+	:return: True at the start and end of the text and before an empty line or a
+		line without indentation that follows a line with text.
+	:rtype: bool
+	"""
+	if position in (0, len(text)):
+		return True
+	return bool(
+		(text[position] == "\n" or text[position].strip())
+		and text[text.rfind("\n", 0, position - 1) + 1 : position].strip()
+	)
+
+
+def join_crossed_chunks(
+	chunks: Iterable[str], keep: Callable[[str, str], bool]
+) -> Iterator[str]:
+	"""
+	Joins chunks of a source whose boundary a part can match across.
+
+	:param chunks: Chunks from read_chunks.
+	:type chunks: Iterable[str]
+
+	:param keep: Function that checks a boundary (see boundary_kept).
+	:type keep: Callable[[str, str], bool]
+
+	:return: Chunks of the source.
+	:rtype: Iterator[str]
+
+	Each boundary is checked with the chunks on both sides of it.
+	"""
+	joined = last = None
+	for chunk in chunks:
+		if joined is None or last is None:
+			joined = chunk
+		elif keep(last, chunk):
+			yield joined
+			joined = chunk
+		else:
+			joined += chunk
+		last = chunk
+	if joined is not None:
+		yield joined
+
+
+def translate_chunks(
+	chunks: Iterable[str],
+	yaml_details: _ParseYAMLDetails,
+	incremental: bool = False,
+	splice: bool = False,
+	order: Optional[_PartOrder] = None,
+) -> Iterator[str]:
+	"""
+	Translates chunks of a source one by one.
+
+	:param chunks: Chunks from read_chunks.
+	:type chunks: Iterable[str]
+
+	:param yaml_details: Extracted yaml details without stream_unsafe_parts.
+	:type yaml_details: _ParseYAMLDetails
+
+	:param incremental: Only rescan the lines changed by the previous iteration.
+	:type incremental: bool
+
+	:param splice: Rewrite each match at its own position.
+	:type splice: bool
+
+	:param order: Order of parts (see convert_in_order).
+	:type order: Optional[_PartOrder]
+
+	:return: Translated chunks.
+	:rtype: Iterator[str]
+
+	Without splice or with an order, identical texts are replaced in every chunk at
+	once, so the chunks are translated as one. Otherwise chunks are joined where
+	boundary_kept rejects their boundary in the source and in the output (see
+	stitch_chunks).
+	"""
+	init_converter(yaml_details, incremental, splice)
+	convert = partial(
+		convert_syntax, yaml_details, incremental=incremental, splice=splice, order=order
+	)
+	if not splice or order is not None:
+		yield convert("".join(chunks))
+		return
+	keep = partial(boundary_kept, crossing=crossing_parts(yaml_details))
+	yield from stitch_chunks(join_crossed_chunks(chunks, keep), convert, keep)
+
+
+def stitch_chunks(
+	chunks: Iterable[str],
+	convert: Callable[[str], str],
+	keep: Callable[[str, str], bool],
+) -> Iterator[str]:
+	"""
+	Translates chunks one by one and joins the chunks whose boundary changed.
+
+	:param chunks: Chunks of a source, in order.
+	:type chunks: Iterable[str]
+
+	:param convert: Function to translate chunks.
+	:type convert: Callable[[str], str]
+
+	:param keep: Function that checks a boundary (see boundary_kept).
+	:type keep: Callable[[str, str], bool]
+
+	:return: Translated chunks.
+	:rtype: Iterator[str]
+
+	A translated chunk is only given out when keep accepts the boundary between it
+	and the next translated chunk. Otherwise a replacement changed the boundary or
+	made a part match across it, so both chunks are translated again as one. If the
+	boundary after the joined chunks is rejected too, the rest of the source is
+	translated as one with a warning, so the work does not grow with the square of
+	the number of chunks.
+	"""
+	chunks = iter(chunks)
+	source = translated = None
+	joined = False
+	for chunk in chunks:
+		translated_chunk = convert(chunk)
+		if source is None or translated is None:
+			source, translated = chunk, translated_chunk
+		elif keep(translated, translated_chunk):
+			yield translated
+			source, translated = chunk, translated_chunk
+			joined = False
+		elif joined:
+			print(
+				Fore.YELLOW + "Warning:",
+				"Chunks keep changing at their boundaries, translating the rest of the file as one",
+			)
+			yield convert(source + chunk + "".join(chunks))
+			return
+		else:
+			source += chunk
+			translated = convert(source)
+			joined = True
+	if translated is not None:
+		yield translated
+
+
+def translate_stream(
+	source_path: str,
+	output_path: str,
+	yaml_details: _ParseYAMLDetails,
+	chunk_size: int = 1024 * 1024,
+	incremental: bool = False,
+	splice: bool = False,
+	verbose: bool = False,
+	order: Optional[_PartOrder] = None,
+) -> bool:
+	"""
+	Translates a file in chunks, so memory does not grow with the size of the file.
+
+	:param source_path: Path of the source file.
+	:type source_path: str
+
+	:param output_path: Path of the output file.
+	:type output_path: str
+
+	:param yaml_details: Extracted yaml details without stream_unsafe_parts.
+	:type yaml_details: _ParseYAMLDetails
+
+	:param chunk_size: Minimum number of characters in a chunk.
+	:type chunk_size: int
+
+	:param incremental: Only rescan the lines changed by the previous iteration.
+	:type incremental: bool
+
+	:param splice: Rewrite each match at its own position, the file is translated as
+		one chunk without it (see translate_chunks).
+	:type splice: bool
+
+	:param verbose: Print translated chunks.
+	:type verbose: bool
+
+	:param order: Order of parts (see convert_in_order).
+	:type order: Optional[_PartOrder]
+
+	:return: True if the output file was written.
+	:rtype: bool
+
+	The output is written to a temporary file that replaces the output file at the
+	end, so a failed translation does not leave a half written file. Like
+	write_if_changed, an unchanged output file is not replaced, and a replaced file
+	keeps its permissions.
+	"""
+	from tempfile import mkstemp
+	from filecmp import cmp
+
+	output_directory = dirname(os.path.abspath(output_path))
+	file_descriptor, temp_path = mkstemp(dir=output_directory, suffix=".tmp")
+	try:
+		with open(source_path, encoding="utf-8") as source_file, os.fdopen(
+			file_descriptor, "w", encoding="utf-8"
+		) as output_file:
+			for translated in translate_chunks(
+				read_chunks(source_file, chunk_size),
+				yaml_details,
+				incremental,
+				splice,
+				order,
+			):
+				output_file.write(translated)
+				if verbose:
+					print(translated, end="")
+		try:
+			if cmp(temp_path, output_path, shallow=False):
+				os.remove(temp_path)
+				return False
+			mode = os.stat(output_path).st_mode & 0o7777
+		except OSError:  # New output file
+			umask = os.umask(0)
+			os.umask(umask)
+			mode = 0o666 & ~umask
+		os.chmod(temp_path, mode)
+		os.replace(temp_path, output_path)
+		return True
+	except BaseException:
+		if os.path.exists(temp_path):
+			os.remove(temp_path)
+		raise
+
+
+def translate_parallel(
+	content: str,
+	yaml_details: _ParseYAMLDetails,
+	jobs: Optional[int] = None,
+	chunk_size: int = 1024 * 1024,
+	incremental: bool = False,
+	splice: bool = False,
+	order: Optional[_PartOrder] = None,
+	part_budget: Optional[float] = None,
+) -> str:
+	"""
+	Translates regions of one source at the same time with a process pool.
+
+	:param content: Source code.
+	:type content: str
+
+	:param yaml_details: Extracted yaml details without stream_unsafe_parts.
+	:type yaml_details: _ParseYAMLDetails
+
+	:param jobs: Number of worker processes. Uses every core if None.
+	:type jobs: Optional[int]
+
+	:param chunk_size: Maximum of the minimum number of characters in a region.
+	:type chunk_size: int
+
+	:param incremental: Only rescan the lines changed by the previous iteration.
+	:type incremental: bool
+
+	:param splice: Rewrite each match at its own position.
+	:type splice: bool
+
+	:param order: Order of parts (see convert_in_order).
+	:type order: Optional[_PartOrder]
+
+	:param part_budget: Seconds a part may take to find a match (see scan_part).
+	:type part_budget: Optional[float]
+
+	:return: Target code.
+	:rtype: str
+
+	Regions are split like the chunks of translate_stream, with at least four
+	regions for every worker. The boundaries between regions are checked in the
+	workers like in stitch_chunks, and regions are translated again as one. If a
+	boundary is still rejected after that, the source is translated as one with a
+	warning. Without splice or with an order, identical texts are
+	replaced in every region at once, so the source is translated in one process.
+	"""
+	jobs = jobs or os.cpu_count() or 1
+	regions = [content]
+	if jobs > 1 and splice and order is None:
+		regions = list(
+			read_chunks(
+				content.splitlines(keepends=True),
+				min(chunk_size, len(content) // (jobs * 4) + 1),
+			)
+		)
+	if len(regions) < 2:
+		init_converter(yaml_details, incremental, splice)
+		current_state().part_budget = part_budget
+		current_state().once_complete.clear()
+		return convert_syntax(
+			yaml_details, content, incremental=incremental, splice=splice, order=order
+		)
+	from concurrent.futures import ProcessPoolExecutor
+	from pickle import dumps, HIGHEST_PROTOCOL
+
+	with ProcessPoolExecutor(
+		max_workers=jobs,
+		initializer=init_batch_worker,
+		initargs=(
+			dumps(yaml_details, protocol=HIGHEST_PROTOCOL),
+			incremental,
+			splice,
+			(),
+			order,
+			part_budget,
+		),
+	) as executor:
+		source_kept = executor.map(region_boundary_kept, regions[:-1], regions[1:])
+		regions = list(join_crossed_chunks(regions, lambda *_: next(source_kept)))
+		translated_regions: List[Optional[str]] = list(
+			executor.map(translate_region, regions)
+		)
+		joined = False
+		while len(regions) > 1:
+			kept = executor.map(
+				region_boundary_kept, translated_regions[:-1], translated_regions[1:]
+			)
+			joined_regions = regions[:1]
+			joined_translations = translated_regions[:1]
+			for region, translated_region, is_kept in zip(
+				regions[1:], translated_regions[1:], kept
+			):
+				if is_kept:
+					joined_regions.append(region)
+					joined_translations.append(translated_region)
+				else:
+					joined_regions[-1] += region
+					joined_translations[-1] = None
+			if len(joined_regions) == len(regions):
+				break
+			if joined:
+				print(
+					Fore.YELLOW + "Warning:",
+					"Regions keep changing at their boundaries, translating the file as one",
+				)
+				return executor.submit(translate_region, content).result()
+			joined = True
+			retranslated = iter(
+				executor.map(
+					translate_region,
+					[
+						region
+						for region, translated_region in zip(
+							joined_regions, joined_translations
+						)
+						if translated_region is None
+					],
+				)
+			)
+			regions = joined_regions
+			translated_regions = [
+				next(retranslated) if translated_region is None else translated_region
+				for translated_region in joined_translations
+			]
+	return "".join(translated_regions)  # type: ignore[arg-type]
+
+
+def translate_region(region: str) -> str:
+	"""
+	Translates a region of a source in a worker of translate_parallel.
+
+	:param region: Region of the source.
+	:type region: str
+
+	:return: Translated region.
+	:rtype: str
+	"""
+	assert batch_details is not None
+	return convert_syntax(
+		batch_details,
+		region,
+		incremental=batch_options["incremental"],
+		splice=batch_options["splice"],
+		order=batch_options["order"],
+	)
+
+
+def region_boundary_kept(before: str, after: str) -> bool:
+	"""
+	Checks the boundary between two regions in a worker of translate_parallel.
+
+	:param before: First region.
+	:type before: str
+
+	:param after: Second region.
+	:type after: str
+
+	:return: True if the regions can be translated apart (see boundary_kept).
+	:rtype: bool
+	"""
+	assert batch_details is not None
+	return boundary_kept(before, after, crossing_parts(batch_details))
+
+
+def collect_sources(source_spec: str) -> List[Tuple[str, str]]:
+	"""
+	Finds source files for batch translation.
+
+	:param source_spec: A directory, a glob pattern or @manifest (file with a path
+		on every line).
+	:type source_spec: str
+
+	:return: Sorted source paths with output paths relative to the output directory.
+	:rtype: List[Tuple[str, str]]
+
+	The program is terminated if an output path is outside the output directory
+	(eg. `../x` in a manifest) or if two sources have the same output path (eg.
+	absolute paths in a manifest with the same file name).
+	"""
+	from glob import glob, has_magic
+
+	if source_spec.startswith("@"):  # Manifest
+		with open(source_spec[1:], encoding="utf-8") as manifest:
+			paths = [
+				line.strip()
+				for line in manifest
+				if line.strip() and not line.lstrip().startswith("#")
+			]
+		return checked_output_paths(
+			[
+				(path, path if not os.path.isabs(path) else os.path.basename(path))
+				for path in paths
+			]
+		)
+	if os.path.isdir(source_spec):
+		base = source_spec
+		paths = [
+			os.path.join(directory, file_name)
+			for directory, _, file_names in os.walk(source_spec)
+			for file_name in file_names
+		]
+	else:
+		base_parts = []  # Directory before first wildcard
+		for path_part in source_spec.replace("\\", "/").split("/")[:-1]:
+			if has_magic(path_part):
+				break
+			base_parts.append(path_part)
+		base = "/".join(base_parts) or "."
+		paths = [path for path in glob(source_spec, recursive=True) if os.path.isfile(path)]
+	return checked_output_paths(
+		sorted((path, os.path.relpath(path, base)) for path in paths)
+	)
+
+
+def checked_output_paths(sources: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+	"""
+	Checks that the output paths of sources stay in the output directory and differ.
+
+	:param sources: Source paths with output paths relative to the output directory.
+	:type sources: List[Tuple[str, str]]
+
+	:return: Sources with normalized output paths.
+	:rtype: List[Tuple[str, str]]
+	"""
+	checked = []
+	outputs: Dict[str, str] = {}  # Source of each output path
+	for source_path, output_path in sources:
+		output_path = os.path.normpath(output_path)
+		if (
+			os.path.isabs(output_path)
+			or output_path.split(os.sep)[0] == os.pardir
+			or output_path == os.curdir
+		):
+			sys_exit(f"{error_msg} Output of {source_path} is outside the output directory")
+		key = os.path.normcase(output_path)
+		if key in outputs:
+			sys_exit(
+				f"{error_msg} {outputs[key]} and {source_path} have the same output {output_path}"
+			)
+		outputs[key] = source_path
+		checked.append((source_path, output_path))
+	return checked
+
+
+# Extracted yaml details in batch worker processes
+batch_details: Optional[_ParseYAMLDetails] = None
+batch_options: Dict[str, Any] = {}
+batch_cache: Tuple[str, ...] = ()
+
+
+def init_batch_worker(
+	pickled_details: bytes,
+	incremental: bool = False,
+	splice: bool = False,
+	cache: Tuple[str, ...] = (),
+	order: Optional[_PartOrder] = None,
+	part_budget: Optional[float] = None,
+) -> None:
+	"""
+	Loads extracted yaml details in a batch worker process.
+
+	:param pickled_details: Extracted yaml details pickled once by the main process.
+	:type pickled_details: bytes
+
+	:param incremental: Only rescan the lines changed by the previous iteration.
+	:type incremental: bool
+
+	:param splice: Rewrite each match at its own position.
+	:type splice: bool
+
+	:param cache: Cache directory and fingerprint to save outputs in the cache.
+	:type cache: Tuple[str, ...]
+
+	:param order: Order of parts (see convert_in_order).
+	:type order: Optional[_PartOrder]
+
+	:param part_budget: Seconds a part may take to find a match (see scan_part).
+	:type part_budget: Optional[float]
+
+	:return: None
+	"""
+	from pickle import loads
+
+	global batch_details, batch_cache
+	batch_details = loads(pickled_details)
+	batch_cache = cache
+	batch_options.update(incremental=incremental, splice=splice, order=order)
+	current_state().part_budget = part_budget
+	init_converter(batch_details, incremental, splice)  # type: ignore[arg-type]
+
+
+def translate_file(source_path: str, output_path: str) -> Tuple[str, str]:
+	"""
+	Translates a single file in batch mode.
+
+	:param source_path: Path of the source file.
+	:type source_path: str
+
+	:param output_path: Path of the output file.
+	:type output_path: str
+
+	:return: Status (ok or failed) and printed messages.
+	:rtype: Tuple[str, str]
+	"""
+	from io import StringIO
+	from contextlib import redirect_stdout
+
+	messages = StringIO()
+	status = "ok"
+	with redirect_stdout(messages):
+		try:
+			# Every file starts without completed once parts
+			current_state().once_complete.clear()
+			with open(source_path, encoding="utf-8") as input_file:
+				content = input_file.read()
+			assert batch_details is not None
+			target_code = convert_syntax(
+				batch_details,
+				content,
+				incremental=batch_options["incremental"],
+				splice=batch_options["splice"],
+				order=batch_options["order"],
+			)
+			os.makedirs(dirname(output_path) or ".", exist_ok=True)
+			write_if_changed(output_path, target_code)
+			if batch_cache:  # Cache directory and fingerprint
+				store_output(
+					output_cache_path(
+						batch_cache[0], batch_cache[1], content, batch_options["splice"]
+					),
+					target_code,
+				)
+		except SystemExit as exit_error:  # Syntax errors and loop limit
+			status = "failed"
+			if exit_error.code is not None:
+				print(exit_error.code)
+		except Exception as exception_error:
+			status = "failed"
+			print("Program Error:", exception_error)
+	return status, messages.getvalue()
+
+
+def translate_batch(
+	sources: List[Tuple[str, str]],
+	output_directory: str,
+	yaml_details: _ParseYAMLDetails,
+	jobs: Optional[int] = None,
+	incremental: bool = False,
+	splice: bool = False,
+	cache: Tuple[str, ...] = (),
+	order: Optional[_PartOrder] = None,
+	part_budget: Optional[float] = None,
+) -> List[Tuple[str, str, str, str]]:
+	"""
+	Translates many files with a process pool.
+
+	:param sources: Source paths and output paths from collect_sources.
+	:type sources: List[Tuple[str, str]]
+
+	:param output_directory: Directory to save translated files in.
+	:type output_directory: str
+
+	:param yaml_details: Extracted yaml details, shared with every worker.
+	:type yaml_details: _ParseYAMLDetails
+
+	:param jobs: Number of worker processes. Uses every core if None.
+	:type jobs: Optional[int]
+
+	:param incremental: Only rescan the lines changed by the previous iteration.
+	:type incremental: bool
+
+	:param splice: Rewrite each match at its own position.
+	:type splice: bool
+
+	:param cache: Cache directory and fingerprint to save outputs in the cache.
+	:type cache: Tuple[str, ...]
+
+	:param order: Order of parts (see convert_in_order).
+	:type order: Optional[_PartOrder]
+
+	:param part_budget: Seconds a part may take to find a match (see scan_part).
+	:type part_budget: Optional[float]
+
+	:return: Source path, output path, status and messages in the order of sources.
+	:rtype: List[Tuple[str, str, str, str]]
+
+	The yaml details are pickled once and loaded by every worker, so the ruleset is
+	compiled only once for all files.
+	"""
+	from pickle import dumps, HIGHEST_PROTOCOL
+
+	output_paths = [
+		os.path.join(output_directory, relative_path) for _, relative_path in sources
+	]
+	source_paths = [source_path for source_path, _ in sources]
+	pickled_details = dumps(yaml_details, protocol=HIGHEST_PROTOCOL)
+	jobs = jobs or os.cpu_count() or 1
+	if jobs == 1 or len(sources) < 2:
+		init_batch_worker(
+			pickled_details, incremental, splice, cache, order, part_budget
+		)
+		results = list(map(translate_file, source_paths, output_paths))
+	else:
+		from concurrent.futures import ProcessPoolExecutor
+
+		with ProcessPoolExecutor(
+			max_workers=jobs,
+			initializer=init_batch_worker,
+			initargs=(
+				pickled_details, incremental, splice, cache, order, part_budget
+			),
+		) as executor:
+			results = list(
+				executor.map(
+					translate_file,
+					source_paths,
+					output_paths,
+					chunksize=max(1, len(sources) // (jobs * 4)),
+				)
+			)
+	return [
+		(source_path, output_path, status, messages)
+		for source_path, output_path, (status, messages) in zip(
+			source_paths, output_paths, results
+		)
+	]
+
+
+def print_batch_summary(results: List[Tuple[str, str, str, str]]) -> int:
+	"""
+	Prints the status of every file translated in batch mode.
+
+	:param results: Results from translate_batch.
+	:type results: List[Tuple[str, str, str, str]]
+
+	:return: Number of failed files.
+	:rtype: int
+	"""
+	failed = 0
+	for source_path, output_path, status, messages in results:
+		if status in ("ok", "cached"):
+			print(Fore.GREEN + f"{status:<6}" + Fore.RESET, source_path, "->", output_path)
+		else:
+			failed += 1
+			print(Fore.RED + "failed" + Fore.RESET, source_path)
+		if messages.strip():
+			print("      ", messages.strip().replace("\n", "\n       "))
+	print(f"Translated {len(results) - failed}/{len(results)} files")
+	return failed
+
+
+def check_source(yaml_details: _ParseYAMLDetails, content: str) -> List[_Diagnostic]:
+	"""
+	Finds every error in source code without translating it.
+
+	:param yaml_details: Extracted yaml details.
+	:type yaml_details: _ParseYAMLDetails
+
+	:param content: Source code.
+	:type content: str
+
+	:return: Diagnostics of outside errors and of errors in matches of global parts.
+	:rtype: List[_Diagnostic]
+
+	Only the source as written is checked. Errors in text created by the
+	translation are found when translating.
+	"""
+	state = current_state()
+	previous, state.diagnostics = state.diagnostics, []
+	match_rules, _, outside_errors = yaml_details[0]
+	try:
+		find_outside_errors(outside_errors, content)
+		candidates = possible_parts(content, match_rules)
+		for part, options in match_rules.items():
+			if options.is_global and options.err and part in candidates:
+				scan_part(content, part, options)
+		return state.diagnostics
+	finally:
+		state.diagnostics = previous
+
+
+def check_sources(sources: List[Tuple[str, str]], yaml_details: _ParseYAMLDetails) -> int:
+	"""
+	Prints the errors of source files (--check).
+
+	:param sources: Source paths from collect_sources.
+	:type sources: List[Tuple[str, str]]
+
+	:param yaml_details: Extracted yaml details.
+	:type yaml_details: _ParseYAMLDetails
+
+	:return: Number of errors.
+	:rtype: int
+	"""
+	errors = 0
+	failed = 0
+	for source_path, _ in sources:
+		with open(source_path, encoding="utf-8") as source_file:
+			found = check_source(yaml_details, source_file.read())
+		if found:
+			failed += 1
+			errors += len(found)
+			print(Fore.RED + "failed" + Fore.RESET, source_path)
+			for diagnostic in found:
+				print_diagnostic(diagnostic)
+		else:
+			print(Fore.GREEN + f"{'ok':<6}" + Fore.RESET, source_path)
+	print(f"Found {errors} errors in {failed}/{len(sources)} files")
+	return errors
+
+
+def timed_translation(
+	translate: Callable[[str], str], content: str
+) -> Tuple[Optional[str], float, str]:
+	"""
+	Translates a source like the command line, measuring the time.
+
+	:param translate: Function that translates the source.
+	:type translate: Callable[[str], str]
+
+	:param content: Source code.
+	:type content: str
+
+	:return: Output (None if the translation stopped), seconds and printed messages.
+	:rtype: Tuple[Optional[str], float, str]
+
+	The converter must be set before (see init_converter), so creating it is not
+	timed.
+	"""
+	from io import StringIO
+	from contextlib import redirect_stdout
+
+	messages = StringIO()
+	current_state().once_complete.clear()
+	output = None
+	started = perf_counter()
+	with redirect_stdout(messages):
+		try:
+			output = translate(content)
+		except SystemExit as exit_error:  # Syntax errors and loop limit
+			if exit_error.code is not None:
+				print(exit_error.code)
+	return output, perf_counter() - started, messages.getvalue().strip()
+
+
+def reference_error(
+	yaml_part: str,
+	errors: _ErrorDictionary,
+	text: str,
+	tokens: _VariablesDict,
+	content: str,
+	position: int,
+) -> None:
+	"""
+	Reports the first error in a text for reference_translation.
+
+	:param yaml_part: Name of the part of the errors.
+	:type yaml_part: str
+
+	:param errors: Error definitions with `regex` and `msg`.
+	:type errors: _ErrorDictionary
+
+	:param text: Text to check.
+	:type text: str
+
+	:param tokens: Tokens of the match for the message.
+	:type tokens: _VariablesDict
+
+	:param content: Source code with the text.
+	:type content: str
+
+	:param position: Position of the text in the source code.
+	:type position: int
+
+	:return: None
+
+	Like the first LangTrans versions, only the first error found, in the order of
+	definitions, is reported before the translation stops.
+	"""
+	for name, error in errors.items():
+		regex = error.get("regex")
+		if isinstance(regex, str):
+			regex = sanitize_regex(regex)
+		if not isinstance(regex, (Pattern, LazyPattern)):
+			continue
+		error_match = regex.search(text)
+		if error_match is None:
+			continue
+		message = error.get("msg")
+		report_diagnostics(
+			[
+				make_diagnostic(
+					yaml_part,
+					message if isinstance(message, str) else "",
+					name,
+					error_match,
+					tokens,
+					content,
+					position + error_match.start(),
+				)
+			]
+		)
+		return
+
+
+def reference_translation(
+	yaml_details: _ParseYAMLDetails,
+	content: str,
+	conversion_parts: Optional[Tuple[str, ...]] = None,
+) -> str:
+	"""
+	Translates a source with the replace loop of the first LangTrans versions.
+
+	:param yaml_details: Extracted yaml details.
+	:type yaml_details: _ParseYAMLDetails
+
+	:param content: Source code.
+	:type content: str
+
+	:param conversion_parts: Parts of a `call` or `next` option, None for a source.
+	:type conversion_parts: Optional[Tuple[str, ...]]
+
+	:return: Target code.
+	:rtype: str
+
+	This is the reference engine of shadow_translation. Every part is matched in
+	every iteration, token options and templates are applied without caches, and
+	each match is replaced with str.replace. Like in those versions, the translation
+	stops at the first error, while convert_syntax reports every error of the part.
+	"""
+	(match_rules, transform_rules, outside_errors), pattern_templates = yaml_details
+	is_recursive = conversion_parts is not None
+	if conversion_parts is not None:
+		match_rules = {part: match_rules[part] for part in conversion_parts}
+	elif outside_errors:
+		for part, errors in outside_errors.items():
+			reference_error(part, errors, content, {}, content, 0)
+	once_complete: List[str] = []
+	iteration_count = 0
+	while True:
+		matched_parts: Dict[str, List[Tuple[str, Dict[str, str]]]] = {}
+		for part, options in match_rules.items():
+			if not is_recursive:
+				if not options.is_global:
+					continue
+				if options.once:
+					if part in once_complete:
+						continue
+					once_complete.append(part)
+			unmatched_tokens, unmatched_parts = options.unmatch
+			part_match = []
+			for match in options.regex.finditer(content):
+				match_string = match.group()
+				if any(regex.search(match_string) for regex in unmatched_parts):
+					continue
+				token_match = {
+					token_name: (
+						token if token is not None else options.defaults.get(token_name, "")
+					)
+					for token_name, token in zip(options.tokens, match.groups())
+				}
+				if options.err:
+					reference_error(
+						part, options.err, match_string, token_match, content, match.start()
+					)
+				if any(
+					regex.search(token)
+					for token_name, token in token_match.items()
+					for regex in unmatched_tokens.get(token_name, ())
+				):
+					continue
+				part_match.append((match_string, token_match))
+			if part_match:
+				matched_parts[part] = part_match
+		if not matched_parts:
+			return content
+		if iteration_count > 100:
+			exit_loop_limit(matched_parts)
+		iteration_count += 1
+		for part, matches in matched_parts.items():
+			assert pattern_templates is not None
+			token_options, next_options = transform_rules[part]
+			for match_string, token_match in matches:
+				for token_name, token in token_match.items():
+					value: Any  # Replace rules, calls or line template
+					for option, value in token_options.get(token_name, {}).items():
+						if option == "replace":
+							for regex, replacement in value:
+								if isinstance(regex, str):
+									regex = sanitize_regex(regex)
+								token = regex.sub(replacement, token)
+						elif option == "call":
+							token = reference_translation(yaml_details, token, value)
+						elif option == "eachline":
+							token = "\n".join(
+								str(value).replace("<line>", line)
+								for line in token.split("\n")
+								if line.strip() != ""
+							)
+					token_match[token_name] = token
+				rendered = replace_variables(
+					token_match, replace_variables(token_match, pattern_templates[part][0])
+				)
+				if next_options:
+					rendered = reference_translation(
+						yaml_details, rendered, next_options
+					)
+				content = content.replace(match_string, rendered)
+
+
+def first_difference(reference: str, candidate: str) -> Tuple[int, str, str]:
+	"""
+	Finds the first line that differs between two outputs.
+
+	:param reference: Output of the reference engine.
+	:type reference: str
+
+	:param candidate: Output of the compared engine.
+	:type candidate: str
+
+	:return: Line number (from 1) and the line in each output ("" after the end).
+	:rtype: Tuple[int, str, str]
+	"""
+	reference_lines = reference.splitlines(keepends=True)
+	candidate_lines = candidate.splitlines(keepends=True)
+	line = 0
+	for line, (reference_line, candidate_line) in enumerate(
+		zip(reference_lines, candidate_lines)
+	):
+		if reference_line != candidate_line:
+			break
+	else:
+		line = min(len(reference_lines), len(candidate_lines))
+	return (
+		line + 1,
+		reference_lines[line] if line < len(reference_lines) else "",
+		candidate_lines[line] if line < len(candidate_lines) else "",
+	)
+
+
+def line_part(
+	yaml_details: _ParseYAMLDetails, content: str, line: int
+) -> Optional[str]:
+	"""
+	Finds the part that rewrote a line of the output.
+
+	:param yaml_details: Extracted yaml details.
+	:type yaml_details: _ParseYAMLDetails
+
+	:param content: Source code.
+	:type content: str
+
+	:param line: Line number (from 1) in the output.
+	:type line: int
+
+	:return: First part with a rewrite in the line, None if the line was not rewritten.
+	:rtype: Optional[str]
+
+	The line is looked up in the source map of a translation in splice mode. Up to
+	the first difference, the outputs of every mode are the same, so this is the
+	part to check. In other modes, it is an estimate.
+	"""
+	source_map: List[_SourceSegment] = []
+	init_converter(yaml_details, splice=True)
+	output = timed_translation(
+		partial(convert_syntax, yaml_details, splice=True, source_map=source_map), content
+	)[0]
+	if output is None:
+		return None
+	starts = line_starts(output)
+	if line > len(starts):
+		return None
+	start = starts[line - 1]
+	end = starts[line] if line < len(starts) else len(output)
+	for output_start, output_end, _, _, part in source_map:  # Sorted by position
+		if output_start >= end:
+			break
+		if part and (start < output_end or start == output_start == output_end):
+			return part
+	return None
+
+
+def shadow_translation(
+	yaml_details: _ParseYAMLDetails,
+	content: str,
+	incremental: bool = False,
+	splice: bool = False,
+	order: Optional[_PartOrder] = None,
+) -> Dict[str, Any]:
+	"""
+	Translates a source with the reference engine and with other options, and
+	compares both.
+
+	:param yaml_details: Extracted yaml details.
+	:type yaml_details: _ParseYAMLDetails
+
+	:param content: Source code.
+	:type content: str
+
+	:param incremental: Only rescan the lines changed by the previous iteration.
+	:type incremental: bool
+
+	:param splice: Rewrite each match at its own position.
+	:type splice: bool
+
+	:param order: Order of parts (see convert_in_order).
+	:type order: Optional[_PartOrder]
+
+	:return: Report with identical, the time of each engine, speedup and for a
+		difference its line, the line in each output, part and error messages.
+	:rtype: Dict[str, Any]
+
+	The reference engine is reference_translation. It runs after the compared
+	engine, so regexes compiled on first use are counted for the compared engine and
+	the speedup is not overestimated.
+	"""
+	init_converter(yaml_details, incremental, splice)
+	candidate, candidate_time, candidate_messages = timed_translation(
+		partial(
+			convert_syntax,
+			yaml_details,
+			incremental=incremental,
+			splice=splice,
+			order=order,
+		),
+		content,
+	)
+	reference, reference_time, reference_messages = timed_translation(
+		partial(reference_translation, yaml_details), content
+	)
+	report: Dict[str, Any] = {
+		"identical": reference == candidate and reference_messages == candidate_messages,
+		"reference_time": reference_time,
+		"candidate_time": candidate_time,
+		"speedup": reference_time / candidate_time if candidate_time else None,
+	}
+	if report["identical"]:
+		return report
+	if reference is not None and candidate is not None:
+		line, reference_line, candidate_line = first_difference(reference, candidate)
+		report.update(
+			line=line,
+			reference_line=reference_line,
+			candidate_line=candidate_line,
+			part=line_part(yaml_details, content, line),
+		)
+	report.update(
+		reference_messages=reference_messages, candidate_messages=candidate_messages
+	)
+	return report
+
+
+def shadow_sources(
+	sources: List[Tuple[str, str]],
+	yaml_details: _ParseYAMLDetails,
+	incremental: bool = False,
+	splice: bool = False,
+	order: Optional[_PartOrder] = None,
+	json_path: Optional[str] = None,
+) -> int:
+	"""
+	Compares the reference engine with other options on source files (--shadow).
+
+	:param sources: Source paths from collect_sources.
+	:type sources: List[Tuple[str, str]]
+
+	:param yaml_details: Extracted yaml details.
+	:type yaml_details: _ParseYAMLDetails
+
+	:param incremental: Only rescan the lines changed by the previous iteration.
+	:type incremental: bool
+
+	:param splice: Rewrite each match at its own position.
+	:type splice: bool
+
+	:param order: Order of parts (see convert_in_order).
+	:type order: Optional[_PartOrder]
+
+	:param json_path: Path of the JSON report with every file (not saved if None).
+	:type json_path: Optional[str]
+
+	:return: Number of files with different outputs.
+	:rtype: int
+
+	Files are translated one after another in this process, so the timings of both
+	engines are comparable.
+	"""
+	reports = []
+	different = 0
+	for source_path, _ in sources:
+		with open(source_path, encoding="utf-8") as source_file:
+			report = shadow_translation(
+				yaml_details, source_file.read(), incremental, splice, order
+			)
+		report["source"] = source_path
+		reports.append(report)
+		speedup = f"{report['speedup']:.2f}x" if report["speedup"] else "-"
+		if report["identical"]:
+			print(Fore.GREEN + "same  " + Fore.RESET, source_path, speedup)
+			continue
+		different += 1
+		print(Fore.RED + "differ" + Fore.RESET, source_path, speedup)
+		if "line" in report:
+			print(f"       line {report['line']}, part {report['part'] or '-'}")
+			print("       reference:", repr(report["reference_line"]))
+			print("       candidate:", repr(report["candidate_line"]))
+		for engine in ("reference", "candidate"):
+			if report[engine + "_messages"]:
+				print(
+					f"       {engine} stopped:",
+					report[engine + "_messages"].replace("\n", "\n       "),
+				)
+	reference_time = sum(report["reference_time"] for report in reports)
+	candidate_time = sum(report["candidate_time"] for report in reports)
+	print(
+		f"Identical {len(reports) - different}/{len(reports)} files,",
+		f"reference {reference_time:.3f}s, candidate {candidate_time:.3f}s",
+		f"({reference_time / candidate_time:.2f}x)" if candidate_time else "",
+	)
+	if json_path is not None:
+		from json import dump
+
+		with open(json_path, "w", encoding="utf-8") as json_file:
+			dump(reports, json_file, indent=2)
+	return different
+
+
+var_rgx = re.compile(r"<\w+>")
+newline_rgx = re.compile(r"\n")
+category_rgx = {  # Character categories of sre_parse
+	"CATEGORY_DIGIT": re.compile(r"\d"),
+	"CATEGORY_NOT_DIGIT": re.compile(r"\D"),
+	"CATEGORY_SPACE": re.compile(r"\s"),
+	"CATEGORY_NOT_SPACE": re.compile(r"\S"),
+	"CATEGORY_WORD": re.compile(r"\w"),
+	"CATEGORY_NOT_WORD": re.compile(r"\W"),
+	"CATEGORY_LINEBREAK": re.compile(r"\n"),
+	"CATEGORY_NOT_LINEBREAK": re.compile(r"[^\n]"),
+}
+# Characters used to compare character sets in backtracking_shapes
+sample_characters = "\t\n\r aZ_09.,:;!?\"'()[]{}<>=+-*/\\|#$%&@^`~\u00e9"
+placeholder_rgx = re.compile(r"<([^<>]+)>")
+
+def ruleset_dependencies(source_path: str, target_path: str) -> List[str]:
+	"""
+	Finds every file used to extract yaml details.
+
+	:param source_path: Path of the source YAML file (without .yaml).
+	:type source_path: str
+
+	:param target_path: Path of the target YAML file (without .yaml).
+	:type target_path: str
+
+	:return: Paths of source, target, builtin, varfile and errfile YAML files.
+	:rtype: List[str]
+	"""
+	dependencies = [
+		source_path + ".yaml",
+		target_path + ".yaml",
+		os.path.join(dirname(__file__), "builtin.yaml"),
+	]
+	return [os.path.abspath(dependency) for dependency in dependencies] + (
+		settings_dependencies(load_yaml_file(source_path).get("settings") or {})
+	)
+
+
+def settings_dependencies(settings: Dict[str, Any]) -> List[str]:
+	"""
+	Finds the varfile and errfile used by settings of a source YAML file.
+
+	:param settings: Settings in the source YAML file.
+	:type settings: Dict[str, Any]
+
+	:return: Absolute paths of varfile and errfile YAML files.
+	:rtype: List[str]
+	"""
+	dependencies = []
+	if "varfile" in settings:
+		dependencies.append(settings["varfile"] + ".yaml")
+	if "errfile" in settings:
+		dependencies.append(os.path.join(dirname(__file__), settings["errfile"]) + ".yaml")
+	return [os.path.abspath(dependency) for dependency in dependencies]
+
+
+def file_versions(paths: List[str]) -> Tuple[Optional[int], ...]:
+	"""
+	Gets modification time of files.
+
+	:param paths: Paths of the files.
+	:type paths: List[str]
+
+	:return: Modification time in nanoseconds (None for a missing file).
+	:rtype: Tuple[Optional[int], ...]
+	"""
+	versions: List[Optional[int]] = []
+	for path in paths:
+		try:
+			versions.append(os.stat(path).st_mtime_ns)
+		except OSError:
+			versions.append(None)
+	return tuple(versions)
+
+
+# Extracted yaml details kept in memory by the server
+# (source, target, working directory): (dependencies, versions, yaml details, warnings)
+ruleset_cache: Dict[
+	Tuple[str, str, str],
+	Tuple[
+		List[str],
+		Tuple[Optional[int], ...],
+		Tuple[_AfterProcessing, _ParseYAMLDetails],
+		str,
+	],
+] = {}
+
+
+def load_cached_ruleset(
+	source_path: str, target_path: str
+) -> Tuple[_AfterProcessing, _ParseYAMLDetails]:
+	"""
+	Extracts yaml details, reusing them until one of their files changes.
+
+	:param source_path: Path of the source YAML file (without .yaml).
+	:type source_path: str
+
+	:param target_path: Path of the target YAML file (without .yaml).
+	:type target_path: str
+
+	:return: A tuple containing the after command and YAML details.
+	:rtype: Tuple[_AfterProcessing, _ParseYAMLDetails]
+	"""
+	key = (os.path.abspath(source_path), os.path.abspath(target_path), os.getcwd())
+	if key in ruleset_cache:
+		dependencies, versions, yaml_details, warnings = ruleset_cache[key]
+		if file_versions(dependencies) == versions:
+			print_warnings(warnings)
+			return yaml_details
+	dependencies = ruleset_dependencies(source_path, target_path)
+	versions = file_versions(dependencies)
+	yaml_details, warnings = capture_warnings(
+		partial(load_compiled_ruleset, source_path, target_path)
+	)
+	print_warnings(warnings)
+	ruleset_cache[key] = (dependencies, versions, yaml_details, warnings)
+	return yaml_details
+
+
+def handle_request(request: Dict[str, Any]) -> Dict[str, Any]:
+	"""
+	Runs a command sent to the server.
+
+	:param request: Command line arguments (argv) and working directory (cwd) of the client.
+	:type request: Dict[str, Any]
+
+	:return: Printed output, exit code and the after command for the client to run.
+	:rtype: Dict[str, Any]
+
+	Server options are rejected, so a request can not start another server inside
+	this one.
+	"""
+	server_options = [
+		option for option in ("--serve", "--socket", "--stop") if option in request["argv"]
+	]
+	if server_options:
+		return {
+			"output": f"{error_msg} {', '.join(server_options)} can not be sent to the server\n",
+			"code": 1,
+			"after": None,
+		}
+	from io import StringIO
+	from contextlib import redirect_stdout
+
+	after_commands: List[Tuple[str, bool]] = []
+	output = StringIO()
+	code = 0
+	current_directory = os.getcwd()
+	try:
+		os.chdir(request["cwd"])
+		with redirect_stdout(output):
+			try:
+				main(
+					request["argv"],
+					load_cached_ruleset,
+					lambda command, yes: after_commands.append((command, yes)),
+				)
+			except SystemExit as exit_error:
+				if isinstance(exit_error.code, int):
+					code = exit_error.code
+				elif exit_error.code is not None:
+					print(exit_error.code)
+					code = 1
+	finally:
+		os.chdir(current_directory)
+		current_state().line_index = None  # Do not keep the document until the next request
+	printed = "\n".join(  # Reset colors at line end like colorama's autoreset
+		line + Fore.RESET if "\x1b[" in line else line
+		for line in output.getvalue().split("\n")
+	)
+	return {
+		"output": printed,
+		"code": code,
+		"after": after_commands[0] if after_commands else None,
+	}
+
+
+def default_socket_path() -> str:
+	"""
+	Gets the default path of the server's Unix socket.
+
+	:return: Path in $XDG_RUNTIME_DIR, or in a directory of the temp directory
+		that is different for every user.
+	:rtype: str
+	"""
+	from tempfile import gettempdir
+
+	if os.environ.get("XDG_RUNTIME_DIR"):
+		return os.path.join(os.environ["XDG_RUNTIME_DIR"], "langtrans.sock")
+	user = os.getuid() if hasattr(os, "getuid") else os.getlogin()
+	return os.path.join(gettempdir(), f"langtrans-{user}", "server.sock")
+
+
+def private_socket_directory(socket_path: str) -> None:
+	"""
+	Creates the directory of the default socket, only accessible by the user.
+
+	:param socket_path: Path from default_socket_path.
+	:type socket_path: str
+
+	:return: None
+
+	Other users could otherwise create the directory or the socket first, and
+	clients would send them commands.
+	"""
+	directory = os.path.dirname(socket_path)
+	os.makedirs(directory, 0o700, exist_ok=True)
+	directory_stat = os.stat(directory)
+	if hasattr(os, "getuid") and (
+		directory_stat.st_uid != os.getuid() or directory_stat.st_mode & 0o077
+	):
+		sys_exit(f"{error_msg} {directory} must belong to you and not be shared")
+
+
+def serve(arguments: List[str]) -> None:
+	"""
+	Runs a translation server on a Unix socket.
+
+	:example: python langtrans.py --serve /tmp/langtrans.sock source target
+
+	:param arguments: Socket path followed by pairs of SyntaxRepr and PatternRepr
+		to load before the first request.
+	:type arguments: List[str]
+
+	:return: None
+
+	The server keeps extracted yaml details in memory and extracts them again when
+	one of their YAML files changes. Every request is a line of JSON with the
+	command line arguments and working directory of LangTransClient.py. Requests
+	run one at a time. The socket is only accessible by the user (see
+	private_socket_directory).
+	"""
+	import socket
+	import json
+	from contextlib import suppress
+
+	socket_path = arguments[0] if arguments else default_socket_path()
+	if not arguments:
+		private_socket_directory(socket_path)
+	for source_path, target_path in zip(arguments[1::2], arguments[2::2]):
+		load_cached_ruleset(source_path, target_path)
+	if os.path.exists(socket_path):
+		os.remove(socket_path)
+	server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)  # type: ignore[attr-defined]
+	umask = os.umask(0o077)
+	try:
+		server.bind(socket_path)
+	finally:
+		os.umask(umask)
+	server.listen()
+	print(Fore.GREEN + "Listening on", socket_path)
+	try:
+		while True:
+			connection, _ = server.accept()
+			with connection, connection.makefile("rb") as request_file:
+				try:
+					request = json.loads(request_file.readline())
+					if not isinstance(request, dict):
+						raise ValueError("request is not a JSON object")
+					if request.get("shutdown"):
+						with suppress(OSError):
+							connection.sendall(b"{}\n")
+						break
+					response = handle_request(request)
+				except Exception as error:  # A bad request must not stop the server
+					response = {
+						"output": f"{error_msg} Invalid request: {error!r}\n",
+						"code": 1,
+						"after": None,
+					}
+				with suppress(OSError):  # Client disconnected before the response
+					connection.sendall(json.dumps(response).encode() + b"\n")
+	finally:
+		server.close()
+		if os.path.exists(socket_path):
+			os.remove(socket_path)
+
+
+def default_cache_directory() -> str:
+	"""
+	Gets the default cache directory.
+
+	:return: $LANGTRANS_CACHE or .cache/langtrans in the home directory.
+	:rtype: str
+	"""
+	return os.environ.get("LANGTRANS_CACHE") or os.path.join(
+		os.path.expanduser("~"), ".cache", "langtrans"
+	)
+
+
+def write_atomic(path: str, data: bytes) -> None:
+	"""
+	Writes a file so that other processes never read it half written.
+
+	:param path: Path of the file.
+	:type path: str
+
+	:param data: Content of the file.
+	:type data: bytes
+
+	:return: None
+	"""
+	from tempfile import mkstemp
+
+	os.makedirs(dirname(path), exist_ok=True)
+	file_descriptor, temp_path = mkstemp(dir=dirname(path), suffix=".tmp")
+	try:
+		with os.fdopen(file_descriptor, "wb") as temp_file:
+			temp_file.write(data)
+		os.replace(temp_path, path)
+	except BaseException:
+		if os.path.exists(temp_path):
+			os.remove(temp_path)
+		raise
+
+
+def write_if_changed(path: str, content: str) -> bool:
+	"""
+	Writes a text file only if its content is different.
+
+	:param path: Path of the file.
+	:type path: str
+
+	:param content: Content of the file.
+	:type content: str
+
+	:return: True if the file was written.
+	:rtype: bool
+
+	An unchanged output file keeps its modification time, so tools that watch
+	the file do not run again.
+	"""
+	try:
+		with open(path, encoding="utf-8") as existing_file:
+			if existing_file.read() == content:
+				return False
+	except (OSError, UnicodeDecodeError):
+		pass
+	with open(path, "w", encoding="utf-8") as output_file:
+		output_file.write(content)
+	return True
+
+
+def ruleset_fingerprint(
+	source_path: str, target_path: str, cache_directory: str
+) -> Tuple[str, _AfterProcessing]:
+	"""
+	Hashes every file that can change the translation.
+
+	:param source_path: Path of the source YAML file (without .yaml).
+	:type source_path: str
+
+	:param target_path: Path of the target YAML file (without .yaml).
+	:type target_path: str
+
+	:param cache_directory: Cache directory.
+	:type cache_directory: str
+
+	:return: Fingerprint and the after command in settings.
+	:rtype: Tuple[str, _AfterProcessing]
+
+	Source, target and builtin YAML files and LangTransEngine.py are hashed with the
+	working directory and LangTrans version. The varfile and errfile of this combination are saved in
+	the cache directory, so the source YAML file is only parsed the first time.
+	"""
+	from hashlib import sha256
+	from json import dumps, loads
+
+	base_hash = sha256(f"{__version__}\0{os.getcwd()}".encode())
+	for path in (
+		source_path + ".yaml",
+		target_path + ".yaml",
+		os.path.join(dirname(__file__), "builtin.yaml"),
+		__file__,
+	):
+		try:
+			with open(path, "rb") as dependency_file:
+				base_hash.update(b"\0" + dependency_file.read())
+		except FileNotFoundError:
+			sys_exit(f"{error_msg} {path} not found")
+	index_path = os.path.join(
+		cache_directory, "rulesets", base_hash.hexdigest() + ".json"
+	)
+	try:
+		with open(index_path, encoding="utf-8") as index_file:
+			index = loads(index_file.read())
+	except (OSError, ValueError):
+		settings = load_yaml_file(source_path).get("settings") or {}
+		index = {
+			"dependencies": settings_dependencies(settings),
+			"after": settings.get("after"),
+		}
+		write_atomic(index_path, dumps(index).encode())
+
+	fingerprint = sha256(base_hash.digest())
+	for path in index["dependencies"]:
+		try:
+			with open(path, "rb") as dependency_file:
+				fingerprint.update(b"\0" + dependency_file.read())
+		except OSError:
+			fingerprint.update(b"\0missing")
+	return fingerprint.hexdigest(), index["after"]
+
+
+def compiled_fingerprint(filename: str) -> str:
+	"""
+	Hashes a compiled ruleset (.ltz) like ruleset_fingerprint hashes YAML files.
+
+	:param filename: Name of the file (without .ltz).
+	:type filename: str
+
+	:return: Fingerprint of the file, LangTransEngine.py and the LangTrans version.
+	:rtype: str
+	"""
+	from hashlib import sha256
+
+	fingerprint = sha256(f"{__version__}\0ltz".encode())
+	for path in (filename + ".ltz", __file__):
+		with open(path, "rb") as dependency_file:
+			fingerprint.update(b"\0" + dependency_file.read())
+	return fingerprint.hexdigest()
+
+
+def load_compiled_ruleset(
+	source_path: str, target_path: str, cache_directory: Optional[str] = None
+) -> Tuple[_AfterProcessing, _ParseYAMLDetails]:
+	"""
+	Extracts yaml details, reusing the compiled ruleset in the cache directory.
+
+	:param source_path: Path of the source YAML file (without .yaml).
+	:type source_path: str
+
+	:param target_path: Path of the target YAML file (without .yaml).
+	:type target_path: str
+
+	:param cache_directory: Cache directory (default_cache_directory if None).
+	:type cache_directory: Optional[str]
+
+	:return: A tuple containing the after command and YAML details.
+	:rtype: Tuple[_AfterProcessing, _ParseYAMLDetails]
+
+	The compiled ruleset is saved by the fingerprint of its files, so an edit of
+	any of them or a new LangTrans version compiles the ruleset again.
+	An unwritable cache directory only disables the cache.
+	"""
+	if cache_directory is None:
+		cache_directory = default_cache_directory()
+	try:
+		fingerprint = ruleset_fingerprint(source_path, target_path, cache_directory)[0]
+	except OSError:
+		return extract_yaml_details(source_path, target_path)
+	compiled_path = os.path.join(cache_directory, "compiled", fingerprint + ".json")
+	try:
+		with open(compiled_path, encoding="utf-8") as compiled_file:
+			return decode_ruleset(compiled_file.read())
+	except (OSError, ValueError, KeyError):
+		pass
+	yaml_details, warnings = capture_warnings(
+		partial(extract_yaml_details, source_path, target_path)
+	)
+	print_warnings(warnings)
+	try:
+		write_atomic(compiled_path, encode_ruleset(yaml_details, warnings).encode("utf-8"))
+	except (OSError, TypeError):
+		pass
+	return yaml_details
+
+
+def output_cache_path(
+	cache_directory: str, fingerprint: str, content: str, splice: bool = False
+) -> str:
+	"""
+	Gets the path of the cached output for a source.
+
+	:param cache_directory: Cache directory.
+	:type cache_directory: str
+
+	:param fingerprint: Fingerprint from ruleset_fingerprint.
+	:type fingerprint: str
+
+	:param content: Content of the source file.
+	:type content: str
+
+	:param splice: Whether matches are rewritten at their position.
+	:type splice: bool
+
+	:return: Path of the cache entry.
+	:rtype: str
+	"""
+	from hashlib import sha256
+
+	key = sha256(f"{fingerprint}:{int(splice)}:".encode())
+	key.update(content.encode("utf-8", "surrogatepass"))
+	digest = key.hexdigest()
+	return os.path.join(cache_directory, "outputs", digest[:2], digest[2:])
+
+
+def cached_output(cache_path: str) -> Optional[str]:
+	"""
+	Reads a cached output.
+
+	:param cache_path: Path from output_cache_path.
+	:type cache_path: str
+
+	:return: The cached output or None.
+	:rtype: Optional[str]
+	"""
+	try:
+		with open(cache_path, "rb") as cache_file:
+			output = cache_file.read().decode("utf-8", "surrogatepass")
+	except OSError:
+		return None
+	try:
+		os.utime(cache_path)  # Recently used entries are evicted last
+	except OSError:
+		pass
+	return output
+
+
+def store_output(cache_path: str, output: str) -> None:
+	"""
+	Saves an output in the cache.
+
+	:param cache_path: Path from output_cache_path.
+	:type cache_path: str
+
+	:param output: Translated content.
+	:type output: str
+
+	:return: None
+
+	The size of the entry is added to the size of the cache (see
+	update_cache_size).
+	"""
+	data = output.encode("utf-8", "surrogatepass")
+	try:
+		previous_size = os.stat(cache_path).st_size
+	except OSError:
+		previous_size = 0
+	write_atomic(cache_path, data)
+	cache_directory = dirname(dirname(dirname(cache_path)))  # See output_cache_path
+	update_cache_size(
+		cache_directory,
+		lambda size: None if size is None else size + len(data) - previous_size,
+	)
+
+
+def update_cache_size(
+	cache_directory: str, update: Callable[[Optional[int]], Optional[int]]
+) -> Optional[int]:
+	"""
+	Changes the size of cached outputs saved in the cache directory.
+
+	:param cache_directory: Cache directory.
+	:type cache_directory: str
+
+	:param update: Gets the new size from the saved size (None if unknown).
+	:type update: Callable[[Optional[int]], Optional[int]]
+
+	:return: The new size, None if it is unknown.
+	:rtype: Optional[int]
+
+	The size is kept in outputs.size, so the outputs are only listed when the cache
+	may be full (see evict_cache). The file is locked on POSIX systems, because
+	batch translations store outputs from many processes. An unknown size stays
+	unknown until evict_cache counts the outputs.
+	"""
+	try:
+		import fcntl
+	except ImportError:  # Windows
+		fcntl = None  # type: ignore[assignment]
+
+	size_path = os.path.join(cache_directory, "outputs.size")
+	try:
+		with open(size_path, "a+", encoding="ascii") as size_file:
+			if fcntl is not None:
+				fcntl.flock(size_file, fcntl.LOCK_EX)
+			size_file.seek(0)
+			text = size_file.read().strip()
+			size = update(int(text) if text.isdigit() else None)
+			size_file.seek(0)
+			size_file.truncate()
+			size_file.write("" if size is None else str(max(size, 0)))
+			return size
+	except OSError:
+		return None
+
+
+def evict_cache(cache_directory: str, max_size: int) -> None:
+	"""
+	Removes least recently used outputs until the cache is smaller than max_size.
+
+	:param cache_directory: Cache directory.
+	:type cache_directory: str
+
+	:param max_size: Maximum size of cached outputs in bytes.
+	:type max_size: int
+
+	:return: None
+
+	The outputs are only listed when the saved size of the cache (see
+	update_cache_size) is unknown or larger than max_size. Then the size is saved
+	again from the remaining outputs. Entries removed by another process at the
+	same time are skipped.
+	"""
+	size = update_cache_size(cache_directory, lambda size: size)
+	if size is not None and size <= max_size:
+		return
+	entries = []
+	total_size = 0
+	for directory, _, file_names in os.walk(os.path.join(cache_directory, "outputs")):
+		for file_name in file_names:
+			path = os.path.join(directory, file_name)
+			try:
+				status = os.stat(path)
+			except OSError:
+				continue
+			entries.append((status.st_mtime_ns, status.st_size, path))
+			total_size += status.st_size
+	if total_size > max_size:
+		for _, size, path in sorted(entries):
+			try:
+				os.remove(path)
+			except OSError:
+				continue
+			total_size -= size
+			if total_size <= max_size * 0.9:  # Leave space for the next runs
+				break
+	update_cache_size(cache_directory, lambda size: total_size)
+
+
+def restore_cached_outputs(
+	sources: List[Tuple[str, str]],
+	output_directory: str,
+	cache_directory: str,
+	fingerprint: str,
+	splice: bool = False,
+) -> Tuple[List[Tuple[str, str, str, str]], List[Tuple[str, str]]]:
+	"""
+	Writes cached outputs of batch sources.
+
+	:param sources: Source paths and output paths from collect_sources.
+	:type sources: List[Tuple[str, str]]
+
+	:param output_directory: Directory to save translated files in.
+	:type output_directory: str
+
+	:param cache_directory: Cache directory.
+	:type cache_directory: str
+
+	:param fingerprint: Fingerprint from ruleset_fingerprint.
+	:type fingerprint: str
+
+	:param splice: Whether matches are rewritten at their position.
+	:type splice: bool
+
+	:return: Results of cached sources (status is cached) and sources to translate.
+	:rtype: Tuple[List[Tuple[str, str, str, str]], List[Tuple[str, str]]]
+	"""
+	results = []
+	uncached = []
+	for source_path, relative_path in sources:
+		output_path = os.path.join(output_directory, relative_path)
+		with open(source_path, encoding="utf-8") as input_file:
+			content = input_file.read()
+		output = cached_output(
+			output_cache_path(cache_directory, fingerprint, content, splice)
+		)
+		if output is None:
+			uncached.append((source_path, relative_path))
+			continue
+		os.makedirs(dirname(output_path) or ".", exist_ok=True)
+		write_if_changed(output_path, output)
+		results.append((source_path, output_path, "cached", ""))
+	return results, uncached
+
+
+def report_profile(summary: Optional[Dict[str, Any]], json_path: Optional[str]) -> None:
+	"""
+	Prints the profile summary and saves it as JSON.
+
+	:param summary: Summary from stop_profile.
+	:type summary: Optional[Dict[str, Any]]
+
+	:param json_path: Path of the JSON file (not saved if None).
+	:type json_path: Optional[str]
+
+	:return: None
+	"""
+	if summary is None:
+		return
+	print_profile(summary)
+	if json_path is not None:
+		from json import dump
+
+		with open(json_path, "w", encoding="utf-8") as json_file:
+			dump(summary, json_file, indent=2)
+
+
+def run_after_command(command: str, yes: bool) -> None:
+	"""
+	Runs the after command, asking the user first.
+
+	:param command: The after command with $target, $source and $current replaced.
+	:type command: str
+
+	:param yes: Run without asking.
+	:type yes: bool
+
+	:return: None
+	"""
+	if yes:
+		system(command)
+		sys_exit()
+	print("\nEnter to run and n to exit\nCommand:", command)
+	inp = input()
+	if inp.lower() != "n":
+		system(command)
+
+
+def platform_after_command(after: _AfterProcessing) -> Optional[str]:
+	"""
+	Gets the after command of this OS as a single command.
+
+	:param after: `after` option in the settings.
+	:type after: _AfterProcessing
+
+	:return: The after command, multiple commands joined with &&.
+	:rtype: Optional[str]
+	"""
+	if isinstance(after, Dict):  # After command for different OS
+		from platform import system as systm
+
+		osname = systm().lower()  # Current os name
+		if osname not in after:
+			print(f"{error_msg} No after command for {osname}. OS name eg. linux, windows")
+			sys_exit()
+		after = after[osname]
+	if isinstance(after, list):  # For multiple commands
+		after = " && ".join(after)
+	return after
+
+
+def quote_path(path: str) -> str:
+	"""
+	Quotes a path for the shell that runs after commands.
+
+	:param path: Path of a file or directory.
+	:type path: str
+
+	:return: The path as a single shell argument.
+	:rtype: str
+	"""
+	if os.name == "nt":
+		from subprocess import list2cmdline
+
+		return list2cmdline([path])
+	from shlex import quote
+
+	return quote(path)
+
+
+def expand_after_command(
+	command: str, source_path: str, target_path: str, quote: bool = False
+) -> str:
+	"""
+	Replaces $target, $source and $current in the after command.
+
+	:param command: The after command (see platform_after_command).
+	:type command: str
+
+	:param source_path: Path of the source file.
+	:type source_path: str
+
+	:param target_path: Path of the output file.
+	:type target_path: str
+
+	:param quote: Whether paths outside quotes in the command are quoted (batch mode).
+	:type quote: bool
+
+	:return: The after command for the output.
+	:rtype: str
+
+	With quote, paths are quoted for the shell of this OS, so file names with
+	spaces or shell characters are passed as a single argument. Paths inside
+	quotes of the command are replaced as they are, like without quote, so
+	commands that already quote them keep working.
+	"""
+	after_var = {
+		"$target": target_path,
+		"$source": source_path,
+		"$current": dirname(__file__),
+	}
+	if not quote:
+		for var, val in after_var.items():
+			command = command.replace(var, val)
+		return command
+	quoted_text = r'"(?:[^"\\]|\\.)*"'
+	if os.name != "nt":  # cmd.exe does not quote with '
+		quoted_text += r"|'[^']*'"
+	placeholder = r"\$(?:target|source|current)"
+	return re.sub(
+		f"{quoted_text}|{placeholder}",
+		lambda match: (
+			quote_path(after_var[match[0]])
+			if match[0] in after_var
+			else re.sub(placeholder, lambda inner: after_var[inner[0]], match[0])
+		),
+		command,
+	)
+
+
+def run_after_commands(commands: List[Tuple[str, str]], jobs: Optional[int] = None) -> int:
+	"""
+	Runs the after commands of many outputs at the same time, without asking.
+
+	:param commands: Name of each job (the source path) and its after command.
+	:type commands: List[Tuple[str, str]]
+
+	:param jobs: Number of commands running at once. Uses every core if None.
+	:type jobs: Optional[int]
+
+	:return: Number of failed commands.
+	:rtype: int
+
+	Every line printed by a command is printed as soon as it is read, with the
+	name of its job in front. The exit code of every command is printed at the end.
+	"""
+	from concurrent.futures import ThreadPoolExecutor
+	from subprocess import Popen, PIPE, STDOUT, DEVNULL
+	from threading import Lock
+
+	print_lock = Lock()
+
+	def run(job: Tuple[str, str]) -> int:
+		name, command = job
+		with Popen(
+			command,
+			shell=True,
+			stdin=DEVNULL,
+			stdout=PIPE,
+			stderr=STDOUT,
+			text=True,
+			errors="replace",
+		) as process:
+			assert process.stdout is not None
+			for line in process.stdout:
+				with print_lock:
+					print(Fore.CYAN + f"[{name}]" + Fore.RESET, line.rstrip("\n"))
+		return process.returncode
+
+	with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+		codes = list(executor.map(run, commands))
+	failed = 0
+	for (name, _), code in zip(commands, codes):
+		if code == 0:
+			print(Fore.GREEN + "ok    " + Fore.RESET, name)
+		else:
+			failed += 1
+			print(Fore.RED + f"exit {code:<2}" + Fore.RESET, name)
+	print(f"After command succeeded for {len(commands) - failed}/{len(commands)} files")
+	return failed
+
+
+def main(
+	arguments: List[str],
+	load_ruleset: Callable[
+		[str, str], Tuple[_AfterProcessing, _ParseYAMLDetails]
+	] = load_compiled_ruleset,
+	run_after: Callable[[str, bool], None] = run_after_command,
+) -> None:
+	"""
+	Runs LangTrans with command line arguments.
+
+	:param arguments: Command line arguments (argv).
+	:type arguments: List[str]
+
+	:param load_ruleset: Function to extract yaml details of source and target.
+	:type load_ruleset: Callable[[str, str], Tuple[_AfterProcessing, _ParseYAMLDetails]]
+
+	:param run_after: Function to run the after command.
+	:type run_after: Callable[[str, bool], None]
+
+	:return: None
+	"""
+	argv = list(arguments)
+	if "--serve" in argv:  # Translation server
+		serve(argv[argv.index("--serve") + 1 :])
+		return
+	if len(argv) == 1 or (len(argv) == 2 and argv[1] == "-h"):
+		print("Arg usage: <SoureFileName> <OutputFileName> <SyntaxRepr> <PatternRepr>")
+		sys_exit("SyntaxRepr,PatternRepr: without extension(.yaml)")
+	elif len(argv) < 3:
+		sys_exit(error_msg + " Insufficient number of arguments")
+
+	try:
+		LOADED_DETAILS = None
+		YAML_DETAILS: Optional[_ParseYAMLDetails] = None
+		FINGERPRINT = ""
+
+		# Terminal Options-------------------------------------------
+		YES = "-y" in argv  # To run after command automatically
+		VERBOSE = "-v" in argv  # Verbose Mode - print source code
+		NO = "-n" in argv  # To exit without executing after command
+		INCREMENTAL = "-i" in argv  # Only rescan changed lines
+		SPLICE = "-s" in argv  # Rewrite matches at their position
+		BATCH = "-b" in argv  # Translate many files
+		JOBS = None  # Number of processes in batch mode
+		AFTER_JOBS = None  # Number of after commands at once in batch mode
+		CACHE_DIRECTORY = None  # Cache of translated files
+		CACHE_SIZE = 256 * 1024 * 1024
+		STREAM = "--stream" in argv  # Translate in chunks
+		PARALLEL = "--parallel" in argv  # Translate regions of the source at once
+		PROFILE = "--profile" in argv  # Print timings of parts
+		ORDERED = "--ordered" in argv  # Match parts one at a time in dependency order
+		ORDER = None
+		PART_BUDGET = None  # Seconds a part may take to find a match
+		PROFILE_PATH = None  # JSON file of timings
+		PROFILE_START = perf_counter()
+		CHUNK_SIZE = 1024 * 1024
+
+		if VERBOSE:
+			argv.remove("-v")
+		if YES:
+			argv.remove("-y")
+		if NO:
+			argv.remove("-n")
+		if INCREMENTAL:
+			argv.remove("-i")
+		if SPLICE:
+			argv.remove("-s")
+		if BATCH:
+			argv.remove("-b")
+		if STREAM:
+			argv.remove("--stream")
+		if PARALLEL:
+			argv.remove("--parallel")
+		if PROFILE:
+			argv.remove("--profile")
+		if ORDERED:
+			argv.remove("--ordered")
+		if "--profile-json" in argv:
+			PROFILE = True
+			PROFILE_PATH = argv[argv.index("--profile-json") + 1]
+			del argv[argv.index("--profile-json") : argv.index("--profile-json") + 2]
+		if PROFILE:
+			start_profile()
+			JOBS = 1  # Timings are only collected in this process
+		if "--chunk-size" in argv:  # In MB
+			CHUNK_SIZE = int(float(argv[argv.index("--chunk-size") + 1]) * 1024 * 1024)
+			del argv[argv.index("--chunk-size") : argv.index("--chunk-size") + 2]
+		if "--part-budget" in argv:  # In seconds
+			PART_BUDGET = float(argv[argv.index("--part-budget") + 1])
+			del argv[argv.index("--part-budget") : argv.index("--part-budget") + 2]
+			if not budget_available():
+				print(Fore.YELLOW + "Warning:", "--part-budget only works in the main thread on POSIX")
+		current_state().part_budget = PART_BUDGET  # The server runs main again
+		if "-j" in argv:
+			JOBS = int(argv[argv.index("-j") + 1])
+			del argv[argv.index("-j") : argv.index("-j") + 2]
+		if "--after-jobs" in argv:  # After commands running at once in batch mode
+			AFTER_JOBS = int(argv[argv.index("--after-jobs") + 1])
+			del argv[argv.index("--after-jobs") : argv.index("--after-jobs") + 2]
+		if "--cache" in argv:
+			argv.remove("--cache")
+			CACHE_DIRECTORY = default_cache_directory()
+		if "--cache-dir" in argv:
+			CACHE_DIRECTORY = argv[argv.index("--cache-dir") + 1]
+			del argv[argv.index("--cache-dir") : argv.index("--cache-dir") + 2]
+		if "--no-ruleset-cache" in argv:  # Always parse YAML files
+			argv.remove("--no-ruleset-cache")
+			load_ruleset = extract_yaml_details
+		if "--cache-size" in argv:  # In MB
+			CACHE_SIZE = int(float(argv[argv.index("--cache-size") + 1]) * 1024 * 1024)
+			del argv[argv.index("--cache-size") : argv.index("--cache-size") + 2]
+		if load_ruleset is load_compiled_ruleset and CACHE_DIRECTORY is not None:
+			load_ruleset = partial(load_compiled_ruleset, cache_directory=CACHE_DIRECTORY)
+		# ------------------------------------------------------------
+		if "-c" in argv:  # Compile into ltz
+			argv[-1] += ".ltz"
+			yaml_details, warnings = capture_warnings(
+				partial(extract_yaml_details, argv[2], argv[3], check_samples=True)
+			)
+			print_warnings(warnings)
+			with open(argv[-1], "w", encoding="utf-8") as litz_file:
+				litz_file.write(encode_ruleset(yaml_details, warnings))
+			print(Fore.GREEN + "Compiled successfully")
+			sys_exit("File saved as " + argv[-1])
+		elif "-f" in argv:  # Run compiled ltz
+			argv.remove("-f")
+			LOADED_DETAILS = load_compiled_yaml_details(argv[-1])
+			if CACHE_DIRECTORY is not None:
+				FINGERPRINT = compiled_fingerprint(argv[-1])
+				if ORDERED:  # Output of --ordered is cached separately
+					FINGERPRINT += ":ordered"
+		elif "-d" in argv:
+			print_yaml_documentation(argv[-1])
+			sys_exit()
+		elif "--check" in argv:  # Errors of sources without translating
+			argv.remove("--check")
+			sys_exit(
+				1
+				if check_sources(collect_sources(argv[1]), load_ruleset(argv[2], argv[3])[1])
+				else 0
+			)
+		elif "--shadow" in argv:  # Compare with the reference engine
+			argv.remove("--shadow")
+			SHADOW_PATH = None  # JSON report
+			if "--shadow-json" in argv:
+				SHADOW_PATH = argv[argv.index("--shadow-json") + 1]
+				del argv[argv.index("--shadow-json") : argv.index("--shadow-json") + 2]
+			YAML_DETAILS = load_ruleset(argv[2], argv[3])[1]
+			if ORDERED:
+				ORDER = dependency_order(dependency_graph(YAML_DETAILS))
+			sys_exit(
+				1
+				if shadow_sources(
+					collect_sources(argv[1]),
+					YAML_DETAILS,
+					INCREMENTAL,
+					SPLICE,
+					ORDER,
+					SHADOW_PATH,
+				)
+				else 0
+			)
+		elif "--explain-order" in argv:
+			argv.remove("--explain-order")
+			print_dependency_order(extract_yaml_details(argv[1], argv[2], check_samples=True)[1])
+			sys_exit()
+		elif CACHE_DIRECTORY is not None:  # Yaml details are loaded if not cached
+			FINGERPRINT, AFTER_COMMAND = ruleset_fingerprint(
+				argv[3], argv[4], CACHE_DIRECTORY
+			)
+			if ORDERED:  # Output of --ordered is cached separately
+				FINGERPRINT += ":ordered"
+		else:
+			LOADED_DETAILS = load_ruleset(argv[3], argv[4])
+		# -------------------------------------------------------------------
+		if LOADED_DETAILS is not None:
+			AFTER_COMMAND, YAML_DETAILS = LOADED_DETAILS
+		CACHE = (CACHE_DIRECTORY, FINGERPRINT) if CACHE_DIRECTORY is not None else ()
+		if BATCH:
+			SOURCES = collect_sources(argv[1])
+			BATCH_ORDER = {source: index for index, (source, _) in enumerate(SOURCES)}
+			BATCH_RESULTS: List[Tuple[str, str, str, str]] = []
+			if CACHE_DIRECTORY is not None:
+				BATCH_RESULTS, SOURCES = restore_cached_outputs(
+					SOURCES, argv[2], CACHE_DIRECTORY, FINGERPRINT, SPLICE
+				)
+			if SOURCES:
+				if YAML_DETAILS is None:
+					YAML_DETAILS = load_ruleset(argv[3], argv[4])[1]
+				if ORDERED:
+					ORDER = dependency_order(dependency_graph(YAML_DETAILS))
+				BATCH_RESULTS += translate_batch(
+					SOURCES,
+					argv[2],
+					YAML_DETAILS,
+					JOBS,
+					INCREMENTAL,
+					SPLICE,
+					CACHE,
+					ORDER,
+					PART_BUDGET,
+				)
+			if CACHE_DIRECTORY is not None:
+				evict_cache(CACHE_DIRECTORY, CACHE_SIZE)
+			BATCH_RESULTS.sort(key=lambda result: BATCH_ORDER[result[0]])
+			BATCH_FAILED = print_batch_summary(BATCH_RESULTS)
+			if PROFILE:
+				report_profile(stop_profile(perf_counter() - PROFILE_START), PROFILE_PATH)
+			if not NO and AFTER_COMMAND:  # For every translated file
+				AFTER_COMMAND = platform_after_command(AFTER_COMMAND)
+				if AFTER_COMMAND and not YES:
+					print(
+						"\nEnter to run for every translated file and n to skip\nCommand:",
+						AFTER_COMMAND,
+					)
+					if input().lower() == "n":
+						AFTER_COMMAND = None
+				if AFTER_COMMAND:
+					BATCH_FAILED += run_after_commands(
+						[
+							(source, expand_after_command(AFTER_COMMAND, source, output, quote=True))
+							for source, output, status, _ in BATCH_RESULTS
+							if status in ("ok", "cached")
+						],
+						AFTER_JOBS,
+					)
+			sys_exit(1 if BATCH_FAILED else 0)
+		STREAMED = False
+		if STREAM:
+			if YAML_DETAILS is None:
+				YAML_DETAILS = load_ruleset(argv[3], argv[4])[1]
+			if ORDERED:
+				ORDER = dependency_order(dependency_graph(YAML_DETAILS))
+			UNSAFE_PARTS = stream_unsafe_parts(YAML_DETAILS)
+			if not SPLICE or ORDERED:
+				print(
+					Fore.YELLOW + "Warning:",
+					"Translating the whole file, streaming needs -s without --ordered",
+				)
+			elif UNSAFE_PARTS:
+				print(
+					Fore.YELLOW + "Warning:",
+					"Translating the whole file, these parts need it:",
+					", ".join(UNSAFE_PARTS),
+				)
+			else:
+				translate_stream(
+					argv[1],
+					argv[2],
+					YAML_DETAILS,
+					CHUNK_SIZE,
+					INCREMENTAL,
+					SPLICE,
+					VERBOSE,
+					ORDER,
+				)
+				STREAMED = True
+		if not STREAMED:
+			if PARALLEL and (not SPLICE or ORDERED):
+				print(
+					Fore.YELLOW + "Warning:",
+					"Translating the whole file in one process, --parallel needs -s without --ordered",
+				)
+				PARALLEL = False
+			with open(argv[1], encoding="utf-8") as InputFile:
+				content = InputFile.read()
+			targetcode = None
+			if CACHE_DIRECTORY is not None:
+				CACHE_PATH = output_cache_path(
+					CACHE_DIRECTORY,
+					FINGERPRINT + (":parallel" if PARALLEL else ""),
+					content,
+					SPLICE,
+				)
+				targetcode = cached_output(CACHE_PATH)
+			if targetcode is None:
+				if YAML_DETAILS is None:
+					YAML_DETAILS = load_ruleset(argv[3], argv[4])[1]
+				if ORDERED:
+					ORDER = dependency_order(dependency_graph(YAML_DETAILS))
+				if PARALLEL:
+					UNSAFE_PARTS = stream_unsafe_parts(YAML_DETAILS)
+					if UNSAFE_PARTS:
+						print(
+							Fore.YELLOW + "Warning:",
+							"Translating the whole file in one process, these parts need it:",
+							", ".join(UNSAFE_PARTS),
+						)
+						PARALLEL = False
+				if PARALLEL:
+					targetcode = translate_parallel(
+						content,
+						YAML_DETAILS,
+						JOBS,
+						CHUNK_SIZE,
+						INCREMENTAL,
+						SPLICE,
+						ORDER,
+						PART_BUDGET,
+					)
+				else:
+					init_converter(YAML_DETAILS, INCREMENTAL, SPLICE)
+					current_state().once_complete.clear()
+					targetcode = convert_syntax(
+						YAML_DETAILS,
+						content,
+						incremental=INCREMENTAL,
+						splice=SPLICE,
+						order=ORDER,
+					)
+				if CACHE_DIRECTORY is not None:
+					store_output(CACHE_PATH, targetcode)
+					evict_cache(CACHE_DIRECTORY, CACHE_SIZE)
+			write_if_changed(argv[2], targetcode)
+		print(Fore.GREEN, "Saved as", argv[2])
+		if VERBOSE and not STREAMED:
+			print(targetcode)
+		if PROFILE:
+			report_profile(stop_profile(perf_counter() - PROFILE_START), PROFILE_PATH)
+		# For after command in settings
+		if not NO and AFTER_COMMAND:  # Not None
+			AFTER_COMMAND = platform_after_command(AFTER_COMMAND)
+			if AFTER_COMMAND:
+				# To use address of source and target file in 'AFTER_COMMAND' command
+				run_after(expand_after_command(AFTER_COMMAND, argv[1], argv[2]), YES)
+	except Exception as exception_error:
+		print(Fore.RED + "Program Error:", exception_error)
+	finally:
+		stop_profile(0.0)  # The server runs main again
+
+
+@lru_cache(maxsize=None)
+def init_terminal() -> None:
+	"""
+	Initializes colored output on the terminal once (colorama).
+
+	:return: None
+	"""
+	from colorama import init
+
+	init(autoreset=True)
+
@@ -0,0 +1,126 @@
+"""
+LangTrans YAML
+--------------
+Reads the YAML files of a syntax and prints their documentation (`-d`).
+It does not import the translation engine (LangTransEngine.py), so LangTrans.py
+prints the documentation of a syntax without loading it.
+
+License
+-------
+MIT License
+Copyright (c) 2021 Bijin Regi Panicker
+See LICENSE file for orginal text.
+"""
+from sys import exit as sys_exit
+from typing import Any, Dict
+
+
+class Fore:
+	"""
+	ANSI codes of colored messages (the same as colorama.Fore).
+
+	colorama is only imported by init_terminal, so importing LangTrans and printing
+	the help stay fast.
+	"""
+
+	RED = "\x1b[31m"
+	GREEN = "\x1b[32m"
+	YELLOW = "\x1b[33m"
+	MAGENTA = "\x1b[35m"
+	CYAN = "\x1b[36m"
+	RESET = "\x1b[39m"
+
+
+error_msg = Fore.RED + "Error:"
+
+
+def load_yaml_file(file: str) -> Dict[str, Any]:
+	"""
+	Adds .yaml file extension and extracts dictionary of YAML data in file.
+
+	:param file_path: The path to the YAML file.
+	:type file_path: str
+
+	:return: A dictionary containing the YAML data.
+	:rtype: Dict[str, Any]
+	"""
+	from yaml import load, SafeLoader
+	from yaml.scanner import ScannerError
+	from yaml.parser import ParserError
+
+	try:  # libyaml
+		from yaml import CSafeLoader as FastLoader
+	except ImportError:
+		FastLoader = SafeLoader  # type: ignore[misc, assignment]
+
+	file += ".yaml"
+	try:
+		with open(file, encoding="utf-8") as yaml_file:
+			yaml_text = yaml_file.read()
+		try:
+			return load(yaml_text, Loader=FastLoader)
+		except (ScannerError, ParserError):  # Parsed again for the snippet of the error
+			return load(yaml_text, Loader=SafeLoader)
+	except (
+		ScannerError,
+		ParserError,
+	) as invalid_file:  # Error message for Invalid Yaml File
+		print(error_msg, file, "is invalid")
+		print(invalid_file.problem, invalid_file.context)
+		if invalid_file.problem_mark is not None:
+			print(invalid_file.problem_mark.get_snippet())
+		sys_exit()
+	except FileNotFoundError:
+		sys_exit(f"{error_msg} {file} not found")
+
+
+def print_yaml_documentation(source_file: str) -> None:
+	"""
+	Prints documentation of the part in yaml file.
+
+	:example: python langtrans.py -d source.
+
+	:param file: Path of the file.
+	:type file: str
+
+	:return: None
+	"""
+	yaml_content = load_yaml_file(source_file)
+
+	if "settings" in yaml_content:
+		settings = yaml_content["settings"]
+		if "lang" in settings:
+			print("Language:", settings["lang"])
+		if "author" in settings:
+			print("Author:", settings["author"])
+		del yaml_content["settings"]
+
+	documentation_list = []
+	longest_part_length = longest_tokens_length = 7
+
+	for part, details in yaml_content.items():
+		tokens_str = (
+			str(details.get("tokens", ""))
+			.replace("[", "")
+			.replace("]", "")
+			.replace("'", "")
+			.replace(" ", "")
+		)
+		about = details.get("doc", "")
+
+		documentation_list.append((part, tokens_str, about))
+
+		if len(part) > longest_part_length:
+			longest_part_length = len(part)
+		if len(tokens_str) > longest_tokens_length:
+			longest_tokens_length = len(tokens_str)
+
+	print(f"{'Part':<{longest_part_length}} {'Tokens':<{longest_tokens_length}} About")
+
+	for part, tokens_str, about in documentation_list:
+		about_with_indentation = about.replace(
+			"\n", "\n" + " " * (longest_part_length + longest_tokens_length + 2)
+		)
+		print(f"{part:<{longest_part_length}}")
+		print(f"{tokens_str:<{longest_tokens_length}}")
+		print(f"{about_with_indentation}")